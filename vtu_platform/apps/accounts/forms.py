@@ -2,7 +2,7 @@ from django import forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
 
-from apps.accounts.models import Profile
+from apps.accounts.referral_codes import lookup_referrer_id, normalize_referral_code
 
 
 class SignUpForm(UserCreationForm):
@@ -13,12 +13,16 @@ class SignUpForm(UserCreationForm):
         model = get_user_model()
         fields = ('username', 'email', 'password1', 'password2', 'referral_code')
 
+    referral_code_used = ''
+
     def clean_referral_code(self):
+        # Cleans to the referrer's user id; the normalized code itself is kept on ``referral_code_used``.
         code = (self.cleaned_data.get('referral_code') or '').strip()
         if not code:
             return None
 
-        referrer_profile = Profile.objects.select_related('user').filter(referral_code__iexact=code).first()
-        if not referrer_profile:
+        referrer_id = lookup_referrer_id(code)
+        if not referrer_id:
             raise forms.ValidationError('Referral code is invalid.')
-        return referrer_profile.user
+        self.referral_code_used = normalize_referral_code(code)
+        return referrer_id
@@ -0,0 +1,194 @@
+import csv
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.accounts.models import Profile, fallback_referral_code, generate_referral_code
+from apps.accounts.referral_codes import normalize_referral_code
+from apps.ledger.services import open_wallets
+from apps.payments.models import ReservedAccountProvisioning
+from apps.payments.tasks import provision_reserved_accounts
+from apps.referrals.models import Referral
+from apps.referrals.services import adjust_referral_stats, bonus_reference_for, referral_min_fund
+from apps.referrals.tree import link_new_referrals
+
+REQUIRED_COLUMNS = {'username', 'email'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream users from a CSV (username, email[, first_name, last_name, phone, password, password_hash, '
+        'referrer_username, referral_code, opening_balance]) and bulk-create users, profiles, wallets and referrals in chunks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file; a plaintext password column is hashed per row and is slow at scale, prefer password_hash.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--enqueue-provisioning', action='store_true', help='Dispatch a provisioning task per user after each chunk commits.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without writing anything.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        self.options = options
+        self.imported_at = timezone.now()
+        totals = {'imported': 0, 'skipped': 0, 'referrals': 0, 'unresolved_referrers': 0, 'opening_credits': 0}
+
+        try:
+            handle = open(options['path'], newline='', encoding='utf-8-sig')
+        except OSError as exc:
+            raise CommandError(f'Cannot read {options["path"]}: {exc}') from exc
+        with handle:
+            reader = csv.DictReader(handle)
+            missing = REQUIRED_COLUMNS - set(reader.fieldnames or [])
+            if missing:
+                raise CommandError(f'CSV is missing required column(s): {", ".join(sorted(missing))}.')
+            # Only one chunk of rows is ever held in memory.
+            while chunk := list(islice(reader, options['chunk_size'])):
+                for key, value in self._import_chunk(chunk).items():
+                    totals[key] += value
+                self.stdout.write(f'Imported {totals["imported"]} user(s), skipped {totals["skipped"]}.')
+
+        summary = ', '.join(f'{key}={value}' for key, value in totals.items())
+        self.stdout.write(self.style.SUCCESS(f'User import {"checked" if options["dry_run"] else "finished"}: {summary}.'))
+
+    def _import_chunk(self, rows):
+        User = get_user_model()
+        usernames = [(row.get('username') or '').strip() for row in rows]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        seen = set()
+        users, accepted = [], []
+        skipped = 0
+        for username, row in zip(usernames, rows):
+            if not username or username in existing or username in seen:
+                skipped += 1
+                continue
+            seen.add(username)
+            users.append(self._build_user(username, row))
+            accepted.append(row)
+        counts = {'imported': len(users), 'skipped': skipped, 'referrals': 0, 'unresolved_referrers': 0, 'opening_credits': 0}
+        # Validated before anything is written, so a bad row fails the dry run rather than a later chunk of the real import.
+        opening_balances = [self._opening_balance(row) for row in accepted]
+        if self.options['dry_run'] or not users:
+            return counts
+
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            if any(user.pk is None for user in users):
+                ids = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'pk'))
+                for user in users:
+                    user.pk = ids[user.username]
+
+            codes = {user.pk: generate_referral_code(user.pk) for user in users}
+            # An existing legacy or differently keyed code can equal a derived one; those users get the fallback code.
+            taken = set(Profile.objects.filter(referral_code__in=codes.values()).values_list('referral_code', flat=True))
+            codes = {user_id: fallback_referral_code(user_id) if code in taken else code for user_id, code in codes.items()}
+            referrers = self._resolve_referrers(accepted)
+            # Codes of users in this chunk are derived from their new ids, so they resolve without their profiles existing yet.
+            referrers.update({('code', code): user_id for user_id, code in codes.items()})
+            profiles, referrals, balances = [], [], {}
+            min_fund = referral_min_fund()
+            for user, row, opening_balance in zip(users, accepted, opening_balances):
+                referrer_id = referrers.get(self._referrer_key(row))
+                if referrer_id == user.pk:
+                    referrer_id = None
+                profiles.append(
+                    Profile(
+                        user_id=user.pk,
+                        referral_code=codes[user.pk],
+                        referred_by_id=referrer_id,
+                        phone=(row.get('phone') or '').strip()[:15],
+                    )
+                )
+                if referrer_id:
+                    referrals.append(
+                        Referral(
+                            referrer_id=referrer_id,
+                            referee_id=user.pk,
+                            referral_code_used=normalize_referral_code(row.get('referral_code'))[:20],
+                            bonus_reference=bonus_reference_for(user.pk),
+                            # The opening balance is a bulk FUNDING credit, which skips the signal that sets this flag.
+                            funding_met=opening_balance >= min_fund,
+                        )
+                    )
+                elif self._referrer_key(row):
+                    counts['unresolved_referrers'] += 1
+                balances[user.pk] = opening_balance
+
+            Profile.objects.bulk_create(profiles)
+            Referral.objects.bulk_create(referrals)
+            # Bulk inserts skip the referral signals, so stats and closure rows are extended for these edges only.
+            for referrer_id, total in Counter(referral.referrer_id for referral in referrals).items():
+                adjust_referral_stats(referrer_id, total=total, pending=total)
+            link_new_referrals([(referral.referrer_id, referral.referee_id) for referral in referrals])
+            counts['referrals'] = len(referrals)
+            counts['opening_credits'] = open_wallets(balances, reference_prefix='IMPORT-OPENING', meta={'source': 'import_users'})
+            # Pending rows are drained by sweep_reserved_account_provisioning unless tasks are dispatched now.
+            ReservedAccountProvisioning.objects.bulk_create([ReservedAccountProvisioning(user_id=user.pk) for user in users])
+            if self.options['enqueue_provisioning']:
+                transaction.on_commit(self._enqueue_provisioning([user.pk for user in users]))
+        return counts
+
+    @staticmethod
+    def _enqueue_provisioning(user_ids):
+        def enqueue():
+            for user_id in user_ids:
+                provision_reserved_accounts.delay(user_id)
+
+        return enqueue
+
+    def _build_user(self, username, row):
+        user = get_user_model()(
+            username=username,
+            email=(row.get('email') or '').strip(),
+            first_name=(row.get('first_name') or '').strip()[:150],
+            last_name=(row.get('last_name') or '').strip()[:150],
+            date_joined=self.imported_at,
+        )
+        if row.get('password_hash'):
+            user.password = row['password_hash'].strip()
+        elif row.get('password'):
+            user.password = make_password(row['password'])
+        else:
+            user.set_unusable_password()
+        return user
+
+    @staticmethod
+    def _referrer_key(row):
+        if (row.get('referrer_username') or '').strip():
+            return ('username', row['referrer_username'].strip())
+        code = normalize_referral_code(row.get('referral_code'))
+        return ('code', code) if code else None
+
+    def _resolve_referrers(self, rows) -> dict:
+        """Map each row's referrer key to a user id with one query per key kind; runs after the chunk is inserted."""
+        keys = {self._referrer_key(row) for row in rows} - {None}
+        usernames = [value for kind, value in keys if kind == 'username']
+        codes = [value for kind, value in keys if kind == 'code']
+        resolved = {}
+        if usernames:
+            for username, pk in get_user_model().objects.filter(username__in=usernames).values_list('username', 'pk'):
+                resolved[('username', username)] = pk
+        if codes:
+            for code, user_id in Profile.objects.filter(referral_code__in=codes).values_list('referral_code', 'user_id'):
+                resolved[('code', code)] = user_id
+        return resolved
+
+    @staticmethod
+    def _opening_balance(row) -> Decimal:
+        raw = (row.get('opening_balance') or '').strip()
+        if not raw:
+            return Decimal('0.00')
+        try:
+            amount = Decimal(raw)
+        except InvalidOperation as exc:
+            raise CommandError(f'Invalid opening_balance {raw!r} for {row.get("username")}.') from exc
+        if amount < 0:
+            raise CommandError(f'Negative opening_balance for {row.get("username")}.')
+        return amount
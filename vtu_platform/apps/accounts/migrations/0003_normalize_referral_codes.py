@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:54
+
+import re
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+def uppercase_referral_codes(apps, schema_editor):
+    Profile = apps.get_model('accounts', 'Profile')
+    for profile in Profile.objects.exclude(referral_code__regex=r'^[A-Z0-9]*$').iterator():
+        code = re.sub(r'[\s-]+', '', profile.referral_code).upper()
+        if not code or Profile.objects.filter(referral_code=code).exclude(pk=profile.pk).exists():
+            code = f'USR{profile.user_id:08d}'
+        profile.referral_code = code
+        profile.save(update_fields=['referral_code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_profile_email_verified'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(uppercase_referral_codes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='profile',
+            constraint=models.CheckConstraint(condition=models.Q(('referral_code', django.db.models.functions.text.Upper('referral_code'))), name='profile_referral_code_upper'),
+        ),
+    ]
@@ -1,10 +1,13 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import IntegrityError
-from django.db import models
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
+from django.db.models.functions import Upper
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.utils.crypto import get_random_string
+
+from apps.accounts.referral_codes import normalize_referral_code, referral_code_cache_key, referral_code_for_user_id
 
 
 class Profile(models.Model):
@@ -18,46 +21,84 @@ class Profile(models.Model):
     is_kyc_verified = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [models.CheckConstraint(condition=Q(referral_code=Upper('referral_code')), name='profile_referral_code_upper')]
+
     def __str__(self) -> str:
         return f'Profile<{self.user.username}>'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so a changed code can have its cached lookup dropped after the save.
+        instance._loaded_referral_code = instance.__dict__.get('referral_code')
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.referral_code = normalize_referral_code(self.referral_code)
+        super().save(*args, **kwargs)
+
+
+def generate_referral_code(user_id: int) -> str:
+    return referral_code_for_user_id(user_id)
+
+
+def fallback_referral_code(user_id: int) -> str:
+    """Code used when the derived one is already taken by a legacy, edited or differently keyed code."""
+    return f'USR{user_id:08d}'
+
 
-def generate_referral_code() -> str:
-    return get_random_string(10).upper()
+def create_profile(profile: Profile) -> Profile:
+    """Insert ``profile`` with its derived referral code, falling back to ``fallback_referral_code`` on a clash."""
+    user_id = profile.user.pk
+    profile.referral_code = generate_referral_code(user_id)
+    try:
+        with transaction.atomic():
+            profile.save(force_insert=True)
+    except IntegrityError:
+        profile.referral_code = fallback_referral_code(user_id)
+        profile.save(force_insert=True)
+    return profile
 
 
 @receiver(post_save, sender=get_user_model())
 def ensure_user_profile(sender, instance, created, **kwargs):
-    if not created:
+    if not created or getattr(instance, '_onboarding', False):
         return
+    create_profile(Profile(user=instance))
+
+
+def _forget_referral_codes(profile: Profile) -> None:
+    codes = {profile.referral_code, getattr(profile, '_loaded_referral_code', None)}
+    cache.delete_many([referral_code_cache_key(code) for code in codes if code])
+
+
+@receiver(post_save, sender=Profile)
+def forget_cached_referral_codes(sender, instance, created, update_fields=None, **kwargs):
+    # Drop a cached miss so a code is usable as soon as its profile exists, and the cached owner of a replaced code.
+    if created or update_fields is None or 'referral_code' in update_fields:
+        _forget_referral_codes(instance)
+        instance._loaded_referral_code = instance.referral_code
 
-    for _ in range(5):
-        code = generate_referral_code()
-        try:
-            Profile.objects.create(user=instance, referral_code=code)
-            return
-        except IntegrityError:
-            continue
 
-    Profile.objects.create(user=instance, referral_code=f'USR{instance.pk:08d}')
+@receiver(post_delete, sender=Profile)
+def forget_deleted_referral_code(sender, instance, **kwargs):
+    _forget_referral_codes(instance)
 
 
 @receiver(post_save, sender=Profile)
-def sync_referral_record_and_bonus(sender, instance, **kwargs):
-    if instance.referred_by:
-        from apps.referrals.models import Referral
-
-        Referral.objects.get_or_create(
-            referee=instance.user,
-            defaults={
-                'referrer': instance.referred_by,
-                'referral_code_used': instance.referred_by.profile.referral_code if hasattr(instance.referred_by, 'profile') else '',
-            },
-        )
-
-    if not instance.email_verified:
+def sync_referral_record_and_bonus(sender, instance, update_fields=None, **kwargs):
+    if not instance.referred_by_id or getattr(instance, '_onboarding', False):
         return
 
-    from apps.referrals.services import evaluate_referral_bonus
+    from apps.referrals.services import ensure_referral, evaluate_referral_bonus, mark_referral_condition
+
+    user = instance.user
+    if update_fields is None or 'referred_by' in update_fields:
+        _, created = ensure_referral(user, instance)
+        if created:
+            evaluate_referral_bonus(user)
+            return
 
-    evaluate_referral_bonus(instance.user)
+    if instance.email_verified and (update_fields is None or 'email_verified' in update_fields):
+        mark_referral_condition(user, 'email_met')
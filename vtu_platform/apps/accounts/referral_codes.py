@@ -0,0 +1,76 @@
+"""Referral code generation and lookup.
+
+Codes are a keyed Feistel permutation of the user id rendered in Crockford base32, so every user gets a
+distinct, non-sequential 8 character code. Only a code that was set some other way (a legacy or edited code,
+or one derived under a previous ``REFERRAL_CODE_KEY``) can clash with it, in which case ``create_profile``
+falls back to ``USR<id>``. Stored codes are always uppercase; lookups normalize the input and are cached,
+including misses, so mistyped codes do not hit the database. Saving or deleting a profile drops its cached codes.
+"""
+from __future__ import annotations
+
+import hashlib
+import hmac
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+CODE_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+CODE_BITS = 40
+CODE_LENGTH = CODE_BITS // 5
+_HALF_BITS = CODE_BITS // 2
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+
+LOOKUP_CACHE_TIMEOUT = 60 * 60
+MISS_CACHE_TIMEOUT = 60
+
+
+def normalize_referral_code(code: str | None) -> str:
+    return re.sub(r'[\s-]+', '', code or '').upper()
+
+
+def _permutation_key() -> bytes:
+    return (settings.REFERRAL_CODE_KEY or settings.SECRET_KEY).encode()
+
+
+def _round_function(key: bytes, round_number: int, value: int) -> int:
+    digest = hmac.new(key, f'{round_number}:{value}'.encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:4], 'big') & _HALF_MASK
+
+
+def permute_user_id(user_id: int) -> int:
+    """Keyed bijection on ``[0, 2**40)``; distinct ids always give distinct results."""
+    if not 0 <= user_id < 1 << CODE_BITS:
+        raise ValueError(f'User id {user_id} is outside the referral code space.')
+    key = _permutation_key()
+    left, right = user_id >> _HALF_BITS, user_id & _HALF_MASK
+    for round_number in range(_ROUNDS):
+        left, right = right, left ^ _round_function(key, round_number, right)
+    return (left << _HALF_BITS) | right
+
+
+def referral_code_for_user_id(user_id: int) -> str:
+    value = permute_user_id(user_id)
+    return ''.join(CODE_ALPHABET[(value >> shift) & 31] for shift in range(CODE_BITS - 5, -1, -5))
+
+
+def referral_code_cache_key(code: str) -> str:
+    return f'referral-code:{code}'
+
+
+def lookup_referrer_id(code: str | None) -> int | None:
+    """User id owning ``code``, or ``None``; hits and misses are both cached."""
+    code = normalize_referral_code(code)
+    if not code:
+        return None
+    key = referral_code_cache_key(code)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached or None
+
+    from apps.accounts.models import Profile
+
+    user_id = Profile.objects.filter(referral_code=code).values_list('user_id', flat=True).first()
+    cache.set(key, user_id or 0, LOOKUP_CACHE_TIMEOUT if user_id else MISS_CACHE_TIMEOUT)
+    return user_id
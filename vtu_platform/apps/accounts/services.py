@@ -0,0 +1,38 @@
+from django.db import transaction
+
+from apps.accounts.models import Profile, create_profile
+from apps.accounts.referral_codes import normalize_referral_code
+
+
+@transaction.atomic
+def onboard_user(user, referrer_id: int | None = None, referral_code: str | None = None):
+    """Save a new ``user`` with its profile and referral in one transaction.
+
+    ``referrer_id`` must already be resolved (``SignUpForm`` does this); ``referral_code`` is only recorded on
+    the referral. The per-row signal handlers are told to stand down (``_onboarding``) while everything they
+    would derive is written here directly; Monnify provisioning is still only enqueued after commit.
+    """
+    from apps.referrals.models import Referral
+    from apps.referrals.services import bonus_reference_for
+
+    user._onboarding = True
+    profile = Profile(user=user, referred_by_id=referrer_id)
+    profile._onboarding = True
+    try:
+        user.save()
+        create_profile(profile)
+
+        if referrer_id:
+            # A brand new user has no funding, purchases or verified email yet, so every flag starts false.
+            referral = Referral(
+                referrer_id=referrer_id,
+                referee=user,
+                referral_code_used=normalize_referral_code(referral_code)[:20],
+                bonus_reference=bonus_reference_for(user.pk),
+            )
+            referral._onboarding = True
+            referral.save(force_insert=True)
+    finally:
+        # The returned instances are reused by callers, whose later saves must run the handlers again.
+        user._onboarding = profile._onboarding = False
+    return user
@@ -1,7 +1,21 @@
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
 
 from apps.accounts.models import Profile
+from apps.accounts.referral_codes import lookup_referrer_id, referral_code_for_user_id
+from apps.accounts.services import onboard_user
+from apps.ledger.models import LedgerEntry, Wallet
+from apps.payments.models import ReservedAccountProvisioning
+from apps.referrals.models import Referral, ReferralPath, ReferralStats
 
 
 class SignUpReferralTests(TestCase):
@@ -24,3 +38,196 @@ class SignUpReferralTests(TestCase):
         user = get_user_model().objects.get(username='new-user')
         self.assertEqual(user.profile.referred_by, referrer)
         self.assertTrue(Profile.objects.filter(user=user, referral_code__isnull=False).exists())
+
+
+class ReferralCodeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_codes_are_distinct_uppercase_permutations_of_the_user_id(self):
+        codes = {referral_code_for_user_id(user_id) for user_id in range(1, 5001)}
+
+        self.assertEqual(len(codes), 5000)
+        self.assertTrue(all(len(code) == 8 and code == code.upper() for code in codes))
+        user = get_user_model().objects.create_user(username='coded', password='secret123')
+        self.assertEqual(user.profile.referral_code, referral_code_for_user_id(user.pk))
+
+    def test_lookup_normalizes_and_caches_hits_and_misses(self):
+        referrer = get_user_model().objects.create_user(username='code-owner', password='secret123')
+        code = referrer.profile.referral_code
+
+        with self.assertNumQueries(1):
+            self.assertEqual(lookup_referrer_id(f' {code.lower()} '), referrer.pk)
+            self.assertEqual(lookup_referrer_id(code), referrer.pk)
+        with self.assertNumQueries(1):
+            self.assertIsNone(lookup_referrer_id('NOPE1234'))
+            self.assertIsNone(lookup_referrer_id('nope-1234'))
+
+    def test_lowercase_codes_are_stored_uppercase(self):
+        user = get_user_model().objects.create_user(username='legacy', password='secret123')
+        user.profile.referral_code = 'legacy-abc'
+        user.profile.save(update_fields=['referral_code'])
+
+        self.assertEqual(Profile.objects.get(user=user).referral_code, 'LEGACYABC')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Profile.objects.filter(user=user).update(referral_code='lower')
+
+    def test_clashing_derived_code_falls_back_to_the_user_id(self):
+        legacy = get_user_model().objects.create_user(username='legacy-owner', password='secret123')
+        legacy.profile.referral_code = referral_code_for_user_id(legacy.pk + 1)
+        legacy.profile.save(update_fields=['referral_code'])
+        second = get_user_model()(username='clash-a', email='clash-a@example.com')
+        second.set_password('Strongpass123!')
+
+        with self.captureOnCommitCallbacks():
+            user = onboard_user(second)
+        self.assertEqual(user.pk, legacy.pk + 1)
+        self.assertEqual(Profile.objects.get(user=user).referral_code, f'USR{user.pk:08d}')
+
+        legacy.profile.referral_code = referral_code_for_user_id(user.pk + 1)
+        legacy.profile.save(update_fields=['referral_code'])
+        signal_user = get_user_model().objects.create_user(username='clash-b', password='secret123')
+        self.assertEqual(signal_user.profile.referral_code, f'USR{signal_user.pk:08d}')
+
+    def test_changing_or_deleting_a_code_drops_its_cached_owner(self):
+        user = get_user_model().objects.create_user(username='renamed', password='secret123')
+        old_code = user.profile.referral_code
+        self.assertEqual(lookup_referrer_id(old_code), user.pk)
+
+        profile = Profile.objects.get(user=user)
+        profile.referral_code = 'RENAMED1'
+        profile.save(update_fields=['referral_code'])
+        self.assertIsNone(lookup_referrer_id(old_code))
+        self.assertEqual(lookup_referrer_id('RENAMED1'), user.pk)
+
+        user.delete()
+        self.assertIsNone(lookup_referrer_id('RENAMED1'))
+
+
+class OnboardingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.referrer = get_user_model().objects.create_user(username='onboard-referrer', password='secret123')
+
+    def _new_user(self, username):
+        user = get_user_model()(username=username, email=f'{username}@example.com')
+        user.set_password('Strongpass123!')
+        return user
+
+    def test_onboarding_writes_user_profile_and_referral_together(self):
+        code = self.referrer.profile.referral_code
+
+        # user, provisioning row, profile (in its own savepoint), referral, stats counter and closure rows, inside one savepoint.
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(13):
+            user = onboard_user(self._new_user('onboarded'), referrer_id=self.referrer.pk, referral_code=code.lower())
+
+        referral = Referral.objects.get(referee=user)
+        self.assertEqual(user.profile.referred_by_id, self.referrer.pk)
+        self.assertEqual((referral.referral_code_used, referral.bonus_reference), (code, f'REF-BONUS-{user.pk}'))
+        self.assertEqual(ReferralStats.objects.get(referrer=self.referrer).total, 1)
+        self.assertTrue(ReferralPath.objects.filter(ancestor=self.referrer, descendant=user, depth=1).exists())
+        self.assertEqual(len(callbacks), 1)
+        # Later saves of the returned instances go through the signal handlers again.
+        self.assertFalse(user._onboarding or user.profile._onboarding)
+        user.profile.email_verified = True
+        user.profile.save(update_fields=['email_verified'])
+        self.assertTrue(Referral.objects.get(referee=user).email_met)
+
+    def test_signup_view_uses_the_validated_referrer(self):
+        code = self.referrer.profile.referral_code
+        data = {'username': 'viewer', 'email': 'viewer@example.com', 'password1': 'Strongpass123!', 'password2': 'Strongpass123!'}
+        self.client.post('/accounts/signup/', {**data, 'referral_code': f' {code.lower()} '})
+
+        referral = Referral.objects.get(referee__username='viewer')
+        self.assertEqual((referral.referrer, referral.referral_code_used), (self.referrer, code))
+
+    def test_onboarding_without_referrer_skips_referral_work(self):
+        with self.captureOnCommitCallbacks(), self.assertNumQueries(7):
+            user = onboard_user(self._new_user('solo'))
+
+        self.assertEqual(user.profile.referral_code, referral_code_for_user_id(user.pk))
+        self.assertFalse(Referral.objects.filter(referee=user).exists())
+
+
+class ImportUsersTests(TestCase):
+    def setUp(self):
+        self.partner = get_user_model().objects.create_user(username='partner', password='secret123')
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name, 'users.csv')
+        self.path.write_text(
+            'username,email,phone,referrer_username,referral_code,opening_balance\n'
+            'imp-1,imp1@example.com,0801,,,250.00\n'
+            f'imp-2,imp2@example.com,0802,,{self.partner.profile.referral_code.lower()},\n'
+            'imp-3,imp3@example.com,0803,imp-1,,100\n'
+            'imp-1,dupe@example.com,0804,,,999\n'
+            'imp-4,imp4@example.com,0805,imp-3,,\n'
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_import_creates_related_rows_in_chunks(self):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            call_command('import_users', str(self.path), '--chunk-size', '2', stdout=out)
+
+        self.assertIn('imported=4, skipped=1, referrals=3', out.getvalue())
+        self.assertEqual(callbacks, [])
+        users = get_user_model().objects.filter(username__startswith='imp-')
+        self.assertEqual(Profile.objects.filter(user__in=users).count(), 4)
+        imp1, imp3, imp4 = (users.get(username=name) for name in ('imp-1', 'imp-3', 'imp-4'))
+        self.assertEqual(imp1.profile.referral_code, referral_code_for_user_id(imp1.pk))
+        self.assertEqual(users.get(username='imp-2').profile.referred_by, self.partner)
+        self.assertEqual(Wallet.objects.get(user=imp1).balance, Decimal('250.00'))
+        self.assertEqual(LedgerEntry.objects.get(reference=f'IMPORT-OPENING-{imp1.pk}').amount, Decimal('250.00'))
+        self.assertEqual(Wallet.objects.get(user=users.get(username='imp-2')).balance, Decimal('0.00'))
+        self.assertEqual(
+            ReservedAccountProvisioning.objects.filter(user__in=users, status=ReservedAccountProvisioning.Status.PENDING).count(), 4
+        )
+        self.assertEqual(ReferralStats.objects.get(referrer=imp1).total, 1)
+        self.assertTrue(ReferralPath.objects.filter(ancestor=imp1, descendant=imp4, depth=2).exists())
+
+    def test_dry_run_writes_nothing(self):
+        call_command('import_users', str(self.path), '--dry-run', stdout=StringIO())
+
+        self.assertFalse(get_user_model().objects.filter(username__startswith='imp-').exists())
+
+    def test_dry_run_rejects_bad_rows_before_any_chunk_is_written(self):
+        with self.path.open('a') as handle:
+            handle.write('imp-5,imp5@example.com,0806,,,lots\n')
+
+        with self.assertRaisesMessage(CommandError, "Invalid opening_balance 'lots' for imp-5."):
+            call_command('import_users', str(self.path), '--dry-run', stdout=StringIO())
+        self.assertFalse(get_user_model().objects.filter(username__startswith='imp-').exists())
+
+    def test_clashing_derived_code_gets_the_fallback_code(self):
+        self.path.write_text('username,email,phone,referrer_username,referral_code,opening_balance\nimp-1,imp1@example.com,0801,,,\n')
+        self.partner.profile.referral_code = referral_code_for_user_id(self.partner.pk + 1)
+        self.partner.profile.save(update_fields=['referral_code'])
+
+        call_command('import_users', str(self.path), stdout=StringIO())
+
+        imp1 = get_user_model().objects.get(username='imp-1')
+        self.assertEqual((imp1.pk, imp1.profile.referral_code), (self.partner.pk + 1, f'USR{imp1.pk:08d}'))
+
+    @override_settings(REFERRAL_MIN_FUND=100.0)
+    def test_single_chunk_builds_chained_paths_and_funding_flags(self):
+        ReferralPath.objects.create(ancestor=get_user_model().objects.create_user(username='grand'), descendant=self.partner, depth=1)
+        call_command('import_users', str(self.path), '--chunk-size', '10', stdout=StringIO())
+
+        users = {user.username: user for user in get_user_model().objects.filter(username__startswith='imp-')}
+        self.assertEqual(
+            set(ReferralPath.objects.filter(descendant__in=users.values()).values_list('ancestor__username', 'descendant__username', 'depth')),
+            {('grand', 'imp-2', 2), ('partner', 'imp-2', 1), ('imp-1', 'imp-3', 1), ('imp-3', 'imp-4', 1), ('imp-1', 'imp-4', 2)},
+        )
+        # imp-3 opened with 100, which meets REFERRAL_MIN_FUND; imp-2 and imp-4 opened with nothing.
+        self.assertTrue(Referral.objects.get(referee=users['imp-3']).funding_met)
+        self.assertFalse(Referral.objects.filter(referee__in=[users['imp-2'], users['imp-4']], funding_met=True).exists())
+
+    def test_existing_tree_and_stats_are_extended_not_rebuilt(self):
+        ReferralStats.objects.create(referrer=self.partner, total=7, pending=7)
+        call_command('import_users', str(self.path), stdout=StringIO())
+
+        self.assertEqual(ReferralStats.objects.get(referrer=self.partner).total, 8)
+        imp1 = get_user_model().objects.get(username='imp-1')
+        self.assertEqual(ReferralStats.objects.get(referrer=imp1).pending, 1)
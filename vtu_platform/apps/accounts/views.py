@@ -3,6 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect, render
 
 from apps.accounts.forms import SignUpForm
+from apps.accounts.services import onboard_user
 
 
 @login_required
@@ -21,12 +22,7 @@ def signup(request):
     if request.method == 'POST' and form.is_valid():
         user = form.save(commit=False)
         user.email = form.cleaned_data['email']
-        user.save()
-
-        referrer = form.cleaned_data.get('referral_code')
-        if referrer:
-            user.profile.referred_by = referrer
-            user.profile.save(update_fields=['referred_by'])
+        onboard_user(user, referrer_id=form.cleaned_data['referral_code'], referral_code=form.referral_code_used)
 
         login(request, user)
         return redirect('core:home')
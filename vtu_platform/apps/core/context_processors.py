@@ -1,5 +1,5 @@
-from .models import SiteSetting
+from .site_settings import get_site_settings
 
 
 def site_context(request):
-    return {'site_settings': SiteSetting.objects.first()}
+    return {'site_settings': get_site_settings()}
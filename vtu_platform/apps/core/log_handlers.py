@@ -0,0 +1,103 @@
+"""Logging helpers referenced from ``config.settings.base.LOGGING``; this module must not import models."""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import random
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+
+class DeferredLogArg:
+    """Base for log arguments that are cheap to keep and safe to render on the listener thread.
+
+    Subclasses must hold an immutable snapshot of their data and never touch the database when formatted.
+    """
+
+    __slots__ = ()
+
+
+_DEFERRABLE_ARGS = (str, int, float, bool, type(None), DeferredLogArg)
+
+
+class _DrainingQueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        # The queue is bounded; wait for room rather than losing the stop signal.
+        self.queue.put(self._sentinel, timeout=5)
+
+
+class QueueListenerHandler(QueueHandler):
+    """Hand records to a background thread that writes them to ``handlers``.
+
+    Request threads only ``put_nowait`` the record. The message is rendered in the caller unless every argument
+    is a plain scalar or a ``DeferredLogArg`` (such as lazy payload redaction), in which case formatting runs on
+    the listener thread; model instances and mutable containers are never rendered late. When the queue is full the record is counted in ``dropped`` instead of blocking.
+    Configure it with ``'()'`` rather than ``'class'``: targets are referenced as ``cfg://handlers.<name>`` and
+    must sort before this handler's name so ``dictConfig`` has built them first.
+    """
+
+    def __init__(self, handlers, queue_size: int = 10000, respect_handler_level: bool = True):
+        targets = [handlers[index] for index in range(len(handlers))]
+        for target in targets:
+            if not isinstance(target, logging.Handler):
+                # dictConfig retries handlers whose error mentions this phrase once the rest are built.
+                raise ValueError('target not configured yet')
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.targets = targets
+        self.respect_handler_level = respect_handler_level
+        self.dropped = 0
+        self._listener = None
+        self._listener_pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._listener_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._listener_pid == os.getpid():
+                return
+            # Listener threads do not survive fork, so each worker process starts its own.
+            self._listener = _DrainingQueueListener(self.queue, *self.targets, respect_handler_level=self.respect_handler_level)
+            self._listener.start()
+            self._listener_pid = os.getpid()
+            atexit.register(self.stop_listener)
+
+    def prepare(self, record):
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, _DEFERRABLE_ARGS) for arg in args)):
+            # Rendered now: later the arguments may have changed, or need a DB connection the listener never closes.
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop_listener(self):
+        listener, self._listener = self._listener, None
+        if listener and self._listener_pid == os.getpid():
+            listener.stop()
+        self._listener_pid = None
+
+    def close(self):
+        self.stop_listener()
+        super().close()
+
+
+class SampleFilter(logging.Filter):
+    """Keep only ``rate`` of the records logged with ``extra={'log_sample': True}``; others always pass."""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if self.rate >= 1 or not getattr(record, 'log_sample', False):
+            return True
+        return random.random() < self.rate
@@ -0,0 +1,305 @@
+"""In-process provider call metrics rendered in the Prometheus text format.
+
+Each process aggregates into plain dicts under a lock. With ``METRICS_DIR`` set, a background thread
+periodically writes the process snapshot to ``<METRICS_DIR>/metrics-<pid>-<token>.json`` and the metrics
+view merges every snapshot in the directory, so all Gunicorn workers are reported whichever one is scraped.
+The token keeps a reused PID from overwriting its predecessor's file. A worker folds its totals into
+``<METRICS_DIR>/retired.json`` on exit, and files not rewritten within ``METRICS_STALE_AFTER`` seconds (crashed
+workers) are folded in by the next scrape, so merged counters never go down when workers are recycled.
+"""
+from __future__ import annotations
+
+import atexit
+import contextlib
+import json
+import logging
+import math
+import os
+import re
+import secrets
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RETIRED_SNAPSHOT = 'retired.json'
+# Any segment with a digit (except API versions such as v1) or an uppercase reference prefix is an object id.
+_ID_SEGMENT = re.compile(r'/(?!v\d+(?:/|$))(?:[^/]*\d[^/]*|[A-Z]{2,}[-_][\w-]+)(?=/|$)')
+
+
+def normalize_endpoint(path: str) -> str:
+    """Collapse ids and references in URL paths so label cardinality stays bounded."""
+    return _ID_SEGMENT.sub('/:id', path.split('?', 1)[0]) or '/'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, str, str], list] = {}
+        self._retries: dict[tuple[str, str], int] = {}
+        self._flusher: threading.Thread | None = None
+        self._flusher_pid: int | None = None
+        self._snapshot_name: str | None = None
+        self._written: dict | None = None
+
+    def reset(self) -> None:
+        # Runs in forked children, where the inherited lock may be held by a thread that no longer exists.
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._retries = {}
+        self._flusher = None
+        self._flusher_pid = None
+        self._snapshot_name = None
+        self._written = None
+
+    @property
+    def snapshot_name(self) -> str:
+        if self._snapshot_name is None:
+            self._snapshot_name = f'metrics-{os.getpid()}-{secrets.token_hex(4)}.json'
+        return self._snapshot_name
+
+    def observe_provider_call(self, provider: str, endpoint: str, status: str, seconds: float, retries: int = 0) -> None:
+        key = (provider, normalize_endpoint(endpoint), status)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram[0][index] += 1
+                    break
+            histogram[1] += seconds
+            histogram[2] += 1
+            if retries:
+                self._retries[key[:2]] = self._retries.get(key[:2], 0) + retries
+        self._ensure_flusher()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'histograms': [[*key, list(buckets), total, count] for key, (buckets, total, count) in self._histograms.items()],
+                'retries': [[*key, count] for key, count in self._retries.items()],
+            }
+
+    def _ensure_flusher(self) -> None:
+        metrics_dir = getattr(settings, 'METRICS_DIR', '')
+        if not metrics_dir or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            self._flusher = threading.Thread(target=self._flush_loop, args=(Path(metrics_dir),), name='metrics-flusher', daemon=True)
+            self._flusher.start()
+        atexit.register(self._retire_at_exit, Path(metrics_dir), os.getpid())
+
+    def _flush_loop(self, metrics_dir: Path) -> None:
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0)
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush(metrics_dir)
+            except OSError:
+                logger.exception('Failed to write metrics snapshot to %s', metrics_dir)
+
+    def _drop_retired_totals(self, metrics_dir: Path) -> None:
+        # A scrape folded our last written snapshot into the retired totals; keep counting from there only.
+        if self._written is None or (metrics_dir / self.snapshot_name).exists():
+            return
+        retired = merge_snapshots([self._written])
+        with self._lock:
+            for key, (buckets, total, count) in retired['histograms'].items():
+                histogram = self._histograms[key]
+                histogram[0] = [left - right for left, right in zip(histogram[0], buckets)]
+                histogram[1] -= total
+                histogram[2] -= count
+            for key, count in retired['retries'].items():
+                self._retries[key] -= count
+        self._written = None
+
+    def flush(self, metrics_dir: Path) -> None:
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        with _directory_lock(metrics_dir):
+            self._drop_retired_totals(metrics_dir)
+            snapshot = self.snapshot()
+            _write_json(metrics_dir / self.snapshot_name, snapshot)
+            self._written = snapshot
+
+    def retire(self, metrics_dir: Path) -> None:
+        """Fold this process's totals into the retired snapshot and remove its own file."""
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        with _directory_lock(metrics_dir):
+            self._drop_retired_totals(metrics_dir)
+            _fold_into_retired(metrics_dir, self.snapshot())
+            (metrics_dir / self.snapshot_name).unlink(missing_ok=True)
+            self._written = None
+
+    def _retire_at_exit(self, metrics_dir: Path, pid: int) -> None:
+        # atexit handlers survive fork; only the process that registered this one owns the file.
+        if os.getpid() != pid:
+            return
+        try:
+            self.retire(metrics_dir)
+        except (OSError, ValueError):
+            logger.warning('Failed to retire metrics snapshot in %s', metrics_dir)
+
+
+@contextlib.contextmanager
+def _directory_lock(metrics_dir: Path):
+    """Serialize writers of one metrics directory across processes so a snapshot is never folded twice."""
+    if fcntl is None:
+        yield
+        return
+    with open(metrics_dir / '.lock', 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _write_json(target: Path, data: dict) -> None:
+    temp = target.with_suffix('.tmp')
+    temp.write_text(json.dumps(data))
+    os.replace(temp, target)
+
+
+def _read_snapshot(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+
+
+def _fold_into_retired(metrics_dir: Path, snapshot: dict) -> None:
+    retired = metrics_dir / RETIRED_SNAPSHOT
+    merged = merge_snapshots([_read_snapshot(retired) or {}, snapshot])
+    _write_json(
+        retired,
+        {
+            'histograms': [[*key, buckets, total, count] for key, (buckets, total, count) in merged['histograms'].items()],
+            'retries': [[*key, count] for key, count in merged['retries'].items()],
+        },
+    )
+
+
+registry = MetricsRegistry()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.reset)
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list (0.0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def transport_retries(response) -> int:
+    """Number of urllib3-level retries behind a ``requests`` response (0 when unavailable)."""
+    retries = getattr(getattr(response, 'raw', None), 'retries', None)
+    return len(getattr(retries, 'history', None) or ())
+
+
+def record_provider_call(provider: str, endpoint: str, status: str, seconds: float, retries: int = 0) -> None:
+    registry.observe_provider_call(provider, endpoint, status, seconds, retries)
+
+
+def collect_snapshots() -> list[dict]:
+    snapshots = [registry.snapshot()]
+    metrics_dir = getattr(settings, 'METRICS_DIR', '')
+    if not metrics_dir:
+        return snapshots
+    metrics_dir = Path(metrics_dir)
+    stale_before = time.time() - getattr(settings, 'METRICS_STALE_AFTER', 60.0)
+    for path in sorted(metrics_dir.glob('metrics-*.json')):
+        if path.name == registry.snapshot_name:
+            continue
+        try:
+            if path.stat().st_mtime < stale_before:
+                _retire_stale_snapshot(metrics_dir, path, stale_before)
+                continue
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            logger.warning('Skipping unreadable metrics snapshot %s', path)
+    try:
+        retired = _read_snapshot(metrics_dir / RETIRED_SNAPSHOT)
+    except (OSError, ValueError):
+        logger.warning('Skipping unreadable retired metrics snapshot in %s', metrics_dir)
+        retired = None
+    if retired:
+        snapshots.append(retired)
+    return snapshots
+
+
+def _retire_stale_snapshot(metrics_dir: Path, path: Path, stale_before: float) -> None:
+    # Left behind by a worker that died without running its exit hook; its totals must keep counting.
+    with _directory_lock(metrics_dir):
+        snapshot = _read_snapshot(path)
+        # Re-checked under the lock: another scrape may have folded it, or the worker may have written since.
+        if snapshot is None or path.stat().st_mtime >= stale_before:
+            return
+        _fold_into_retired(metrics_dir, snapshot)
+        path.unlink()
+
+
+def merge_snapshots(snapshots: list[dict]) -> dict:
+    """Sum snapshots into ``{'histograms': {key: [buckets, total, count]}, 'retries': {key: count}}``."""
+    histograms: dict[tuple, list] = {}
+    retries: dict[tuple, int] = {}
+    for snapshot in snapshots:
+        for provider, endpoint, status, buckets, total, count in snapshot.get('histograms', []):
+            merged = histograms.setdefault((provider, endpoint, status), [[0] * len(LATENCY_BUCKETS), 0.0, 0])
+            merged[0] = [left + right for left, right in zip(merged[0], buckets)]
+            merged[1] += total
+            merged[2] += count
+        for provider, endpoint, count in snapshot.get('retries', []):
+            retries[(provider, endpoint)] = retries.get((provider, endpoint), 0) + count
+    return {'histograms': histograms, 'retries': retries}
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def render_prometheus(snapshots: list[dict]) -> str:
+    merged = merge_snapshots(snapshots)
+    histograms, retries = merged['histograms'], merged['retries']
+
+    lines = [
+        '# HELP provider_request_duration_seconds Outbound provider API call latency.',
+        '# TYPE provider_request_duration_seconds histogram',
+    ]
+    for (provider, endpoint, status), (buckets, total, count) in sorted(histograms.items()):
+        cumulative = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+            cumulative += bucket_count
+            labels = _labels(provider=provider, endpoint=endpoint, status=status, le=f'{bound:g}')
+            lines.append(f'provider_request_duration_seconds_bucket{labels} {cumulative}')
+        labels = _labels(provider=provider, endpoint=endpoint, status=status, le='+Inf')
+        lines.append(f'provider_request_duration_seconds_bucket{labels} {count}')
+        labels = _labels(provider=provider, endpoint=endpoint, status=status)
+        lines.append(f'provider_request_duration_seconds_sum{labels} {total:.6f}')
+        lines.append(f'provider_request_duration_seconds_count{labels} {count}')
+
+    lines += [
+        '# HELP provider_request_retries_total Transport-level retries performed for provider API calls.',
+        '# TYPE provider_request_retries_total counter',
+    ]
+    for (provider, endpoint), count in sorted(retries.items()):
+        lines.append(f'provider_request_retries_total{_labels(provider=provider, endpoint=endpoint)} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from apps.core.profiling import QueryRecorder, RequestProfile, slow_requests
+from apps.core.site_settings import maintenance_mode
+
+STAFF_COOKIE = 'vtu_staff'
+STAFF_COOKIE_SALT = 'apps.core.middleware.staff'
+
+
+def _matches(path: str, prefixes) -> bool:
+    return any(path.startswith(prefix) for prefix in prefixes)
+
+
+def has_staff_cookie(request) -> bool:
+    """Whether the request carries a valid staff cookie; checked without loading the session or user.
+
+    The cookie signs the session key it was issued for, so it only counts next to that session cookie, and it
+    expires after ``MAINTENANCE_STAFF_COOKIE_AGE`` unless a request that re-checks the user renews it.
+    """
+    try:
+        session_key = request.get_signed_cookie(STAFF_COOKIE, salt=STAFF_COOKIE_SALT, max_age=settings.MAINTENANCE_STAFF_COOKIE_AGE)
+    except (KeyError, signing.BadSignature):
+        return False
+    return bool(session_key) and session_key == request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+
+
+class MaintenanceModeMiddleware:
+    """Answer non-staff traffic with a static 503 while ``SiteSetting.maintenance_mode`` is on.
+
+    Sits before the session middleware, so shed requests never load a session or user. Staff are recognised
+    by a short-lived signed cookie bound to their session (see ``has_staff_cookie``); allowlisted paths pass through, and enqueue-only paths (webhooks) pass
+    with ``request.maintenance_mode`` set so their views can skip inline processing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._page = None
+
+    def __call__(self, request):
+        request.maintenance_mode = maintenance_mode()
+        if request.maintenance_mode and not self._allowed(request):
+            return self._unavailable()
+        response = self.get_response(request)
+        self._sync_staff_cookie(request, response)
+        return response
+
+    def _allowed(self, request) -> bool:
+        if _matches(request.path, settings.MAINTENANCE_ALLOWED_PATHS) or _matches(request.path, settings.MAINTENANCE_ENQUEUE_ONLY_PATHS):
+            return True
+        return has_staff_cookie(request)
+
+    def _unavailable(self) -> HttpResponse:
+        if self._page is None:
+            retry_minutes = max(1, round(settings.MAINTENANCE_RETRY_AFTER / 60))
+            self._page = render_to_string('core/maintenance.html', {'retry_minutes': retry_minutes})
+        response = HttpResponse(self._page, status=503)
+        response['Retry-After'] = str(settings.MAINTENANCE_RETRY_AFTER)
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    @staticmethod
+    def _sync_staff_cookie(request, response) -> None:
+        action = getattr(request, '_staff_cookie', None)
+        if action is None and STAFF_COOKIE in request.COOKIES:
+            # Re-check the user behind an existing cookie, so demoted or deactivated staff lose the bypass.
+            user = getattr(request, 'user', None)
+            if user is not None:
+                action = 'set' if has_staff_cookie(request) and user.is_active and user.is_staff else 'delete'
+        session = getattr(request, 'session', None)
+        if action == 'set' and session is not None and session.session_key:
+            response.set_signed_cookie(
+                STAFF_COOKIE,
+                session.session_key,
+                salt=STAFF_COOKIE_SALT,
+                max_age=settings.MAINTENANCE_STAFF_COOKIE_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        elif action in ('set', 'delete') and STAFF_COOKIE in request.COOKIES:
+            response.delete_cookie(STAFF_COOKIE, samesite='Lax')
+
+
+class ProfilingMiddleware:
+    """Count SQL statements, SQL time and duplicate queries for staff and a sample of other requests.
+
+    Removed from the chain at startup unless ``PROFILING_ENABLED`` is set. Requests slower than
+    ``PROFILING_SLOW_MS`` go to ``slow_requests``; only staff responses carry the ``Server-Timing`` header, so
+    sampled visitors never see internal timings.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        staff = settings.PROFILING_STAFF and has_staff_cookie(request)
+        sampled = settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE
+        if not (staff or sampled):
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        profile = RequestProfile(
+            method=request.method,
+            path=request.path,
+            status=response.status_code,
+            total_ms=(time.perf_counter() - started) * 1000,
+            sql_ms=recorder.seconds * 1000,
+            queries=recorder.count,
+            duplicates=recorder.duplicates,
+            repeated=recorder.most_repeated(),
+        )
+        if staff:
+            response['Server-Timing'] = profile.server_timing()
+        if profile.total_ms >= settings.PROFILING_SLOW_MS:
+            slow_requests.record(profile)
+        return response
+
+
+@receiver(user_logged_in)
+def issue_staff_cookie(sender, request, user, **kwargs):
+    if request is not None:
+        request._staff_cookie = 'set' if user.is_staff else 'delete'
+
+
+@receiver(user_logged_out)
+def revoke_staff_cookie(sender, request, **kwargs):
+    if request is not None:
+        request._staff_cookie = 'delete'
@@ -0,0 +1,88 @@
+"""Per-request SQL and timing profiles collected by ``ProfilingMiddleware``.
+
+Queries are observed through ``connection.execute_wrapper`` only for requests chosen for profiling; requests
+slower than ``PROFILING_SLOW_MS`` are kept in a bounded per-process ring buffer shown on the ops console.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.utils import timezone
+
+
+class QueryRecorder:
+    """``execute_wrapper`` callable counting statements, their time and repeats of the same SQL."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self) -> int:
+        return self.count - len(self.statements)
+
+    def most_repeated(self, limit: int = 3) -> list[tuple[str, int]]:
+        return [(sql, times) for sql, times in self.statements.most_common(limit) if times > 1]
+
+
+@dataclass
+class RequestProfile:
+    method: str
+    path: str
+    status: int
+    total_ms: float
+    sql_ms: float
+    queries: int
+    duplicates: int
+    repeated: list[tuple[str, int]] = field(default_factory=list)
+    recorded_at: object = field(default_factory=timezone.now)
+
+    @property
+    def app_ms(self) -> float:
+        return max(self.total_ms - self.sql_ms, 0.0)
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.sql_ms:.1f};desc="{self.queries} queries, {self.duplicates} duplicate", '
+            f'app;dur={self.app_ms:.1f}, total;dur={self.total_ms:.1f}'
+        )
+
+
+class SlowRequestBuffer:
+    """Thread-safe ring buffer keeping the most recent ``PROFILING_BUFFER_SIZE`` slow requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = None
+
+    def record(self, profile: RequestProfile) -> None:
+        with self._lock:
+            if self._samples is None:
+                self._samples = deque(maxlen=settings.PROFILING_BUFFER_SIZE)
+            self._samples.append(profile)
+
+    def samples(self) -> list[RequestProfile]:
+        """Newest first."""
+        with self._lock:
+            return list(reversed(self._samples or ()))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples = None
+
+
+slow_requests = SlowRequestBuffer()
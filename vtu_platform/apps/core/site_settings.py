@@ -0,0 +1,63 @@
+"""Cached access to the singleton ``SiteSetting`` row.
+
+Each process memoizes the row together with the version it was loaded under. The version lives in the shared
+Django cache (``CACHE_URL``) and is replaced whenever a ``SiteSetting`` is saved or deleted, so every process reloads
+on its next access; a steady-state read costs one cache ``get`` and no queries. The memo also expires after
+``SITE_SETTINGS_MEMO_TTL`` seconds, which bounds staleness when the cache is not shared between processes.
+"""
+from __future__ import annotations
+
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.core.models import SiteSetting
+
+VERSION_KEY = 'core:site-settings:version'
+
+_memo: tuple[str | None, float, SiteSetting | None] = (None, 0.0, None)
+
+
+def _current_version() -> str:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Cold or evicted cache: agree on a fresh version so every process reloads once.
+        cache.add(VERSION_KEY, uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_site_settings() -> SiteSetting | None:
+    global _memo
+    version = _current_version()
+    memo_version, loaded_at, site_settings = _memo
+    now = time.monotonic()
+    if version is not None and memo_version == version and now - loaded_at < settings.SITE_SETTINGS_MEMO_TTL:
+        return site_settings
+    site_settings = SiteSetting.objects.first()
+    _memo = (version, now, site_settings)
+    return site_settings
+
+
+def maintenance_mode() -> bool:
+    site_settings = get_site_settings()
+    return bool(site_settings and site_settings.maintenance_mode)
+
+
+def clear_site_settings_cache() -> None:
+    global _memo
+    _memo = (None, 0.0, None)
+    cache.set(VERSION_KEY, uuid4().hex, None)
+
+
+@receiver(post_save, sender=SiteSetting)
+@receiver(post_delete, sender=SiteSetting)
+def invalidate_site_settings(sender, **kwargs):
+    clear_site_settings_cache()
+    # Bump again once committed, or another process could cache the pre-commit row under the new version.
+    transaction.on_commit(clear_site_settings_cache)
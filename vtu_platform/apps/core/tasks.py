@@ -0,0 +1,220 @@
+"""Celery-compatible ``shared_task`` used when Celery is not installed.
+
+``TASK_BACKEND = 'sync'`` runs tasks inline in the caller; retries of inline runs are dropped, leaving periodic
+sweepers to pick the work up, but calls with a ``countdown`` go to the in-process scheduler so they never run early. ``TASK_BACKEND = 'thread'`` runs them on a bounded
+in-process thread pool with a delayed-job heap, so countdowns and ``self.retry()`` behave as they would
+on a broker, and pending jobs are drained on interpreter shutdown.
+"""
+from __future__ import annotations
+
+import atexit
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class Retry(Exception):
+    def __init__(self, countdown: float = 0, exc: BaseException | None = None):
+        super().__init__(f'Retry in {countdown}s')
+        self.countdown = countdown
+        self.exc = exc
+
+
+class MaxRetriesExceededError(Exception):
+    pass
+
+
+@dataclass
+class TaskRequest:
+    retries: int = 0
+
+
+@dataclass
+class BoundTask:
+    task: LocalTask
+    request: TaskRequest = field(default_factory=TaskRequest)
+
+    def retry(self, *, countdown: float | None = None, exc: BaseException | None = None, max_retries: Any = ..., **_options):
+        limit = self.task.max_retries if max_retries is ... else max_retries
+        if limit is not None and self.request.retries >= limit:
+            if exc is not None:
+                raise exc
+            raise MaxRetriesExceededError(f'{self.task.name} exceeded {limit} retries.')
+        raise Retry(countdown=self.task.default_retry_delay if countdown is None else countdown, exc=exc)
+
+
+@dataclass(order=True)
+class _Job:
+    run_at: float
+    seq: int
+    task: LocalTask = field(compare=False)
+    args: tuple = field(compare=False)
+    kwargs: dict = field(compare=False)
+    retries: int = field(default=0, compare=False)
+
+
+class LocalExecutor:
+    def __init__(self, *, max_workers: int = 4, max_queue: int = 1000):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='local-task')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._heap: list[_Job] = []
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._scheduler = threading.Thread(target=self._schedule_loop, name='local-task-scheduler', daemon=True)
+        self._scheduler.start()
+
+    def submit(self, task: LocalTask, args: tuple, kwargs: dict, *, countdown: float = 0, retries: int = 0) -> None:
+        job = _Job(time.monotonic() + max(countdown or 0, 0), next(self._seq), task, args, kwargs, retries)
+        with self._condition:
+            if self._closed:
+                logger.warning('Local task executor is shut down; dropping %s', task.name)
+                return
+            heapq.heappush(self._heap, job)
+            self._condition.notify()
+
+    def _schedule_loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed and (not self._heap or self._heap[0].run_at > time.monotonic()):
+                    timeout = self._heap[0].run_at - time.monotonic() if self._heap else None
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+                job = heapq.heappop(self._heap)
+            self._dispatch(job)
+
+    def _dispatch(self, job: _Job) -> None:
+        if self._slots.acquire(blocking=False):
+            self._pool.submit(self._run, job, True)
+        else:
+            # Pool and queue are saturated: apply back-pressure by running on the scheduler thread.
+            logger.warning('Local task queue full; running %s on the scheduler thread', job.task.name)
+            self._run(job, False)
+
+    def _run(self, job: _Job, release_slot: bool) -> None:
+        close_old_connections()
+        try:
+            job.task.run(job.args, job.kwargs, retries=job.retries)
+        except Retry as retry:
+            self.submit(job.task, job.args, job.kwargs, countdown=retry.countdown, retries=job.retries + 1)
+        except Exception:  # noqa: BLE001
+            logger.exception('Local task %s failed', job.task.name)
+        finally:
+            close_old_connections()
+            if release_slot:
+                self._slots.release()
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Stop scheduling, run jobs already due, wait for in-flight work and drop jobs still delayed."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            now = time.monotonic()
+            due = [job for job in self._heap if job.run_at <= now]
+            dropped = len(self._heap) - len(due)
+            self._heap.clear()
+            self._condition.notify_all()
+        self._scheduler.join(timeout)
+        for job in sorted(due):
+            if self._slots.acquire(blocking=False):
+                self._pool.submit(self._run, job, True)
+            else:
+                dropped += 1
+        if dropped:
+            logger.warning('Dropped %s local task(s) on shutdown; periodic sweepers will reschedule them.', dropped)
+
+        waiter = threading.Thread(target=self._pool.shutdown, kwargs={'wait': True}, daemon=True)
+        waiter.start()
+        waiter.join(timeout)
+        if waiter.is_alive():
+            logger.warning('Local task executor did not drain within %ss.', timeout)
+
+
+_executor: LocalExecutor | None = None
+_executor_pid: int | None = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> LocalExecutor:
+    global _executor, _executor_pid
+    with _executor_lock:
+        # Threads do not survive fork, so pre-fork servers build one executor per worker process.
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = LocalExecutor(
+                max_workers=getattr(settings, 'TASK_THREAD_WORKERS', 4),
+                max_queue=getattr(settings, 'TASK_THREAD_QUEUE_SIZE', 1000),
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def shutdown_executor() -> None:
+    with _executor_lock:
+        executor = _executor if _executor_pid == os.getpid() else None
+    if executor:
+        executor.shutdown(timeout=getattr(settings, 'TASK_SHUTDOWN_TIMEOUT', 10.0))
+
+
+atexit.register(shutdown_executor)
+
+
+class LocalTask:
+    def __init__(self, fn: Callable, *, bind: bool = False, max_retries: int | None = 3, default_retry_delay: float = 180):
+        self.fn = fn
+        self.name = f'{fn.__module__}.{fn.__name__}'
+        self.bind = bind
+        self.max_retries = max_retries
+        self.default_retry_delay = default_retry_delay
+        self.__wrapped__ = fn
+        self.__name__ = fn.__name__
+        self.__doc__ = fn.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.run(args, kwargs)
+
+    def run(self, args: tuple, kwargs: dict, *, retries: int = 0):
+        if self.bind:
+            return self.fn(BoundTask(self, TaskRequest(retries=retries)), *args, **kwargs)
+        return self.fn(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return self.apply_async(args=args, kwargs=kwargs)
+
+    def apply_async(self, args=(), kwargs=None, countdown: float | None = None, **_options):
+        kwargs = kwargs or {}
+        if getattr(settings, 'TASK_BACKEND', 'sync') == 'thread' or (countdown or 0) > 0:
+            get_executor().submit(self, tuple(args), kwargs, countdown=countdown or 0)
+            return None
+        try:
+            return self.run(tuple(args), kwargs)
+        except Retry:
+            logger.debug('Dropping retry of %s; the sync task backend cannot schedule work.', self.name)
+            return None
+
+
+def shared_task(*args, **options):
+    if len(args) == 1 and callable(args[0]) and not options:
+        return LocalTask(args[0])
+
+    def decorator(fn):
+        return LocalTask(
+            fn,
+            bind=options.get('bind', False),
+            max_retries=options.get('max_retries', 3),
+            default_retry_delay=options.get('default_retry_delay', 180),
+        )
+
+    return decorator
@@ -0,0 +1,404 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from apps.core import site_settings
+from apps.core.log_handlers import DeferredLogArg, QueueListenerHandler, SampleFilter, _DrainingQueueListener
+from apps.core.metrics import MetricsRegistry, _fold_into_retired, collect_snapshots, normalize_endpoint, registry, render_prometheus
+from apps.core.middleware import STAFF_COOKIE, STAFF_COOKIE_SALT, ProfilingMiddleware
+from apps.core.models import SiteSetting
+from apps.core.profiling import slow_requests
+from apps.core.site_settings import clear_site_settings_cache, get_site_settings, maintenance_mode
+from apps.core.tasks import LocalExecutor, shared_task
+
+
+class LocalTaskBackendTests(SimpleTestCase):
+    def test_countdown_jobs_run_after_immediate_ones(self):
+        executor = LocalExecutor(max_workers=1, max_queue=10)
+        calls = []
+        done = threading.Event()
+
+        @shared_task
+        def record(value):
+            calls.append(value)
+            if len(calls) == 2:
+                done.set()
+
+        executor.submit(record, ('delayed',), {}, countdown=0.05)
+        executor.submit(record, ('now',), {})
+        self.assertTrue(done.wait(2))
+        executor.shutdown(timeout=2)
+        self.assertEqual(calls, ['now', 'delayed'])
+
+    def test_retry_is_rescheduled_until_success(self):
+        executor = LocalExecutor(max_workers=2, max_queue=10)
+        attempts = []
+        done = threading.Event()
+
+        @shared_task(bind=True, max_retries=5)
+        def flaky(self):
+            attempts.append(self.request.retries)
+            if self.request.retries < 2:
+                raise self.retry(countdown=0.01)
+            done.set()
+
+        executor.submit(flaky, (), {})
+        self.assertTrue(done.wait(2))
+        executor.shutdown(timeout=2)
+        self.assertEqual(attempts, [0, 1, 2])
+
+    def test_shutdown_drains_due_jobs_and_drops_delayed(self):
+        executor = LocalExecutor(max_workers=1, max_queue=10)
+        calls = []
+
+        @shared_task
+        def record(value):
+            calls.append(value)
+
+        executor.submit(record, ('later',), {}, countdown=60)
+        for index in range(3):
+            executor.submit(record, (index,), {})
+        executor.shutdown(timeout=2)
+
+        self.assertEqual(sorted(calls), [0, 1, 2])
+
+    @override_settings(TASK_BACKEND='sync')
+    def test_sync_backend_runs_inline_and_drops_retries(self):
+        @shared_task(bind=True)
+        def always_retry(self):
+            raise self.retry(countdown=30)
+
+        @shared_task
+        def add(left, right):
+            return left + right
+
+        self.assertEqual(add.delay(2, 3), 5)
+        self.assertIsNone(always_retry.delay())
+
+    @override_settings(TASK_BACKEND='sync')
+    def test_sync_backend_defers_countdowns_instead_of_running_early(self):
+        calls = []
+
+        @shared_task
+        def record(value):
+            calls.append(value)
+
+        with patch('apps.core.tasks.get_executor') as get_executor:
+            self.assertIsNone(record.apply_async(args=('later',), countdown=30))
+            record.apply_async(args=('now',))
+        get_executor.return_value.submit.assert_called_once_with(record, ('later',), {}, countdown=30)
+        self.assertEqual(calls, ['now'])
+
+
+class _CollectingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class QueueLoggingTests(SimpleTestCase):
+    def _record(self, message, **extra):
+        record = logging.LogRecord('tests', logging.INFO, __file__, 1, message, None, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_records_are_written_by_background_listener(self):
+        target = _CollectingHandler()
+        handler = QueueListenerHandler([target])
+        handler.handle(self._record('first'))
+        handler.handle(self._record('second'))
+        handler.close()
+
+        self.assertEqual(target.messages, ['first', 'second'])
+
+    def test_deferred_args_are_formatted_on_the_listener_thread(self):
+        class _Lazy(DeferredLogArg):
+            thread = None
+
+            def __str__(self):
+                self.thread = threading.current_thread()
+                return 'lazy'
+
+        lazy = _Lazy()
+        target = _CollectingHandler()
+        handler = QueueListenerHandler([target])
+        handler.handle(logging.LogRecord('tests', logging.INFO, __file__, 1, 'value=%s', (lazy,), None))
+        handler.close()
+
+        self.assertEqual(target.messages, ['value=lazy'])
+        self.assertIsNot(lazy.thread, threading.current_thread())
+
+    def test_other_args_are_rendered_before_they_can_change(self):
+        payload = {'status': 'sent'}
+        target = _CollectingHandler()
+        handler = QueueListenerHandler([target])
+        handler._ensure_listener = lambda: None  # hold the record in the queue until the caller has moved on
+        handler.handle(logging.LogRecord('tests', logging.INFO, __file__, 1, 'payload=%s', (payload,), None))
+        payload['status'] = 'changed'
+        handler._listener = _DrainingQueueListener(handler.queue, target)
+        handler._listener.start()
+        handler._listener.stop()
+
+        self.assertEqual(target.messages, ["payload={'status': 'sent'}"])
+
+    def test_settings_logging_config_builds_the_queue_handler(self):
+        from logging.config import dictConfig
+
+        root = logging.getLogger()
+        saved = root.handlers[:]
+        self.addCleanup(lambda: setattr(root, 'handlers', saved))
+        dictConfig({**settings.LOGGING, 'disable_existing_loggers': False})
+        [handler] = root.handlers
+        self.assertIsInstance(handler, QueueListenerHandler)
+        handler.close()
+        for target in handler.targets:
+            target.close()
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = QueueListenerHandler([_CollectingHandler()], queue_size=1)
+        handler._ensure_listener = lambda: None  # no listener, so nothing drains the queue
+        handler.handle(self._record('kept'))
+        handler.handle(self._record('dropped'))
+
+        self.assertEqual(handler.dropped, 1)
+
+    def test_sample_filter_only_thins_marked_records(self):
+        sampler = SampleFilter(rate=0)
+        self.assertFalse(sampler.filter(self._record('ok', log_sample=True)))
+        self.assertTrue(sampler.filter(self._record('error', log_sample=False)))
+        self.assertTrue(sampler.filter(self._record('unmarked')))
+
+
+class ProviderMetricsTests(SimpleTestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        metrics = MetricsRegistry()
+        metrics.observe_provider_call('vtpass', '/api/pay', 'success', 0.2)
+        metrics.observe_provider_call('vtpass', '/api/pay', 'success', 3.0, retries=2)
+
+        text = render_prometheus([metrics.snapshot()])
+
+        self.assertIn('provider_request_duration_seconds_bucket{provider="vtpass",endpoint="/api/pay",status="success",le="0.25"} 1', text)
+        self.assertIn('provider_request_duration_seconds_bucket{provider="vtpass",endpoint="/api/pay",status="success",le="+Inf"} 2', text)
+        self.assertIn('provider_request_duration_seconds_count{provider="vtpass",endpoint="/api/pay",status="success"} 2', text)
+        self.assertIn('provider_request_retries_total{provider="vtpass",endpoint="/api/pay"} 2', text)
+
+    def test_endpoint_ids_are_collapsed(self):
+        self.assertEqual(normalize_endpoint('/api/v1/transactions/MNFY-123-ABC/status?x=1'), '/api/v1/transactions/:id/status')
+        self.assertEqual(normalize_endpoint('/api/v2/bank-transfer/reserved-accounts/USR-42'), '/api/v2/bank-transfer/reserved-accounts/:id')
+        self.assertEqual(normalize_endpoint('/api/v2/bank-transfer/reserved-accounts/USR00000123'), '/api/v2/bank-transfer/reserved-accounts/:id')
+        self.assertEqual(normalize_endpoint('/api/v1/merchant/transactions/mnfy_ref9a'), '/api/v1/merchant/transactions/:id')
+
+    def test_snapshots_from_other_workers_are_merged(self):
+        with tempfile.TemporaryDirectory() as metrics_dir:
+            worker = MetricsRegistry()
+            worker.observe_provider_call('monnify', '/api/v1/auth/login', 'success', 0.1)
+            Path(metrics_dir, 'metrics-1.json').write_text(json.dumps(worker.snapshot()))
+
+            with override_settings(METRICS_DIR=metrics_dir):
+                text = render_prometheus(collect_snapshots())
+
+        self.assertIn('provider_request_duration_seconds_count{provider="monnify",endpoint="/api/v1/auth/login",status="success"} 1', text)
+
+    def test_stale_snapshots_are_folded_into_retired_totals(self):
+        with tempfile.TemporaryDirectory() as metrics_dir:
+            worker = MetricsRegistry()
+            worker.observe_provider_call('vtpass', '/api/dead-worker', 'success', 0.1)
+            stale = Path(metrics_dir, 'metrics-2-dead.json')
+            stale.write_text(json.dumps(worker.snapshot()))
+            os.utime(stale, (time.time() - 120, time.time() - 120))
+
+            with override_settings(METRICS_DIR=metrics_dir, METRICS_STALE_AFTER=60.0):
+                first = render_prometheus(collect_snapshots())
+                second = render_prometheus(collect_snapshots())
+
+            self.assertFalse(stale.exists())
+        count = 'provider_request_duration_seconds_count{provider="vtpass",endpoint="/api/dead-worker",status="success"} 1'
+        self.assertIn(count, first)
+        self.assertIn(count, second)
+
+    def test_exiting_worker_keeps_its_totals_and_a_folded_worker_is_not_counted_twice(self):
+        with tempfile.TemporaryDirectory() as metrics_dir:
+            directory = Path(metrics_dir)
+            worker, successor = MetricsRegistry(), MetricsRegistry()
+            worker.observe_provider_call('vtpass', '/api/pay', 'success', 0.1)
+            worker.flush(directory)
+            successor.flush(directory)
+            # Same PID, distinct files: a reused PID never overwrites its predecessor's counters.
+            self.assertEqual(len(list(directory.glob('metrics-*.json'))), 2)
+
+            # A scrape folds the worker's file as stale while it is still running; later calls keep counting on top.
+            Path(directory, worker.snapshot_name).unlink()
+            _fold_into_retired(directory, worker.snapshot())
+            worker.observe_provider_call('vtpass', '/api/pay', 'success', 0.1)
+            worker.flush(directory)
+            worker._retire_at_exit(directory, os.getpid() + 1)
+            self.assertTrue(Path(directory, worker.snapshot_name).exists())
+            worker._retire_at_exit(directory, os.getpid())
+
+            self.assertFalse(Path(directory, worker.snapshot_name).exists())
+            retired = json.loads(Path(directory, 'retired.json').read_text())
+        self.assertIn('provider_request_duration_seconds_count{provider="vtpass",endpoint="/api/pay",status="success"} 2', render_prometheus([retired]))
+
+
+@override_settings(METRICS_TOKEN='scrape-token')
+class MetricsEndpointTests(TestCase):
+    def test_metrics_require_bearer_token(self):
+        registry.observe_provider_call('vtpass', '/api/requery', 'pending', 0.3)
+
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'endpoint="/api/requery",status="pending"', response.content)
+
+
+class SiteSettingsCacheTests(TestCase):
+    def setUp(self):
+        clear_site_settings_cache()
+        self.site_setting = SiteSetting.objects.create(site_name='Cached VTU', support_email='help@example.com')
+
+    def test_memo_serves_repeat_reads_without_queries(self):
+        self.assertEqual(get_site_settings().site_name, 'Cached VTU')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_site_settings().site_name, 'Cached VTU')
+            self.assertFalse(maintenance_mode())
+
+    def test_save_and_version_bump_invalidate_the_memo(self):
+        get_site_settings()
+        self.site_setting.maintenance_mode = True
+        self.site_setting.save()
+        self.assertTrue(maintenance_mode())
+
+        # Another process changing the row only bumps the shared version key.
+        SiteSetting.objects.filter(pk=self.site_setting.pk).update(site_name='Renamed')
+        self.assertEqual(get_site_settings().site_name, 'Cached VTU')
+        cache.set(site_settings.VERSION_KEY, 'other-process', None)
+        self.assertEqual(get_site_settings().site_name, 'Renamed')
+
+        self.site_setting.delete()
+        self.assertIsNone(get_site_settings())
+
+    def test_memo_expires_even_without_a_version_bump(self):
+        get_site_settings()
+        SiteSetting.objects.filter(pk=self.site_setting.pk).update(site_name='Renamed elsewhere')
+        self.assertEqual(get_site_settings().site_name, 'Cached VTU')
+        with override_settings(SITE_SETTINGS_MEMO_TTL=0):
+            self.assertEqual(get_site_settings().site_name, 'Renamed elsewhere')
+
+
+@override_settings(MAINTENANCE_RETRY_AFTER=120, MAINTENANCE_ALLOWED_PATHS=['/accounts/login/'])
+class MaintenanceModeMiddlewareTests(TestCase):
+    def setUp(self):
+        clear_site_settings_cache()
+        self.addCleanup(clear_site_settings_cache)
+        self.site_setting = SiteSetting.objects.create(maintenance_mode=True)
+        get_site_settings()
+
+    def test_non_staff_get_static_503_without_queries(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/dashboard/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '120')
+        self.assertIn(b'right back', response.content)
+
+    def test_allowlisted_paths_and_staff_pass_through(self):
+        self.assertEqual(self.client.get('/accounts/login/').status_code, 200)
+
+        get_user_model().objects.create_user(username='ops', password='secret123', is_staff=True)
+        self.client.post('/accounts/login/', {'username': 'ops', 'password': 'secret123'})
+        self.assertIn(STAFF_COOKIE, self.client.cookies)
+        self.assertNotEqual(self.client.get('/dashboard/').status_code, 503)
+
+        self.client.post('/accounts/logout/')
+        self.assertEqual(self.client.cookies[STAFF_COOKIE].value, '')
+        self.assertEqual(self.client.get('/dashboard/').status_code, 503)
+
+    def test_staff_cookie_is_bound_to_the_session_and_dropped_on_demotion(self):
+        staff = get_user_model().objects.create_user(username='ops', password='secret123', is_staff=True)
+        self.client.post('/accounts/login/', {'username': 'ops', 'password': 'secret123'})
+        self.assertNotEqual(self.client.get('/dashboard/').status_code, 503)
+
+        other_device = self.client_class()
+        other_device.cookies[STAFF_COOKIE] = self.client.cookies[STAFF_COOKIE].value
+        self.assertEqual(other_device.get('/dashboard/').status_code, 503)
+
+        get_user_model().objects.filter(pk=staff.pk).update(is_staff=False)
+        self.client.get('/accounts/login/')
+        self.assertEqual(self.client.cookies[STAFF_COOKIE].value, '')
+        self.assertEqual(self.client.get('/dashboard/').status_code, 503)
+
+    def test_regular_users_are_not_issued_the_staff_cookie(self):
+        get_user_model().objects.create_user(username='customer', password='secret123')
+        self.client.post('/accounts/login/', {'username': 'customer', 'password': 'secret123'})
+        self.assertNotIn(STAFF_COOKIE, self.client.cookies)
+        self.assertEqual(self.client.get('/dashboard/').status_code, 503)
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_STAFF=True, PROFILING_SAMPLE_RATE=0.0, PROFILING_SLOW_MS=0)
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        slow_requests.clear()
+        self.addCleanup(slow_requests.clear)
+
+    @staticmethod
+    def _view(request):
+        SiteSetting.objects.count()
+        SiteSetting.objects.count()
+        SiteSetting.objects.exists()
+        return HttpResponse('ok')
+
+    def _staff_request(self, path='/dashboard/'):
+        request = RequestFactory().get(path)
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = 'staff-session'
+        request.COOKIES[STAFF_COOKIE] = signing.get_cookie_signer(salt=STAFF_COOKIE + STAFF_COOKIE_SALT).sign('staff-session')
+        return request
+
+    def test_disabled_profiler_leaves_the_middleware_chain(self):
+        with override_settings(PROFILING_ENABLED=False), self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(self._view)
+
+    def test_staff_requests_report_queries_and_duplicates(self):
+        response = ProfilingMiddleware(self._view)(self._staff_request())
+
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="3 queries, 1 duplicate", app;dur=[\d.]+, total;dur=[\d.]+$')
+        [profile] = slow_requests.samples()
+        self.assertEqual((profile.path, profile.queries, profile.duplicates), ('/dashboard/', 3, 1))
+        self.assertEqual(profile.repeated[0][1], 2)
+
+    def test_sampled_requests_are_recorded_without_the_header(self):
+        response = ProfilingMiddleware(self._view)(RequestFactory().get('/dashboard/'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(slow_requests.samples(), [])
+
+        with override_settings(PROFILING_SAMPLE_RATE=1.0):
+            response = ProfilingMiddleware(self._view)(RequestFactory().get('/sampled/'))
+        # Sampled visitors are recorded but never shown internal timings.
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual([profile.path for profile in slow_requests.samples()], ['/sampled/'])
+
+    def test_ring_buffer_is_bounded_and_shown_on_the_dashboard(self):
+        middleware = ProfilingMiddleware(self._view)
+        with override_settings(PROFILING_BUFFER_SIZE=2):
+            for path in ('/first/', '/second/', '/third/'):
+                middleware(self._staff_request(path))
+            self.assertEqual([profile.path for profile in slow_requests.samples()], ['/third/', '/second/'])
+
+        self.client.force_login(get_user_model().objects.create_user(username='ops', password='secret123', is_staff=True))
+        response = self.client.get('/dashboard/slow-requests/')
+        self.assertContains(response, 'GET /third/')
+        self.assertNotContains(response, 'GET /first/')
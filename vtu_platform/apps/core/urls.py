@@ -6,4 +6,5 @@ app_name = 'core'
 urlpatterns = [
     path('', views.home, name='home'),
     path('pricing/', views.pricing, name='pricing'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
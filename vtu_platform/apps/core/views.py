@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from apps.core.metrics import collect_snapshots, render_prometheus
 
 
 def home(request):
@@ -7,3 +12,14 @@ def home(request):
 
 def pricing(request):
     return render(request, 'core/pricing.html')
+
+
+def metrics(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = request.user.is_authenticated and request.user.is_staff
+    if not allowed:
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+    return HttpResponse(render_prometheus(collect_snapshots()), content_type='text/plain; version=0.0.4; charset=utf-8')
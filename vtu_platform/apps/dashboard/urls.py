@@ -1,10 +1,12 @@
 from django.urls import path
 
-from .views import monnify_webhook_events, operations_console
+from .views import monnify_webhook_events, operations_console, replay_monnify_webhook_events, slow_request_profiles
 
 app_name = 'dashboard'
 
 urlpatterns = [
     path('', operations_console, name='console'),
     path('monnify-webhooks/', monnify_webhook_events, name='monnify_webhook_events'),
+    path('monnify-webhooks/replay/', replay_monnify_webhook_events, name='replay_monnify_webhook_events'),
+    path('slow-requests/', slow_request_profiles, name='slow_requests'),
 ]
@@ -1,15 +1,26 @@
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.core.paginator import Paginator
-from django.shortcuts import render
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_POST
 
+from apps.core.profiling import slow_requests
 from apps.payments.models import PaymentWebhookEvent
-from apps.payments.services import ensure_user_reserved_accounts
+from apps.payments.replay import parse_replay_boundary, replay_webhook_events, replayable_webhook_events
+from apps.payments.services import reserved_account_provisioning_summary
+from apps.vtu.scheduling import pending_backlog_by_age
+
+WEBHOOK_REPLAY_LIMIT = 200
 
 
 @staff_member_required
 def operations_console(request):
-    ensure_user_reserved_accounts(request.user)
-    return render(request, 'dashboard/console.html')
+    return render(
+        request,
+        'dashboard/console.html',
+        {'pending_backlog': pending_backlog_by_age(), 'provisioning_summary': reserved_account_provisioning_summary()},
+    )
 
 
 @staff_member_required
@@ -17,4 +28,49 @@ def monnify_webhook_events(request):
     events = PaymentWebhookEvent.objects.order_by('-created_at')
     paginator = Paginator(events, 25)
     page_obj = paginator.get_page(request.GET.get('page', 1))
-    return render(request, 'dashboard/monnify_webhook_events.html', {'page_obj': page_obj})
+    return render(
+        request,
+        'dashboard/monnify_webhook_events.html',
+        {
+            'page_obj': page_obj,
+            'error_classes': PaymentWebhookEvent.objects.filter(processed=False).exclude(error_class='').order_by().values_list('error_class', flat=True).distinct(),
+            'replay_limit': WEBHOOK_REPLAY_LIMIT,
+        },
+    )
+
+
+@staff_member_required
+def slow_request_profiles(request):
+    return render(
+        request,
+        'dashboard/slow_requests.html',
+        {
+            'profiles': slow_requests.samples(),
+            'profiling_enabled': settings.PROFILING_ENABLED,
+            'slow_ms': settings.PROFILING_SLOW_MS,
+            'buffer_size': settings.PROFILING_BUFFER_SIZE,
+        },
+    )
+
+
+@staff_member_required
+@require_POST
+def replay_monnify_webhook_events(request):
+    try:
+        since = parse_replay_boundary(request.POST.get('since', ''))
+        until = parse_replay_boundary(request.POST.get('until', ''))
+    except ValueError as exc:
+        messages.error(request, str(exc))
+        return redirect('dashboard:monnify_webhook_events')
+    events = replayable_webhook_events(
+        since=since,
+        until=until,
+        error_class=request.POST.get('error_class', ''),
+        failed_only=bool(request.POST.get('failed_only')),
+    )
+    dry_run = bool(request.POST.get('dry_run'))
+    outcomes = replay_webhook_events(events, workers=settings.WEBHOOK_REPLAY_WORKERS, dry_run=dry_run, limit=WEBHOOK_REPLAY_LIMIT)
+    if not outcomes:
+        messages.info(request, 'No webhook events matched the replay filters.')
+        return redirect('dashboard:monnify_webhook_events')
+    return render(request, 'dashboard/webhook_replay_results.html', {'outcomes': outcomes, 'dry_run': dry_run})
@@ -39,6 +39,72 @@ def credit_wallet(user, amount: Decimal, reference: str, meta=None, tx_type: str
     return entry
 
 
+@transaction.atomic
+def credit_wallet_batch(user, credits, tx_type: str = LedgerEntry.TransactionType.FUNDING) -> list[LedgerEntry]:
+    """Apply many ``(amount, reference, meta)`` credits under one wallet lock and one balance write.
+
+    References that already succeeded are returned unchanged, as with ``credit_wallet``. New entries are
+    bulk inserted, so ``post_save`` receivers do not run for them.
+    """
+    credits = [(_validate_amount(amount), reference, meta) for amount, reference, meta in credits]
+    if not credits:
+        return []
+    wallet, _ = Wallet.objects.select_for_update().get_or_create(user=user)
+
+    existing = {entry.reference: entry for entry in LedgerEntry.objects.filter(reference__in=[reference for _, reference, _ in credits])}
+    if any(entry.status != LedgerEntry.Status.SUCCESS for entry in existing.values()):
+        raise ValidationError('Reference already exists with non-success status and cannot be reused.')
+
+    new_entries = {}
+    for amount, reference, meta in credits:
+        if reference not in existing and reference not in new_entries:
+            new_entries[reference] = LedgerEntry(
+                user=user,
+                reference=reference,
+                tx_type=tx_type,
+                direction=LedgerEntry.Direction.CREDIT,
+                amount=amount,
+                status=LedgerEntry.Status.SUCCESS,
+                meta=meta or {},
+            )
+    if new_entries:
+        LedgerEntry.objects.bulk_create(new_entries.values())
+        wallet.balance += sum(entry.amount for entry in new_entries.values())
+        wallet._allow_balance_update = True
+        wallet.save(update_fields=['balance', 'updated_at'])
+    return [existing.get(reference) or new_entries[reference] for _, reference, _ in credits]
+
+
+@transaction.atomic
+def open_wallets(opening_balances: dict, reference_prefix: str = 'OPENING', meta=None) -> int:
+    """Create wallets for users that have none, each with an opening credit, in two bulk inserts.
+
+    ``opening_balances`` maps user id to amount (zero opens an empty wallet). Meant for imports of new users:
+    an existing wallet makes the insert fail rather than silently skipping a balance.
+    """
+    wallets, entries = [], []
+    for user_id, amount in opening_balances.items():
+        amount = (amount or Decimal('0.00')).quantize(Decimal('0.01'))
+        if amount < 0:
+            raise ValidationError('Opening balance cannot be negative.')
+        wallets.append(Wallet(user_id=user_id, balance=amount))
+        if amount > 0:
+            entries.append(
+                LedgerEntry(
+                    user_id=user_id,
+                    reference=f'{reference_prefix}-{user_id}',
+                    tx_type=LedgerEntry.TransactionType.FUNDING,
+                    direction=LedgerEntry.Direction.CREDIT,
+                    amount=amount,
+                    status=LedgerEntry.Status.SUCCESS,
+                    meta={'opening_balance': True, **(meta or {})},
+                )
+            )
+    Wallet.objects.bulk_create(wallets)
+    LedgerEntry.objects.bulk_create(entries)
+    return len(entries)
+
+
 @transaction.atomic
 def debit_wallet(user, amount: Decimal, reference: str, meta=None, tx_type: str = LedgerEntry.TransactionType.BILL):
     amount = _validate_amount(amount)
@@ -7,7 +7,7 @@ from django.db import close_old_connections
 from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
 
 from apps.ledger.models import LedgerEntry, Wallet
-from apps.ledger.services import credit_wallet, debit_wallet, reverse_transaction
+from apps.ledger.services import credit_wallet, credit_wallet_batch, debit_wallet, reverse_transaction
 
 
 class WalletServiceTests(TestCase):
@@ -43,6 +43,20 @@ class WalletServiceTests(TestCase):
         self.assertEqual(first_reversal.pk, second_reversal.pk)
         self.assertEqual(wallet.balance, Decimal('120.00'))
 
+    def test_credit_wallet_batch_applies_new_references_once(self):
+        credit_wallet(self.user, Decimal('10.00'), 'batch-1', {})
+
+        entries = credit_wallet_batch(
+            self.user,
+            [(Decimal('10.00'), 'batch-1', {}), (Decimal('5.00'), 'batch-2', {}), (Decimal('7.50'), 'batch-3', {'n': 3})],
+            tx_type=LedgerEntry.TransactionType.REFERRAL_BONUS,
+        )
+        credit_wallet_batch(self.user, [(Decimal('5.00'), 'batch-2', {})])
+
+        self.assertEqual([entry.reference for entry in entries], ['batch-1', 'batch-2', 'batch-3'])
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('22.50'))
+        self.assertEqual(LedgerEntry.objects.filter(tx_type=LedgerEntry.TransactionType.REFERRAL_BONUS).count(), 2)
+
     def test_wallet_balance_cannot_be_changed_directly(self):
         wallet = Wallet.objects.create(user=self.user, balance=Decimal('10.00'))
         wallet.balance = Decimal('99.00')
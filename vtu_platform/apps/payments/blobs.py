@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import zlib
+
+from django.conf import settings
+
+from apps.payments.models import PayloadBlob
+
+
+def build_payload_blob(payload: dict) -> PayloadBlob:
+    """Unsaved blob for ``payload``; identical payloads always map to the same primary key."""
+    raw = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str).encode()
+    blob = PayloadBlob(sha256=hashlib.sha256(raw).hexdigest(), encoding=PayloadBlob.Encoding.JSON, data=raw, size=len(raw))
+    if settings.PAYLOAD_BLOB_COMPRESS and len(raw) >= settings.PAYLOAD_BLOB_COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(raw, 6)
+        if len(compressed) < len(raw):
+            blob.encoding, blob.data = PayloadBlob.Encoding.ZLIB, compressed
+    return blob
+
+
+def store_payload_blobs(blobs) -> None:
+    # Content addressing makes a conflicting row an identical payload, so conflicts are simply skipped.
+    PayloadBlob.objects.bulk_create(list(blobs), ignore_conflicts=True)
+
+
+def store_payload(payload: dict) -> PayloadBlob:
+    blob = build_payload_blob(payload)
+    store_payload_blobs([blob])
+    return blob
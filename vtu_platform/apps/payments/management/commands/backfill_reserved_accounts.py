@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+
+from apps.payments.models import ReservedAccountProvisioning, VirtualAccount
+from apps.payments.resolver import index_virtual_accounts
+from apps.payments.services import (
+    MonnifyAPIError,
+    get_monnify_client,
+    monnify_configured,
+    reserved_account_request,
+    reserved_virtual_accounts,
+)
+
+
+class RateLimiter:
+    """Spaces calls ``1 / rate`` seconds apart across all threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_at, now)
+            self._next_at = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Command(BaseCommand):
+    help = 'Provision Monnify reserved accounts for users that have none, concurrently, rate limited and resumable.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent Monnify calls (keep within MONNIFY_POOL_SIZE).')
+        parser.add_argument('--rate', type=float, default=5.0, help='Maximum Monnify reservations per second; 0 disables the limit.')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many users.')
+        parser.add_argument('--checkpoint', default='.backfill_reserved_accounts.json', help='File recording the last processed user id.')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and start from the first user.')
+
+    def handle(self, *args, **options):
+        if not monnify_configured():
+            raise CommandError('Monnify credentials are not fully configured.')
+        if options['workers'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--workers and --chunk-size must be at least 1.')
+
+        checkpoint = Path(options['checkpoint'])
+        last_pk = 0 if options['restart'] else self._read_checkpoint(checkpoint)
+        if last_pk:
+            self.stdout.write(f'Resuming after user id {last_pk}.')
+
+        client = get_monnify_client()
+        limiter = RateLimiter(options['rate'])
+
+        def reserve(user):
+            limiter.wait()
+            try:
+                return user, client.reserve_account(**reserved_account_request(user)), ''
+            except MonnifyAPIError as exc:
+                return user, None, str(exc)
+
+        User = get_user_model()
+        missing = User.objects.filter(~Exists(VirtualAccount.objects.filter(user_id=OuterRef('pk')))).order_by('pk')
+        remaining = options['limit'] if options['limit'] is not None else float('inf')
+        provisioned = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='reserve-account') as pool:
+            while remaining > 0:
+                size = int(min(options['chunk_size'], remaining))
+                users = list(missing.filter(pk__gt=last_pk).only('pk', 'username', 'first_name', 'last_name', 'email')[:size])
+                if not users:
+                    break
+
+                results = list(pool.map(reserve, users))
+                self._save_chunk(results)
+                chunk_failed = sum(1 for _, result, _ in results if result is None)
+                provisioned += len(results) - chunk_failed
+                failed += chunk_failed
+                remaining -= len(results)
+
+                last_pk = users[-1].pk
+                self._write_checkpoint(checkpoint, last_pk)
+                self.stdout.write(f'Processed users up to id {last_pk}: {provisioned} provisioned, {failed} failed.')
+
+        if options['limit'] is None:
+            checkpoint.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(f'Backfill finished: {provisioned} provisioned, {failed} failed.'))
+
+    def _save_chunk(self, results) -> None:
+        accounts = [account for user, result, _ in results if result for account in reserved_virtual_accounts(user, result)]
+        VirtualAccount.objects.bulk_create(accounts, ignore_conflicts=True)
+        # Rows from bulk_create bypass post_save and may lack primary keys, so re-read them for indexing.
+        user_ids = [user.pk for user, result, _ in results if result]
+        index_virtual_accounts(VirtualAccount.objects.filter(user_id__in=user_ids))
+
+        states = [
+            ReservedAccountProvisioning(
+                user_id=user.pk,
+                status=ReservedAccountProvisioning.Status.PROVISIONED if result else ReservedAccountProvisioning.Status.FAILED,
+                attempts=1,
+                last_error=error,
+            )
+            for user, result, error in results
+        ]
+        ReservedAccountProvisioning.objects.bulk_create(
+            states,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['status', 'last_error', 'updated_at'],
+        )
+
+    @staticmethod
+    def _read_checkpoint(path: Path) -> int:
+        try:
+            return int(json.loads(path.read_text())['last_user_id'])
+        except FileNotFoundError:
+            return 0
+        except (ValueError, KeyError, TypeError) as exc:
+            raise CommandError(f'Unreadable checkpoint {path}; pass --restart to start over.') from exc
+
+    @staticmethod
+    def _write_checkpoint(path: Path, last_pk: int) -> None:
+        temp = path.with_suffix(path.suffix + '.tmp')
+        temp.write_text(json.dumps({'last_user_id': last_pk}))
+        os.replace(temp, path)
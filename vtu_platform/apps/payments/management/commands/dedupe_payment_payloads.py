@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.payments.blobs import build_payload_blob, store_payload_blobs
+from apps.payments.models import IncomingPayment, PayloadBlob, PaymentWebhookEvent
+
+
+class Command(BaseCommand):
+    help = 'Move inline webhook/payment payloads into the shared PayloadBlob table, in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        for model in (PaymentWebhookEvent, IncomingPayment):
+            rows = self._migrate(model, options['chunk_size'])
+            self.stdout.write(f'{model.__name__}: moved {rows} inline payload(s) to blobs.')
+        self.stdout.write(
+            self.style.SUCCESS(f'Payload deduplication finished; {PayloadBlob.objects.count()} distinct blobs. Run VACUUM to reclaim table space.')
+        )
+
+    def _migrate(self, model, chunk_size: int) -> int:
+        rows = 0
+        last_pk = 0
+        pending = model.objects.filter(payload_blob__isnull=True).order_by('pk').only('pk', 'payload')
+        while True:
+            chunk = list(pending.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                return rows
+            blobs = {}
+            for row in chunk:
+                blob = build_payload_blob(row.payload)
+                blobs.setdefault(blob.sha256, blob)
+                row.payload_blob_id = blob.sha256
+                row.payload = {}
+            with transaction.atomic():
+                store_payload_blobs(blobs.values())
+                model.objects.bulk_update(chunk, ['payload_blob', 'payload'])
+            rows += len(chunk)
+            last_pk = chunk[-1].pk
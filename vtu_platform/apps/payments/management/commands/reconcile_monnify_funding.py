@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.payments.reconciliation import FixtureTransactionFeed, FundingReconciler
+from apps.payments.replay import parse_replay_boundary
+from apps.payments.services import get_monnify_client, monnify_configured
+
+
+class Command(BaseCommand):
+    help = 'Credit Monnify collections that settled without a processed webhook.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Window start (ISO 8601). Defaults to 24 hours before --until.')
+        parser.add_argument('--until', help='Window end (ISO 8601). Defaults to now.')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--fixture', help='Read transactions from a JSON file instead of the Monnify API (offline testing).')
+        parser.add_argument('--dry-run', action='store_true', help='Report missing transactions without crediting them.')
+
+    def handle(self, *args, **options):
+        try:
+            end = parse_replay_boundary(options['until']) or timezone.now()
+            start = parse_replay_boundary(options['since']) or end - timedelta(hours=24)
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        if options['fixture']:
+            client = FixtureTransactionFeed.from_file(options['fixture'])
+        elif monnify_configured():
+            client = get_monnify_client()
+        else:
+            raise CommandError('Monnify credentials are not fully configured; pass --fixture to reconcile offline.')
+
+        reconciler = FundingReconciler(client, page_size=options['page_size'], chunk_size=options['chunk_size'])
+        report = reconciler.run(start, end, dry_run=options['dry_run'])
+
+        for reference in report.missing_references:
+            self.stdout.write(f'missing\t{reference}')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Fetched {report.fetched} settled transaction(s); {report.missing} missing; '
+                f'credited={report.credited} parked={report.parked} failed={report.failed}.'
+            )
+        )
@@ -0,0 +1,44 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.payments.replay import parse_replay_boundary, replay_webhook_events, replayable_webhook_events
+
+
+class Command(BaseCommand):
+    help = 'Reprocess unprocessed or failed Monnify webhook events. Credits stay idempotent per transaction reference.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only events received at or after this date/time (ISO 8601).')
+        parser.add_argument('--until', help='Only events received before this date/time (ISO 8601).')
+        parser.add_argument('--error-class', default='', help='Only events that failed with this exception class, e.g. UnmatchedWebhookEvent.')
+        parser.add_argument('--failed-only', action='store_true', help='Skip events that were never attempted.')
+        parser.add_argument('--workers', type=int, default=4, help='Accounts replayed in parallel.')
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument('--dry-run', action='store_true', help='List the selected events without processing them.')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1.')
+        try:
+            since = parse_replay_boundary(options['since'])
+            until = parse_replay_boundary(options['until'])
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        events = replayable_webhook_events(
+            since=since,
+            until=until,
+            error_class=options['error_class'],
+            failed_only=options['failed_only'],
+        )
+        outcomes = replay_webhook_events(events, workers=options['workers'], dry_run=options['dry_run'], limit=options['limit'])
+
+        for outcome in outcomes:
+            line = f'{outcome.event_id}\t{outcome.account_key or "-"}\t{outcome.status}'
+            if outcome.detail:
+                line += f'\t{outcome.detail}'
+            self.stdout.write(line)
+
+        totals = Counter(outcome.status for outcome in outcomes)
+        summary = ', '.join(f'{status}={count}' for status, count in sorted(totals.items())) or 'no events selected'
+        self.stdout.write(self.style.SUCCESS(f'Replayed {len(outcomes)} event(s): {summary}'))
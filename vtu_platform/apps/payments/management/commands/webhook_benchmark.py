@@ -0,0 +1,258 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from uuid import uuid4
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from apps.core.metrics import percentile
+from apps.payments.models import VirtualAccount
+from apps.payments.services import monnify_webhook_signature
+
+WEBHOOK_PATH = '/payments/monnify/webhook/'
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@dataclass
+class BenchmarkResult:
+    transport: str
+    events: int
+    seconds: float
+    events_per_second: float
+    p50_ms: float
+    p99_ms: float
+    queries_per_event: float
+    statuses: dict
+
+
+def _benchmark_host() -> str:
+    for host in settings.ALLOWED_HOSTS:
+        if host == '*':
+            return 'localhost'
+        return host.lstrip('.')
+    return 'localhost'
+
+
+class Command(BaseCommand):
+    help = 'Measure Monnify webhook ingestion throughput, p99 latency and queries per event; fails on regressions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=500)
+        parser.add_argument('--accounts', type=int, default=20)
+        parser.add_argument('--duplicate-rate', type=float, default=0.1, help='Share of deliveries that repeat an earlier event.')
+        parser.add_argument('--out-of-order-rate', type=float, default=0.1, help='Share of deliveries swapped out of arrival order.')
+        parser.add_argument('--unknown-rate', type=float, default=0.05, help='Share of events for accounts that do not exist.')
+        parser.add_argument('--transport', choices=['client', 'wsgi', 'both'], default='both')
+        parser.add_argument('--concurrency', type=int, default=4, help='Client threads for the WSGI server run.')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--min-events-per-second', type=float, default=None)
+        parser.add_argument('--max-p99-ms', type=float, default=None)
+        parser.add_argument('--max-queries-per-event', type=float, default=None)
+        parser.add_argument('--baseline', help='JSON results from an earlier run to compare against.')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed regression against --baseline (0.2 = 20%%).')
+        parser.add_argument('--write-baseline', help='Write this run\'s results as JSON for later comparison.')
+
+    def handle(self, *args, **options):
+        if not settings.MONNIFY_SECRET_KEY:
+            raise CommandError('MONNIFY_SECRET_KEY must be set so payloads can be signed.')
+        rng = random.Random(options['seed'])
+        run_id = uuid4().hex[:8]
+        account_numbers = self._create_accounts(options['accounts'], run_id)
+        transports = ['client', 'wsgi'] if options['transport'] == 'both' else [options['transport']]
+
+        results = []
+        for transport in transports:
+            deliveries = self._deliveries(options, account_numbers, f'{run_id}-{transport}', rng)
+            if transport == 'client':
+                result = self._run_client(deliveries)
+            else:
+                result = self._run_wsgi(deliveries, options['concurrency'])
+            self._report(result)
+            results.append(result)
+
+        if options['write_baseline']:
+            Path(options['write_baseline']).write_text(json.dumps({result.transport: asdict(result) for result in results}, indent=2))
+        failures = self._regressions(results, options)
+        if failures:
+            for failure in failures:
+                self.stdout.write(self.style.ERROR(f'  {failure}'))
+            raise CommandError(f'Webhook benchmark regressed on {len(failures)} check(s).')
+        self.stdout.write(self.style.SUCCESS('Webhook benchmark within thresholds.'))
+
+    def _create_accounts(self, count: int, run_id: str) -> list[str]:
+        numbers = []
+        prefix = str(int(run_id, 16) % 10**6).zfill(6)
+        for index in range(count):
+            user = get_user_model().objects.create_user(username=f'webhook-bench-{run_id}-{index}', password=None)
+            number = f'9{prefix}{index:05d}'
+            VirtualAccount.objects.create(
+                user=user,
+                account_reference=f'BENCH-{run_id}-{index}',
+                bank_name='Benchmark Bank',
+                account_number=number,
+                account_name=user.username,
+            )
+            numbers.append(number)
+        return numbers
+
+    def _deliveries(self, options, account_numbers: list[str], run_id: str, rng: random.Random) -> list[tuple[bytes, str]]:
+        """Signed request bodies in delivery order, mixing duplicates, reordering and unknown accounts."""
+        events = []
+        for index in range(options['events']):
+            number = f'0{index:09d}' if rng.random() < options['unknown_rate'] else rng.choice(account_numbers)
+            payload = {
+                'eventType': 'SUCCESSFUL_TRANSACTION',
+                'eventData': {
+                    'transactionReference': f'BENCH-{run_id}-{index}',
+                    'paymentReference': f'BENCH-PAY-{run_id}-{index}',
+                    'amountPaid': rng.choice([100, 500, 1000, 2500]),
+                    'currency': 'NGN',
+                    'destinationAccountInformation': {'accountNumber': number, 'bankName': 'Benchmark Bank'},
+                },
+            }
+            raw = json.dumps(payload).encode()
+            events.append((raw, monnify_webhook_signature(raw)))
+
+        deliveries = []
+        for event in events:
+            deliveries.append(event)
+            if deliveries and rng.random() < options['duplicate_rate']:
+                deliveries.append(rng.choice(deliveries))
+        for index in range(len(deliveries)):
+            if rng.random() < options['out_of_order_rate']:
+                other = rng.randrange(len(deliveries))
+                deliveries[index], deliveries[other] = deliveries[other], deliveries[index]
+        return deliveries
+
+    def _run_client(self, deliveries) -> BenchmarkResult:
+        client = Client(HTTP_HOST=_benchmark_host())
+        counter = _QueryCounter()
+        latencies, statuses = [], Counter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            for raw, signature in deliveries:
+                sent = time.perf_counter()
+                response = client.post(WEBHOOK_PATH, data=raw, content_type='application/json', HTTP_MONNIFY_SIGNATURE=signature)
+                latencies.append(time.perf_counter() - sent)
+                statuses[response.status_code] += 1
+        return self._result('client', deliveries, latencies, statuses, counter.count, time.perf_counter() - started)
+
+    def _run_wsgi(self, deliveries, concurrency: int) -> BenchmarkResult:
+        counter = _QueryCounter()
+        django_app = WSGIHandler()
+
+        def app(environ, start_response):
+            # Each server thread has its own connection, so the counter is installed per request.
+            with connection.execute_wrapper(counter):
+                return django_app(environ, start_response)
+
+        server = make_server('127.0.0.1', 0, app, server_class=_ThreadingWSGIServer, handler_class=_QuietHandler)
+        thread = threading.Thread(target=server.serve_forever, name='webhook-bench-server', daemon=True)
+        thread.start()
+        url = f'http://127.0.0.1:{server.server_port}{WEBHOOK_PATH}'
+        local = threading.local()
+
+        def send(delivery):
+            raw, signature = delivery
+            session = getattr(local, 'session', None) or requests.Session()
+            local.session = session
+            sent = time.perf_counter()
+            response = session.post(
+                url,
+                data=raw,
+                headers={'Content-Type': 'application/json', 'Monnify-Signature': signature, 'Host': _benchmark_host()},
+                timeout=30,
+            )
+            return time.perf_counter() - sent, response.status_code
+
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='webhook-bench') as pool:
+                outcomes = list(pool.map(send, deliveries))
+        finally:
+            elapsed = time.perf_counter() - started
+            server.shutdown()
+            server.server_close()
+        latencies = [latency for latency, _ in outcomes]
+        statuses = Counter(status for _, status in outcomes)
+        return self._result('wsgi', deliveries, latencies, statuses, counter.count, elapsed)
+
+    @staticmethod
+    def _result(transport, deliveries, latencies, statuses, queries, seconds) -> BenchmarkResult:
+        latencies = sorted(latencies)
+        return BenchmarkResult(
+            transport=transport,
+            events=len(deliveries),
+            seconds=round(seconds, 3),
+            events_per_second=round(len(deliveries) / seconds if seconds else 0.0, 1),
+            p50_ms=round(percentile(latencies, 50) * 1000, 2),
+            p99_ms=round(percentile(latencies, 99) * 1000, 2),
+            queries_per_event=round(queries / len(deliveries) if deliveries else 0.0, 2),
+            statuses={str(status): count for status, count in sorted(statuses.items())},
+        )
+
+    def _report(self, result: BenchmarkResult) -> None:
+        statuses = ', '.join(f'{status}={count}' for status, count in result.statuses.items())
+        self.stdout.write(
+            f'[{result.transport}] {result.events} deliveries in {result.seconds:.2f}s: {result.events_per_second:.1f} events/s, '
+            f'p50={result.p50_ms:.1f}ms p99={result.p99_ms:.1f}ms, {result.queries_per_event:.2f} queries/event ({statuses})'
+        )
+
+    @staticmethod
+    def _regressions(results, options) -> list[str]:
+        failures = []
+        baseline = json.loads(Path(options['baseline']).read_text()) if options['baseline'] else {}
+        tolerance = options['tolerance']
+        for result in results:
+            name = result.transport
+            if sum(count for status, count in result.statuses.items() if status != '200'):
+                failures.append(f'{name}: non-200 responses {result.statuses}')
+            if options['min_events_per_second'] is not None and result.events_per_second < options['min_events_per_second']:
+                failures.append(f'{name}: {result.events_per_second} events/s below {options["min_events_per_second"]}')
+            if options['max_p99_ms'] is not None and result.p99_ms > options['max_p99_ms']:
+                failures.append(f'{name}: p99 {result.p99_ms}ms above {options["max_p99_ms"]}ms')
+            if options['max_queries_per_event'] is not None and result.queries_per_event > options['max_queries_per_event']:
+                failures.append(f'{name}: {result.queries_per_event} queries/event above {options["max_queries_per_event"]}')
+
+            previous = baseline.get(name)
+            if not previous:
+                continue
+            if result.events_per_second < previous['events_per_second'] * (1 - tolerance):
+                failures.append(f'{name}: {result.events_per_second} events/s vs baseline {previous["events_per_second"]}')
+            if result.p99_ms > previous['p99_ms'] * (1 + tolerance):
+                failures.append(f'{name}: p99 {result.p99_ms}ms vs baseline {previous["p99_ms"]}ms')
+            if result.queries_per_event > previous['queries_per_event'] * (1 + tolerance):
+                failures.append(f'{name}: {result.queries_per_event} queries/event vs baseline {previous["queries_per_event"]}')
+        return failures
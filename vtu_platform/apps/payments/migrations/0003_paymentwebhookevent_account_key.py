@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_incomingpayment_remove_virtualaccount_is_active_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentwebhookevent',
+            name='account_key',
+            field=models.CharField(blank=True, max_length=120),
+        ),
+        migrations.AddIndex(
+            model_name='paymentwebhookevent',
+            index=models.Index(fields=['account_key', 'processed', 'id'], name='payments_webhook_drain_idx'),
+        ),
+    ]
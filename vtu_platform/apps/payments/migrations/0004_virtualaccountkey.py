@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:25
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_virtual_account_keys(apps, schema_editor):
+    VirtualAccount = apps.get_model('payments', 'VirtualAccount')
+    VirtualAccountKey = apps.get_model('payments', 'VirtualAccountKey')
+
+    batch = []
+    for account in VirtualAccount.objects.order_by('pk').iterator(chunk_size=2000):
+        number = re.sub(r'\D', '', account.account_number or '')
+        if number:
+            batch.append(VirtualAccountKey(kind='ACCOUNT_NUMBER', key=number, virtual_account_id=account.pk, user_id=account.user_id))
+        for reference in {account.account_reference, account.monnify_account_reference, account.reserved_account_reference}:
+            reference = re.sub(r'\s+', '', reference or '').upper()[:120]
+            if reference:
+                batch.append(VirtualAccountKey(kind='REFERENCE', key=reference, virtual_account_id=account.pk, user_id=account.user_id))
+        if len(batch) >= 2000:
+            VirtualAccountKey.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    VirtualAccountKey.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_paymentwebhookevent_account_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VirtualAccountKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('ACCOUNT_NUMBER', 'Account number'), ('REFERENCE', 'Reference')], max_length=20)),
+                ('key', models.CharField(max_length=120)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='paymentwebhookevent',
+            name='parked',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='paymentwebhookevent',
+            index=models.Index(fields=['parked', 'id'], name='payments_webhook_parked_idx'),
+        ),
+        migrations.AddField(
+            model_name='virtualaccountkey',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='virtualaccountkey',
+            name='virtual_account',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lookup_keys', to='payments.virtualaccount'),
+        ),
+        migrations.AddConstraint(
+            model_name='virtualaccountkey',
+            constraint=models.UniqueConstraint(fields=('kind', 'key'), name='uniq_virtual_account_key'),
+        ),
+        migrations.RunPython(backfill_virtual_account_keys, migrations.RunPython.noop),
+    ]
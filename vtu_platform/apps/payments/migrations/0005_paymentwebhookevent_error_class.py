@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_virtualaccountkey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentwebhookevent',
+            name='error_class',
+            field=models.CharField(blank=True, max_length=80),
+        ),
+    ]
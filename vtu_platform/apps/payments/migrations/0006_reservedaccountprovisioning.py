@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_provisioned_users(apps, schema_editor):
+    VirtualAccount = apps.get_model('payments', 'VirtualAccount')
+    ReservedAccountProvisioning = apps.get_model('payments', 'ReservedAccountProvisioning')
+
+    user_ids = VirtualAccount.objects.order_by('user_id').values_list('user_id', flat=True).distinct()
+    batch = []
+    for user_id in user_ids.iterator(chunk_size=2000):
+        batch.append(ReservedAccountProvisioning(user_id=user_id, status='PROVISIONED', attempts=1))
+        if len(batch) >= 2000:
+            ReservedAccountProvisioning.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    ReservedAccountProvisioning.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_paymentwebhookevent_error_class'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservedAccountProvisioning',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PROVISIONED', 'Provisioned'), ('FAILED', 'Failed'), ('SKIPPED', 'Skipped')], default='PENDING', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reserved_account_provisioning', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='payments_provisioning_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_provisioned_users, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_payloadblob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookDrainLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_key', models.CharField(max_length=120, unique=True)),
+                ('owner', models.CharField(max_length=32)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -1,3 +1,6 @@
+import json
+import zlib
+
 from django.conf import settings
 from django.db import models
 
@@ -30,14 +33,95 @@ class VirtualAccount(models.Model):
         ]
 
 
+class ReservedAccountProvisioning(models.Model):
+    """Provisioning state per user, written by the ``provision_reserved_accounts`` task and read by the console."""
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        PROVISIONED = 'PROVISIONED', 'Provisioned'
+        FAILED = 'FAILED', 'Failed'
+        SKIPPED = 'SKIPPED', 'Skipped'
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reserved_account_provisioning')
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='payments_provisioning_idx'),
+        ]
+
+
+class VirtualAccountKey(models.Model):
+    """Normalized account numbers and references pointing at their owner, for indexed webhook matching."""
+
+    class Kind(models.TextChoices):
+        ACCOUNT_NUMBER = 'ACCOUNT_NUMBER', 'Account number'
+        REFERENCE = 'REFERENCE', 'Reference'
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    key = models.CharField(max_length=120)
+    virtual_account = models.ForeignKey(VirtualAccount, on_delete=models.CASCADE, related_name='lookup_keys')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='uniq_virtual_account_key'),
+        ]
+
+
+class PayloadBlob(models.Model):
+    """Raw provider payloads stored once, keyed by the SHA-256 of their canonical JSON."""
+
+    class Encoding(models.TextChoices):
+        JSON = 'JSON', 'JSON'
+        ZLIB = 'ZLIB', 'zlib-compressed JSON'
+
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    encoding = models.CharField(max_length=10, choices=Encoding.choices, default=Encoding.JSON)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def load(self) -> dict:
+        raw = bytes(self.data)
+        if self.encoding == self.Encoding.ZLIB:
+            raw = zlib.decompress(raw)
+        return json.loads(raw)
+
+
 class PaymentWebhookEvent(models.Model):
     event_type = models.CharField(max_length=80)
     event_id = models.CharField(max_length=120, unique=True)
-    payload = models.JSONField(default=dict)
+    account_key = models.CharField(max_length=120, blank=True)
+    # Legacy inline copy; new rows leave it empty and reference payload_blob instead.
+    payload = models.JSONField(default=dict, blank=True)
+    payload_blob = models.ForeignKey(PayloadBlob, null=True, blank=True, on_delete=models.PROTECT, related_name='+')
     processed = models.BooleanField(default=False)
+    parked = models.BooleanField(default=False)
     processing_error = models.TextField(blank=True)
+    error_class = models.CharField(max_length=80, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['account_key', 'processed', 'id'], name='payments_webhook_drain_idx'),
+            models.Index(fields=['parked', 'id'], name='payments_webhook_parked_idx'),
+        ]
+
+    def get_payload(self) -> dict:
+        return self.payload_blob.load() if self.payload_blob_id else self.payload
+
+
+class WebhookDrainLease(models.Model):
+    """Per-account lease held by the process draining that account's webhook events."""
+
+    account_key = models.CharField(max_length=120, unique=True)
+    owner = models.CharField(max_length=32)
+    expires_at = models.DateTimeField()
+
 
 class IncomingPayment(models.Model):
     class Status(models.TextChoices):
@@ -53,5 +137,9 @@ class IncomingPayment(models.Model):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     currency = models.CharField(max_length=3, default='NGN')
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.RECEIVED)
-    payload = models.JSONField(default=dict)
+    payload = models.JSONField(default=dict, blank=True)
+    payload_blob = models.ForeignKey(PayloadBlob, null=True, blank=True, on_delete=models.PROTECT, related_name='+')
     created_at = models.DateTimeField(auto_now_add=True)
+
+    def get_payload(self) -> dict:
+        return self.payload_blob.load() if self.payload_blob_id else self.payload
@@ -0,0 +1,139 @@
+"""Find Monnify collections that settled without a processed webhook and credit them.
+
+The provider feed is paged into a temporary table on the current connection, anti-joined against
+``IncomingPayment.idempotency_key`` in SQL and the missing rows are read back in keyset chunks, so memory
+stays bounded by the page and chunk sizes however many transactions the window holds.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.db import connection
+
+from apps.payments.models import IncomingPayment
+from apps.payments.services import handle_monnify_webhook
+
+logger = logging.getLogger(__name__)
+
+FEED_TABLE = 'payments_reconcile_feed'
+
+
+@dataclass
+class ReconciliationReport:
+    fetched: int = 0
+    missing: int = 0
+    credited: int = 0
+    parked: int = 0
+    failed: int = 0
+    missing_references: list[str] = field(default_factory=list)
+
+
+class FixtureTransactionFeed:
+    """Offline stand-in for ``MonnifyClient.list_transactions`` serving transactions from a JSON list."""
+
+    def __init__(self, transactions: list[dict]):
+        self.transactions = transactions
+
+    @classmethod
+    def from_file(cls, path) -> FixtureTransactionFeed:
+        return cls(json.loads(Path(path).read_text()))
+
+    def list_transactions(self, *, start, end, page: int = 0, size: int = 100) -> dict:
+        content = self.transactions[page * size:(page + 1) * size]
+        return {'content': content, 'last': (page + 1) * size >= len(self.transactions), 'totalElements': len(self.transactions)}
+
+
+def feed_transaction_event(transaction: dict) -> dict:
+    """Shape a transaction-search row like a SUCCESSFUL_TRANSACTION webhook so it takes the normal credit path."""
+    product = transaction.get('product') or {}
+    event_data = {
+        'transactionReference': transaction.get('transactionReference'),
+        'paymentReference': transaction.get('paymentReference'),
+        'amountPaid': transaction.get('amountPaid', transaction.get('amount')),
+        'currency': transaction.get('currencyCode', transaction.get('currency', 'NGN')),
+        'paymentDescription': transaction.get('paymentDescription', ''),
+        'accountReference': product.get('reference') or transaction.get('accountReference'),
+        'destinationAccountInformation': transaction.get('destinationAccountInformation') or {},
+        'payerName': (transaction.get('customerDTO') or {}).get('name'),
+        'payerEmail': (transaction.get('customerDTO') or {}).get('email'),
+    }
+    return {'eventType': 'SUCCESSFUL_TRANSACTION', 'eventData': event_data, 'source': 'reconciliation'}
+
+
+class FundingReconciler:
+    def __init__(self, client, *, page_size: int = 100, chunk_size: int = 500):
+        self.client = client
+        self.page_size = page_size
+        self.chunk_size = chunk_size
+
+    def run(self, start, end, *, dry_run: bool = False) -> ReconciliationReport:
+        report = ReconciliationReport()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {FEED_TABLE}')
+            cursor.execute(f'CREATE TEMPORARY TABLE {FEED_TABLE} (idempotency_key varchar(120) PRIMARY KEY, payload text NOT NULL)')
+        try:
+            report.fetched = self._load_feed(start, end)
+            for key, payload in self._missing_rows():
+                report.missing += 1
+                if len(report.missing_references) < 50:
+                    report.missing_references.append(key)
+                if dry_run:
+                    continue
+                self._credit(json.loads(payload), report)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE IF EXISTS {FEED_TABLE}')
+        return report
+
+    def _load_feed(self, start, end) -> int:
+        """Stage PAID transactions in the temporary table; returns the number of distinct references."""
+        page = 0
+        while True:
+            body = self.client.list_transactions(start=start, end=end, page=page, size=self.page_size)
+            rows = []
+            for transaction in body.get('content') or []:
+                if transaction.get('paymentStatus', 'PAID') != 'PAID':
+                    continue
+                key = transaction.get('transactionReference') or transaction.get('paymentReference')
+                if key:
+                    rows.append((key[:120], json.dumps(feed_transaction_event(transaction))))
+            if rows:
+                with connection.cursor() as cursor:
+                    # Pages can overlap while the provider appends transactions, so duplicates are skipped.
+                    cursor.executemany(f'INSERT INTO {FEED_TABLE} (idempotency_key, payload) VALUES (%s, %s) ON CONFLICT DO NOTHING', rows)
+            if body.get('last', True) or not body.get('content'):
+                break
+            page += 1
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {FEED_TABLE}')
+            return cursor.fetchone()[0]
+
+    def _missing_rows(self):
+        incoming = IncomingPayment._meta.db_table
+        last_key = ''
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT f.idempotency_key, f.payload FROM {FEED_TABLE} f '
+                    f'LEFT JOIN {incoming} p ON p.idempotency_key = f.idempotency_key '
+                    'WHERE p.id IS NULL AND f.idempotency_key > %s ORDER BY f.idempotency_key LIMIT %s',
+                    [last_key, self.chunk_size],
+                )
+                rows = cursor.fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_key = rows[-1][0]
+
+    def _credit(self, payload: dict, report: ReconciliationReport) -> None:
+        event = handle_monnify_webhook(payload)
+        if event.processed:
+            report.credited += 1
+        elif event.parked:
+            report.parked += 1
+        else:
+            report.failed += 1
+            logger.warning('Reconciliation could not credit %s: %s', event.event_id, event.processing_error)
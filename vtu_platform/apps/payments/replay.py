@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, time
+from itertools import groupby
+
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from apps.payments.models import PaymentWebhookEvent
+from apps.payments.services import WebhookDrainLock, process_webhook_event
+
+
+@dataclass
+class ReplayOutcome:
+    event_id: str
+    account_key: str
+    status: str
+    detail: str = ''
+
+    DRY_RUN = 'would_replay'
+    PROCESSED = 'processed'
+    PARKED = 'parked'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+    LOCKED = 'locked'
+
+
+def parse_replay_boundary(value: str):
+    """Parse an ISO date or date/time filter value into an aware datetime; blank values mean no bound."""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date/time: {value!r}')
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def replayable_webhook_events(*, since=None, until=None, error_class: str = '', failed_only: bool = False):
+    events = PaymentWebhookEvent.objects.filter(processed=False)
+    if since:
+        events = events.filter(created_at__gte=since)
+    if until:
+        events = events.filter(created_at__lt=until)
+    if error_class:
+        events = events.filter(error_class=error_class)
+    if failed_only:
+        events = events.exclude(processing_error='')
+    return events
+
+
+def _replay_account(account_key: str, event_ids: list[int], dry_run: bool) -> list[ReplayOutcome]:
+    events = list(PaymentWebhookEvent.objects.filter(id__in=event_ids).select_related('payload_blob').order_by('id'))
+    if dry_run:
+        return [ReplayOutcome(event.event_id, account_key, ReplayOutcome.DRY_RUN, event.processing_error) for event in events]
+
+    lock = WebhookDrainLock(account_key)
+    if not lock.acquire():
+        return [ReplayOutcome(event.event_id, account_key, ReplayOutcome.LOCKED, 'Account is being drained.') for event in events]
+    outcomes = []
+    try:
+        for event in events:
+            if not lock.keep_alive():
+                outcomes.append(ReplayOutcome(event.event_id, account_key, ReplayOutcome.LOCKED, 'Account is being drained.'))
+                continue
+            if event.processed:
+                outcomes.append(ReplayOutcome(event.event_id, account_key, ReplayOutcome.SKIPPED, 'Already processed.'))
+                continue
+            process_webhook_event(event)
+            if event.processed:
+                status = ReplayOutcome.PROCESSED
+            else:
+                status = ReplayOutcome.PARKED if event.parked else ReplayOutcome.FAILED
+            outcomes.append(ReplayOutcome(event.event_id, account_key, status, event.processing_error))
+    finally:
+        lock.release()
+    return outcomes
+
+
+def _replay_account_in_thread(group: tuple[str, list[int]], dry_run: bool) -> list[ReplayOutcome]:
+    close_old_connections()
+    try:
+        return _replay_account(*group, dry_run)
+    finally:
+        close_old_connections()
+
+
+def replay_webhook_events(events, *, workers: int = 4, dry_run: bool = False, limit: int | None = None) -> list[ReplayOutcome]:
+    """Reprocess ``events`` with up to ``workers`` threads and return one outcome per event.
+
+    Events are grouped by account so each account is replayed in arrival order under the same lock the live
+    drainer uses; credits stay exactly-once through ``IncomingPayment.idempotency_key``. With ``workers <= 1``
+    everything runs in the calling thread.
+    """
+    rows = events.order_by('account_key', 'id').values_list('account_key', 'id')
+    if limit:
+        rows = rows[:limit]
+    groups = [(account_key, [event_id for _, event_id in group]) for account_key, group in groupby(rows, key=lambda row: row[0])]
+
+    if workers <= 1:
+        results = [_replay_account(account_key, event_ids, dry_run) for account_key, event_ids in groups]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='webhook-replay') as pool:
+            results = list(pool.map(lambda group: _replay_account_in_thread(group, dry_run), groups))
+    return [outcome for outcomes in results for outcome in outcomes]
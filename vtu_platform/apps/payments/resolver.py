@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from apps.payments.models import VirtualAccount, VirtualAccountKey
+
+MAX_DESCRIPTION_TOKENS = 8
+
+
+class _TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float | None = None) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_resolved_users = _TTLCache(
+    maxsize=getattr(settings, 'VIRTUAL_ACCOUNT_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'VIRTUAL_ACCOUNT_CACHE_TTL', 300),
+)
+# Misses expire quickly: an account created in another process only discards its keys from that process's cache.
+MISS_CACHE_TTL = getattr(settings, 'VIRTUAL_ACCOUNT_MISS_CACHE_TTL', 5)
+
+
+def normalize_account_number(value) -> str:
+    return re.sub(r'\D', '', str(value or ''))
+
+
+def normalize_reference(value) -> str:
+    return re.sub(r'\s+', '', str(value or '')).upper()[:120]
+
+
+def account_keys(account: VirtualAccount) -> list[tuple[str, str]]:
+    keys = []
+    number = normalize_account_number(account.account_number)
+    if number:
+        keys.append((VirtualAccountKey.Kind.ACCOUNT_NUMBER, number))
+    references = {account.account_reference, account.monnify_account_reference, account.reserved_account_reference}
+    keys.extend((VirtualAccountKey.Kind.REFERENCE, ref) for ref in sorted(filter(None, map(normalize_reference, references))))
+    return keys
+
+
+def index_virtual_accounts(accounts) -> None:
+    """Write lookup keys for ``accounts``; bulk paths that bypass ``post_save`` must call this themselves."""
+    rows = [
+        VirtualAccountKey(kind=kind, key=key, virtual_account_id=account.pk, user_id=account.user_id)
+        for account in accounts
+        for kind, key in account_keys(account)
+    ]
+    VirtualAccountKey.objects.bulk_create(rows, ignore_conflicts=True)
+    for row in rows:
+        _resolved_users.discard((row.kind, row.key))
+
+
+def reindex_sibling_accounts(account: VirtualAccount) -> None:
+    """Re-index the owner's other accounts, whose shared keys (such as the reservation's account_reference)
+    may have been held by ``account``'s deleted key rows."""
+    index_virtual_accounts(VirtualAccount.objects.filter(user_id=account.user_id).exclude(pk=account.pk))
+
+
+def forget_virtual_account(account: VirtualAccount) -> None:
+    for key in account_keys(account):
+        _resolved_users.discard(key)
+
+
+def _candidate_keys(event_data: dict) -> list[tuple[str, str]]:
+    """Candidates in strategy order: account number, account references, then the payment description."""
+    candidates = []
+    number = normalize_account_number((event_data.get('destinationAccountInformation') or {}).get('accountNumber'))
+    if number:
+        candidates.append((VirtualAccountKey.Kind.ACCOUNT_NUMBER, number))
+    for field in ('accountReference', 'reservedAccountReference'):
+        reference = normalize_reference(event_data.get(field))
+        if reference:
+            candidates.append((VirtualAccountKey.Kind.REFERENCE, reference))
+
+    description = str(event_data.get('paymentDescription') or '')
+    tokens = [description, *description.split()[:MAX_DESCRIPTION_TOKENS]]
+    candidates.extend((VirtualAccountKey.Kind.REFERENCE, token) for token in map(normalize_reference, tokens) if token)
+    return list(dict.fromkeys(candidates))
+
+
+def resolve_webhook_user(event_data: dict):
+    """Match a Monnify event to its user with one indexed query (or one primary-key fetch on a cache hit).
+
+    Candidates are cached as user ids, or briefly as ``0`` for keys known not to match. A cached user is only trusted when
+    every higher-priority candidate is a cached miss; the first uncached candidate sends the lookup to the DB.
+    """
+    candidates = _candidate_keys(event_data)
+    if not candidates:
+        return None
+
+    for candidate in candidates:
+        user_id = _resolved_users.get(candidate)
+        if user_id is None:
+            break
+        if user_id == 0:
+            continue
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if user:
+            return user
+        _resolved_users.discard(candidate)
+        break
+    else:
+        return None
+
+    by_kind: dict[str, list[str]] = {}
+    for kind, key in candidates:
+        by_kind.setdefault(kind, []).append(key)
+    condition = Q()
+    for kind, keys in by_kind.items():
+        condition |= Q(kind=kind, key__in=keys)
+    matches = {(row.kind, row.key): row.user for row in VirtualAccountKey.objects.filter(condition).select_related('user')}
+
+    for candidate in candidates:
+        user = matches.get(candidate)
+        # Misses are cached only for MISS_CACHE_TTL seconds, so an account created by another worker is soon matched.
+        _resolved_users.set(candidate, user.pk if user else 0, None if user else MISS_CACHE_TTL)
+        if user:
+            return user
+    return None
@@ -1,30 +1,47 @@
 import base64
 import hashlib
 import hmac
-import json
 import logging
+import os
+import secrets
+import threading
+import time
 from dataclasses import dataclass
+from datetime import timedelta
 from decimal import Decimal
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+from urllib.parse import urlencode
 
+import requests
 from django.conf import settings
 from django.core.cache import cache
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
 from django.utils.crypto import constant_time_compare
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from apps.core.metrics import record_provider_call, transport_retries
 from apps.ledger.models import LedgerEntry
 from apps.ledger.services import credit_wallet
-from apps.payments.models import IncomingPayment, PaymentWebhookEvent, VirtualAccount
-from apps.referrals.services import evaluate_referral_bonus
+from apps.payments.blobs import store_payload
+from apps.payments.models import IncomingPayment, PaymentWebhookEvent, ReservedAccountProvisioning, VirtualAccount, WebhookDrainLease
+from apps.payments.resolver import resolve_webhook_user
 
 logger = logging.getLogger(__name__)
 
 
+TOKEN_EXPIRY_MARGIN = 30
+
+
 class MonnifyAPIError(Exception):
     pass
 
 
+class UnmatchedWebhookEvent(ValueError):
+    pass
+
+
 @dataclass
 class ReservedAccountResult:
     account_reference: str
@@ -32,44 +49,153 @@ class ReservedAccountResult:
 
 
 class MonnifyClient:
+    """Monnify API client over a pooled keep-alive session; use ``get_monnify_client()`` to share one per process."""
+
     TOKEN_CACHE_KEY = 'monnify_access_token'
+    TOKEN_LOCK_KEY = 'monnify_access_token:refresh'
+    TOKEN_LOCK_TIMEOUT = 30
+    LOGIN_PATH = '/api/v1/auth/login'
+
+    def __init__(self, *, base_url: str | None = None, timeout: tuple[float, float] | None = None, pool_size: int | None = None):
+        self.base_url = (base_url or settings.MONNIFY_BASE_URL).rstrip('/')
+        self.timeout = timeout or (settings.MONNIFY_CONNECT_TIMEOUT, settings.MONNIFY_READ_TIMEOUT)
+        self.session = self._build_session(pool_size or settings.MONNIFY_POOL_SIZE)
+        self._token = ''
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+        self._refreshing = False
+
+    def _build_session(self, pool_size: int) -> requests.Session:
+        session = requests.Session()
+        # Reads are retried on transport errors and 429/5xx, but POSTs are not: reserving an account is not
+        # idempotent, so a timed-out reservation surfaces to the caller instead of being resent. The token
+        # login is the one POST that is safe to repeat and gets its own retrying adapter.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=self._retry_policy({'GET'}))
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.mount(f'{self.base_url}{self.LOGIN_PATH}', HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=self._retry_policy({'GET', 'POST'})))
+        session.headers.update({'Content-Type': 'application/json'})
+        return session
+
+    @staticmethod
+    def _retry_policy(methods) -> Retry:
+        return Retry(
+            total=settings.MONNIFY_MAX_RETRIES,
+            backoff_factor=settings.MONNIFY_RETRY_BACKOFF,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(methods),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
 
     def _request(self, method: str, path: str, data: dict | None = None, headers: dict | None = None) -> dict:
-        body = None
-        req_headers = {'Content-Type': 'application/json'}
-        if headers:
-            req_headers.update(headers)
-        if data is not None:
-            body = json.dumps(data).encode()
-
-        request = Request(f"{settings.MONNIFY_BASE_URL.rstrip('/')}{path}", data=body, method=method)
-        for key, value in req_headers.items():
-            request.add_header(key, value)
-
+        started = time.perf_counter()
+        outcome, retries = 'transport_error', 0
         try:
-            with urlopen(request, timeout=15) as response:
-                payload = json.loads(response.read().decode() or '{}')
-        except (HTTPError, URLError, TimeoutError) as exc:
-            raise MonnifyAPIError(f'Monnify request failed: {exc}') from exc
-
-        if not payload.get('requestSuccessful', False):
-            raise MonnifyAPIError(payload.get('responseMessage', 'Monnify request unsuccessful'))
-        return payload.get('responseBody', {})
+            try:
+                response = self.session.request(method, f'{self.base_url}{path}', json=data, headers=headers, timeout=self.timeout)
+            except requests.RequestException as exc:
+                raise MonnifyAPIError(f'Monnify request failed: {exc}') from exc
+
+            retries = transport_retries(response)
+            if response.status_code >= 400:
+                outcome = f'http_{response.status_code // 100}xx'
+                raise MonnifyAPIError(f'Monnify request failed: HTTP {response.status_code} {response.text[:200]}')
+            try:
+                payload = response.json() if response.content else {}
+            except ValueError as exc:
+                outcome = 'invalid_json'
+                raise MonnifyAPIError('Monnify returned an invalid JSON response.') from exc
+
+            if not payload.get('requestSuccessful', False):
+                outcome = 'api_error'
+                raise MonnifyAPIError(payload.get('responseMessage', 'Monnify request unsuccessful'))
+            outcome = 'success'
+            return payload.get('responseBody', {})
+        finally:
+            record_provider_call('monnify', path, outcome, time.perf_counter() - started, retries)
 
     def get_access_token(self) -> str:
-        cached_token = cache.get(self.TOKEN_CACHE_KEY)
-        if cached_token:
-            return cached_token
+        """Return a bearer token, logging in at most once per expiry across all workers.
+
+        Tokens are memoized in-process on top of the shared cache. Inside ``MONNIFY_TOKEN_REFRESH_AHEAD`` of
+        expiry the current token is still returned while one background thread refreshes it; on a hard miss
+        only the holder of the cache lock logs in and other callers wait for its result.
+        """
+        now = time.time()
+        token = self._usable_token(now)
+        if token:
+            return token
+
+        deadline = now + settings.MONNIFY_TOKEN_WAIT_SECONDS
+        while True:
+            if cache.add(self.TOKEN_LOCK_KEY, 1, timeout=self.TOKEN_LOCK_TIMEOUT):
+                try:
+                    return self._usable_token(time.time(), refresh_ahead=False) or self._login()
+                finally:
+                    cache.delete(self.TOKEN_LOCK_KEY)
+            time.sleep(0.05)
+            token = self._usable_token(time.time(), refresh_ahead=False)
+            if token:
+                return token
+            if time.time() >= deadline:
+                logger.warning('Timed out waiting for another worker to refresh the Monnify token; logging in directly.')
+                return self._login()
+
+    def _usable_token(self, now: float, refresh_ahead: bool = True) -> str:
+        with self._token_lock:
+            token, expires_at = self._token, self._token_expires_at
+        if expires_at - settings.MONNIFY_TOKEN_REFRESH_AHEAD <= now:
+            # The memo is missing or due for refresh; another worker may already have refreshed the shared token.
+            cached = cache.get(self.TOKEN_CACHE_KEY)
+            if isinstance(cached, dict) and cached['expires_at'] > expires_at:
+                token, expires_at = self._remember_token(cached['token'], cached['expires_at'])
+        if not token or expires_at - TOKEN_EXPIRY_MARGIN <= now:
+            return ''
+        if refresh_ahead and expires_at - settings.MONNIFY_TOKEN_REFRESH_AHEAD <= now:
+            self._refresh_in_background()
+        return token
 
+    def _remember_token(self, token: str, expires_at: float) -> tuple[str, float]:
+        with self._token_lock:
+            self._token, self._token_expires_at = token, expires_at
+        return token, expires_at
+
+    def _refresh_in_background(self) -> None:
+        with self._token_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                if cache.add(self.TOKEN_LOCK_KEY, 1, timeout=self.TOKEN_LOCK_TIMEOUT):
+                    try:
+                        cached = cache.get(self.TOKEN_CACHE_KEY)
+                        if not isinstance(cached, dict) or cached['expires_at'] - settings.MONNIFY_TOKEN_REFRESH_AHEAD <= time.time():
+                            self._login()
+                    finally:
+                        cache.delete(self.TOKEN_LOCK_KEY)
+            except MonnifyAPIError:
+                logger.warning('Background Monnify token refresh failed; the current token stays in use.', exc_info=True)
+            finally:
+                with self._token_lock:
+                    self._refreshing = False
+
+        threading.Thread(target=refresh, name='monnify-token-refresh', daemon=True).start()
+
+    def _login(self) -> str:
         credentials = f'{settings.MONNIFY_API_KEY}:{settings.MONNIFY_SECRET_KEY}'.encode()
         auth_header = base64.b64encode(credentials).decode()
-        response_body = self._request('POST', '/api/v1/auth/login', headers={'Authorization': f'Basic {auth_header}'})
+        response_body = self._request('POST', self.LOGIN_PATH, headers={'Authorization': f'Basic {auth_header}'})
         token = response_body.get('accessToken')
         expires_in = int(response_body.get('expiresIn', 300))
         if not token:
             raise MonnifyAPIError('Monnify auth token missing in response.')
-        cache.set(self.TOKEN_CACHE_KEY, token, timeout=max(expires_in - 60, 60))
-        return token
+        expires_at = time.time() + expires_in
+        # Cache for the full lifetime so other workers can keep using this token while it is being refreshed.
+        cache.set(self.TOKEN_CACHE_KEY, {'token': token, 'expires_at': expires_at}, timeout=expires_in)
+        return self._remember_token(token, expires_at)[0]
 
     def reserve_account(self, *, account_reference: str, account_name: str, customer_email: str, customer_name: str) -> ReservedAccountResult:
         token = self.get_access_token()
@@ -93,6 +219,33 @@ class MonnifyClient:
             accounts=response_body.get('accounts', []),
         )
 
+    def list_transactions(self, *, start, end, page: int = 0, size: int = 100) -> dict:
+        """One page of settled collections between ``start`` and ``end``; returns Monnify's page body."""
+        token = self.get_access_token()
+        query = urlencode({
+            'page': page,
+            'size': size,
+            'from': int(start.timestamp() * 1000),
+            'to': int(end.timestamp() * 1000),
+            'paymentStatus': 'PAID',
+        })
+        return self._request('GET', f'/api/v1/transactions/search?{query}', headers={'Authorization': f'Bearer {token}'})
+
+
+_client: MonnifyClient | None = None
+_client_pid: int | None = None
+_client_lock = threading.Lock()
+
+
+def get_monnify_client() -> MonnifyClient:
+    global _client, _client_pid
+    with _client_lock:
+        # Pooled sockets must not be shared across fork, so pre-fork servers build one client per worker process.
+        if _client is None or _client_pid != os.getpid():
+            _client = MonnifyClient()
+            _client_pid = os.getpid()
+        return _client
+
 
 def monnify_webhook_signature(raw_body: bytes) -> str:
     secret = settings.MONNIFY_SECRET_KEY.encode()
@@ -106,32 +259,7 @@ def validate_monnify_signature(raw_body: bytes, signature_header: str) -> bool:
     return constant_time_compare(expected, signature_header)
 
 
-def _user_from_webhook_event(event_data: dict):
-    account_number = (event_data.get('destinationAccountInformation') or {}).get('accountNumber')
-    payment_description = event_data.get('paymentDescription') or ''
-    references = {
-        event_data.get('accountReference'),
-        event_data.get('reservedAccountReference'),
-    }
-    references = {ref for ref in references if ref}
-
-    query = VirtualAccount.objects.filter(provider=VirtualAccount.Provider.MONNIFY)
-    if account_number:
-        va = query.filter(account_number=account_number).select_related('user').first()
-        if va:
-            return va.user
-    if references:
-        va = query.filter(account_reference__in=references).select_related('user').first()
-        if va:
-            return va.user
-    if payment_description:
-        va = query.filter(account_reference__icontains=payment_description).select_related('user').first()
-        if va:
-            return va.user
-    return None
-
-
-def process_monnify_transaction_event(payload: dict) -> None:
+def process_monnify_transaction_event(payload: dict, payload_blob=None) -> None:
     event_data = payload.get('eventData') or {}
     tx_ref = event_data.get('transactionReference')
     payment_ref = event_data.get('paymentReference')
@@ -139,9 +267,9 @@ def process_monnify_transaction_event(payload: dict) -> None:
     if not idempotency_key:
         raise ValueError('Missing transactionReference/paymentReference for idempotency.')
 
-    user = _user_from_webhook_event(event_data)
+    user = resolve_webhook_user(event_data)
     if not user:
-        raise ValueError('Unable to match webhook event to a user account.')
+        raise UnmatchedWebhookEvent('Unable to match webhook event to a user account.')
 
     amount = Decimal(str(event_data.get('amountPaid', '0'))).quantize(Decimal('0.01'))
     if amount <= 0:
@@ -158,7 +286,7 @@ def process_monnify_transaction_event(payload: dict) -> None:
                 'amount': amount,
                 'currency': event_data.get('currency', 'NGN'),
                 'status': IncomingPayment.Status.RECEIVED,
-                'payload': payload,
+                'payload_blob': payload_blob or store_payload(payload),
             },
         )
         if not created and incoming.status == IncomingPayment.Status.PROCESSED:
@@ -184,63 +312,237 @@ def process_monnify_transaction_event(payload: dict) -> None:
         incoming.status = IncomingPayment.Status.PROCESSED
         incoming.save(update_fields=['status'])
 
-        evaluate_referral_bonus(user)
+
+def monnify_configured() -> bool:
+    return all([settings.MONNIFY_API_KEY, settings.MONNIFY_SECRET_KEY, settings.MONNIFY_CONTRACT_CODE])
 
 
 def ensure_user_reserved_accounts(user) -> int:
     if VirtualAccount.objects.filter(user=user, provider=VirtualAccount.Provider.MONNIFY).exists():
         return 0
 
-    if not all([settings.MONNIFY_API_KEY, settings.MONNIFY_SECRET_KEY, settings.MONNIFY_CONTRACT_CODE]):
+    if not monnify_configured():
         logger.warning('Monnify credentials are not fully configured; skipping reserved account provisioning for user %s', user.pk)
         return 0
 
-    account_reference = f"USR-{user.pk}"
-    account_name = f"{user.get_full_name().strip() or user.username} Wallet"
-    customer_name = user.get_full_name().strip() or user.username
-    customer_email = user.email or f'user-{user.pk}@example.com'
-
-    client = MonnifyClient()
-    result = client.reserve_account(
-        account_reference=account_reference,
-        account_name=account_name,
-        customer_email=customer_email,
-        customer_name=customer_name,
-    )
+    result = get_monnify_client().reserve_account(**reserved_account_request(user))
 
     created_count = 0
-    for account in result.accounts:
+    for account in reserved_virtual_accounts(user, result):
         _, created = VirtualAccount.objects.get_or_create(
             user=user,
-            provider=VirtualAccount.Provider.MONNIFY,
-            account_reference=result.account_reference,
-            account_number=account.get('accountNumber', ''),
+            provider=account.provider,
+            account_reference=account.account_reference,
+            account_number=account.account_number,
             defaults={
-                'bank_name': account.get('bankName', ''),
-                'account_name': account.get('accountName', account_name),
-                'monnify_account_reference': account.get('accountReference', ''),
-                'reserved_account_reference': account.get('reservedAccountReference', ''),
-                'status': VirtualAccount.Status.ACTIVE,
+                'bank_name': account.bank_name,
+                'account_name': account.account_name,
+                'monnify_account_reference': account.monnify_account_reference,
+                'reserved_account_reference': account.reserved_account_reference,
+                'status': account.status,
             },
         )
         created_count += int(created)
     return created_count
 
 
-def handle_monnify_webhook(payload: dict) -> None:
+def reserved_account_request(user) -> dict:
+    customer_name = user.get_full_name().strip() or user.username
+    return {
+        'account_reference': f'USR-{user.pk}',
+        'account_name': f'{customer_name} Wallet',
+        'customer_email': user.email or f'user-{user.pk}@example.com',
+        'customer_name': customer_name,
+    }
+
+
+def reserved_virtual_accounts(user, result: ReservedAccountResult) -> list[VirtualAccount]:
+    """Unsaved ``VirtualAccount`` rows for a reservation response."""
+    account_name = reserved_account_request(user)['account_name']
+    return [
+        VirtualAccount(
+            user=user,
+            provider=VirtualAccount.Provider.MONNIFY,
+            account_reference=result.account_reference,
+            account_number=account.get('accountNumber', ''),
+            bank_name=account.get('bankName', ''),
+            account_name=account.get('accountName', account_name),
+            monnify_account_reference=account.get('accountReference', ''),
+            reserved_account_reference=account.get('reservedAccountReference', ''),
+            status=VirtualAccount.Status.ACTIVE,
+        )
+        for account in result.accounts
+    ]
+
+
+def provision_user_reserved_accounts(user_id: int) -> ReservedAccountProvisioning:
+    """Run one provisioning attempt and record its outcome.
+
+    ``MonnifyAPIError`` is re-raised so callers can retry; any other error is logged and recorded as FAILED
+    (the sweeper retries it) so it never escapes into the task runner.
+    """
+    state, _ = ReservedAccountProvisioning.objects.select_related('user').get_or_create(user_id=user_id)
+    if state.status == ReservedAccountProvisioning.Status.PROVISIONED:
+        return state
+
+    state.attempts += 1
+    try:
+        if not monnify_configured():
+            logger.warning('Monnify credentials are not fully configured; skipping reserved account provisioning for user %s', user_id)
+            state.status = ReservedAccountProvisioning.Status.SKIPPED
+        else:
+            ensure_user_reserved_accounts(state.user)
+            state.status = ReservedAccountProvisioning.Status.PROVISIONED
+        state.last_error = ''
+    except MonnifyAPIError as exc:
+        state.status = ReservedAccountProvisioning.Status.FAILED
+        state.last_error = str(exc)
+        raise
+    except Exception as exc:  # noqa: BLE001
+        logger.exception('Failed to provision Monnify reserved account for user %s', user_id)
+        state.status = ReservedAccountProvisioning.Status.FAILED
+        state.last_error = f'{exc.__class__.__name__}: {exc}'
+    finally:
+        state.save(update_fields=['status', 'attempts', 'last_error', 'updated_at'])
+    return state
+
+
+def reserved_account_provisioning_summary() -> dict[str, int]:
+    counts = dict(ReservedAccountProvisioning.objects.order_by().values_list('status').annotate(total=Count('id')))
+    return {label: counts.get(value, 0) for value, label in ReservedAccountProvisioning.Status.choices}
+
+
+WEBHOOK_DRAIN_LOCK_TIMEOUT = 300
+
+
+def webhook_event_id(payload: dict) -> str:
+    event_data = payload.get('eventData') or {}
+    return event_data.get('transactionReference') or event_data.get('paymentReference') or 'unknown-ref'
+
+
+def webhook_account_key(payload: dict) -> str:
+    """Key that events for the same customer account share; events with one key are processed in order."""
     event_data = payload.get('eventData') or {}
-    event_id = event_data.get('transactionReference') or event_data.get('paymentReference') or 'unknown-ref'
-    event, _ = PaymentWebhookEvent.objects.get_or_create(
-        event_id=event_id,
-        defaults={'event_type': payload.get('eventType', 'UNKNOWN'), 'payload': payload},
-    )
+    account_number = (event_data.get('destinationAccountInformation') or {}).get('accountNumber')
+    return str(account_number or event_data.get('accountReference') or event_data.get('reservedAccountReference') or '')[:120]
+
+
+def record_monnify_webhook(payload: dict) -> bool:
+    """Durably store a verified webhook (one event INSERT plus a no-op-on-conflict blob INSERT); returns False for a redelivered event."""
+    try:
+        with transaction.atomic():
+            PaymentWebhookEvent.objects.create(
+                event_id=webhook_event_id(payload),
+                event_type=payload.get('eventType', 'UNKNOWN'),
+                account_key=webhook_account_key(payload),
+                payload_blob=store_payload(payload),
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def process_webhook_event(event: PaymentWebhookEvent) -> PaymentWebhookEvent:
+    payload = event.get_payload()
     try:
         if payload.get('eventType') == 'SUCCESSFUL_TRANSACTION':
-            process_monnify_transaction_event(payload)
+            process_monnify_transaction_event(payload, payload_blob=event.payload_blob)
         event.processed = True
+        event.parked = False
         event.processing_error = ''
+        event.error_class = ''
+    except UnmatchedWebhookEvent as exc:
+        # Usually the account is not provisioned locally yet; parked events are retried by match_parked_webhook_events.
+        logger.warning('Parking Monnify webhook event %s: %s', event.event_id, exc)
+        event.processed = False
+        event.parked = True
+        event.processing_error = str(exc)
+        event.error_class = type(exc).__name__
     except Exception as exc:  # noqa: BLE001
-        logger.exception('Failed processing Monnify webhook event %s', event_id)
+        logger.exception('Failed processing Monnify webhook event %s', event.event_id)
         event.processed = False
+        event.parked = False
         event.processing_error = str(exc)
-    event.save(update_fields=['processed', 'processing_error'])
+        event.error_class = type(exc).__name__
+    event.save(update_fields=['processed', 'parked', 'processing_error', 'error_class'])
+    return event
+
+
+class WebhookDrainLock:
+    """One drainer per account across processes, held as an expiring ``WebhookDrainLease`` row.
+
+    The lease lasts ``WEBHOOK_DRAIN_LOCK_TIMEOUT`` seconds so a crashed drainer never blocks its account for
+    long; ``keep_alive()`` renews it every third of that while work continues.
+    """
+
+    def __init__(self, account_key: str):
+        self.account_key = account_key
+        self.owner = secrets.token_hex(16)
+        self._renew_at = 0.0
+
+    def acquire(self) -> bool:
+        """Take or renew the lease; False while another drainer holds an unexpired one."""
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=WEBHOOK_DRAIN_LOCK_TIMEOUT)
+        self._renew_at = time.monotonic() + WEBHOOK_DRAIN_LOCK_TIMEOUT / 3
+        held = Q(expires_at__lte=now) | Q(owner=self.owner)
+        if WebhookDrainLease.objects.filter(held, account_key=self.account_key).update(owner=self.owner, expires_at=expires_at):
+            return True
+        try:
+            with transaction.atomic():
+                WebhookDrainLease.objects.create(account_key=self.account_key, owner=self.owner, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        return True
+
+    def keep_alive(self) -> bool:
+        if time.monotonic() < self._renew_at:
+            return True
+        if self.acquire():
+            return True
+        logger.warning('Lost the webhook drain lease for %s; leaving the remaining events to its holder.', self.account_key)
+        return False
+
+    def release(self) -> None:
+        WebhookDrainLease.objects.filter(account_key=self.account_key, owner=self.owner).delete()
+
+
+def drain_account_webhook_events(account_key: str) -> int:
+    """Process every unprocessed event for ``account_key`` in arrival order.
+
+    A ``WebhookDrainLock`` keeps one drainer per account. A drainer that loses the race returns immediately;
+    the winner re-checks after releasing the lock so an event that arrived meanwhile is not stranded.
+    """
+    lock = WebhookDrainLock(account_key)
+    pending = PaymentWebhookEvent.objects.filter(account_key=account_key, processed=False).select_related('payload_blob').order_by('id')
+    processed = 0
+    last_id = 0
+    while True:
+        if not lock.acquire():
+            return processed
+        try:
+            for event in pending.filter(id__gt=last_id):
+                if not lock.keep_alive():
+                    return processed
+                process_webhook_event(event)
+                last_id = event.id
+                processed += 1
+        finally:
+            lock.release()
+        if not pending.filter(id__gt=last_id).exists():
+            return processed
+
+
+def handle_monnify_webhook(payload: dict) -> PaymentWebhookEvent:
+    event_id = webhook_event_id(payload)
+    event = PaymentWebhookEvent.objects.filter(event_id=event_id).first()
+    if event is None:
+        event, _ = PaymentWebhookEvent.objects.get_or_create(
+            event_id=event_id,
+            defaults={
+                'event_type': payload.get('eventType', 'UNKNOWN'),
+                'account_key': webhook_account_key(payload),
+                'payload_blob': store_payload(payload),
+            },
+        )
+    return process_webhook_event(event)
@@ -1,19 +1,35 @@
-import logging
-
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from apps.payments.services import ensure_user_reserved_accounts
-
-logger = logging.getLogger(__name__)
+from apps.payments.models import ReservedAccountProvisioning, VirtualAccount
+from apps.payments.resolver import forget_virtual_account, index_virtual_accounts, reindex_sibling_accounts
+from apps.payments.tasks import provision_reserved_accounts
 
 
 @receiver(post_save, sender=get_user_model())
 def provision_monnify_reserved_account(sender, instance, created, **kwargs):
     if not created:
         return
-    try:
-        ensure_user_reserved_accounts(instance)
-    except Exception:  # noqa: BLE001
-        logger.exception('Failed to provision Monnify reserved account for user %s', instance.pk)
+    # Monnify is called from a task after commit, with a countdown so even the sync backend runs it off the request.
+    ReservedAccountProvisioning.objects.create(user=instance)
+    user_id, countdown = instance.pk, settings.MONNIFY_PROVISION_COUNTDOWN
+    transaction.on_commit(lambda: provision_reserved_accounts.apply_async(args=(user_id,), countdown=countdown))
+
+
+@receiver(post_save, sender=VirtualAccount)
+def index_virtual_account_keys(sender, instance, created, **kwargs):
+    if not created:
+        instance.lookup_keys.all().delete()
+    forget_virtual_account(instance)
+    index_virtual_accounts([instance])
+    if not created:
+        reindex_sibling_accounts(instance)
+
+
+@receiver(post_delete, sender=VirtualAccount)
+def evict_virtual_account_keys(sender, instance, **kwargs):
+    forget_virtual_account(instance)
+    reindex_sibling_accounts(instance)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+try:
+    from celery import shared_task
+except ImportError:  # pragma: no cover
+    from apps.core.tasks import shared_task
+
+from django.utils import timezone
+
+from apps.payments.models import PaymentWebhookEvent, ReservedAccountProvisioning
+from apps.payments.reconciliation import FundingReconciler
+from apps.payments.services import (
+    MonnifyAPIError,
+    drain_account_webhook_events,
+    get_monnify_client,
+    monnify_configured,
+    provision_user_reserved_accounts,
+)
+
+PROVISIONING_RETRY_BASE_DELAY = 60
+
+
+@shared_task
+def process_webhook_events(account_key: str):
+    return drain_account_webhook_events(account_key)
+
+
+@shared_task
+def sweep_webhook_events(min_age_seconds: int = 60):
+    # Picks up events whose drain task was lost; failed events are left to replay tooling.
+    stale = PaymentWebhookEvent.objects.filter(
+        processed=False,
+        processing_error='',
+        created_at__lte=timezone.now() - timedelta(seconds=min_age_seconds),
+    )
+    for account_key in stale.order_by().values_list('account_key', flat=True).distinct().iterator():
+        process_webhook_events.delay(account_key)
+
+
+@shared_task
+def match_parked_webhook_events(batch_size: int = 500):
+    # Parked events could not be matched to an account; re-queue them once keys may exist.
+    parked = PaymentWebhookEvent.objects.filter(parked=True, processed=False).order_by('id')[:batch_size]
+    event_ids = list(parked.values_list('id', flat=True))
+    PaymentWebhookEvent.objects.filter(id__in=event_ids).update(parked=False, processing_error='')
+    for account_key in PaymentWebhookEvent.objects.filter(id__in=event_ids).order_by().values_list('account_key', flat=True).distinct():
+        process_webhook_events.delay(account_key)
+    return len(event_ids)
+
+
+@shared_task(bind=True, max_retries=6)
+def provision_reserved_accounts(self, user_id: int):
+    try:
+        return provision_user_reserved_accounts(user_id).status
+    except MonnifyAPIError as exc:
+        raise self.retry(countdown=PROVISIONING_RETRY_BASE_DELAY * 2 ** self.request.retries, exc=exc)
+
+
+@shared_task
+def sweep_reserved_account_provisioning(min_age_seconds: int = 15 * 60, batch_size: int = 500):
+    # Re-enqueues provisioning whose task was lost or whose retries ran out.
+    stale = ReservedAccountProvisioning.objects.filter(
+        status__in=[ReservedAccountProvisioning.Status.PENDING, ReservedAccountProvisioning.Status.FAILED],
+        updated_at__lte=timezone.now() - timedelta(seconds=min_age_seconds),
+    ).order_by('updated_at')
+    user_ids = list(stale.values_list('user_id', flat=True)[:batch_size])
+    for user_id in user_ids:
+        provision_reserved_accounts.delay(user_id)
+    return len(user_ids)
+
+
+@shared_task
+def reconcile_monnify_funding(hours: int = 24):
+    if not monnify_configured():
+        return None
+    end = timezone.now()
+    report = FundingReconciler(get_monnify_client()).run(end - timedelta(hours=hours), end)
+    return {'fetched': report.fetched, 'missing': report.missing, 'credited': report.credited}
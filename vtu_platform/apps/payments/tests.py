@@ -1,15 +1,46 @@
 import json
+import tempfile
+import threading
+import time
 from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase, override_settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
 
+from apps.core.models import SiteSetting
+from apps.core.site_settings import clear_site_settings_cache
 from apps.ledger.models import LedgerEntry, Wallet
-from apps.payments.models import IncomingPayment, VirtualAccount
-from apps.payments.services import monnify_webhook_signature
+from apps.payments import resolver
+from apps.payments.models import (
+    IncomingPayment,
+    PayloadBlob,
+    PaymentWebhookEvent,
+    ReservedAccountProvisioning,
+    VirtualAccount,
+    VirtualAccountKey,
+    WebhookDrainLease,
+)
+from apps.payments.services import (
+    MonnifyAPIError,
+    MonnifyClient,
+    ReservedAccountResult,
+    WebhookDrainLock,
+    drain_account_webhook_events,
+    get_monnify_client,
+    monnify_webhook_signature,
+    record_monnify_webhook,
+)
+from apps.payments.tasks import match_parked_webhook_events
 
 
-@override_settings(MONNIFY_SECRET_KEY='test-secret-key')
+@override_settings(MONNIFY_SECRET_KEY='test-secret-key', WEBHOOK_DRAIN_COUNTDOWN=0)
 class MonnifyWebhookTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -64,18 +95,20 @@ class MonnifyWebhookTests(TestCase):
         raw = json.dumps(payload).encode()
         signature = monnify_webhook_signature(raw)
 
-        first = self.client.post(
-            '/payments/monnify/webhook/',
-            data=raw,
-            content_type='application/json',
-            HTTP_MONNIFY_SIGNATURE=signature,
-        )
-        second = self.client.post(
-            '/payments/monnify/webhook/',
-            data=raw,
-            content_type='application/json',
-            HTTP_MONNIFY_SIGNATURE=signature,
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.post(
+                '/payments/monnify/webhook/',
+                data=raw,
+                content_type='application/json',
+                HTTP_MONNIFY_SIGNATURE=signature,
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.client.post(
+                '/payments/monnify/webhook/',
+                data=raw,
+                content_type='application/json',
+                HTTP_MONNIFY_SIGNATURE=signature,
+            )
 
         self.assertEqual(first.status_code, 200)
         self.assertEqual(second.status_code, 200)
@@ -87,3 +120,497 @@ class MonnifyWebhookTests(TestCase):
             LedgerEntry.objects.filter(reference='MONNIFY_MNF_TX_001', status=LedgerEntry.Status.SUCCESS).count(),
             1,
         )
+
+    def test_webhook_is_acknowledged_before_ledger_processing(self):
+        raw = json.dumps(self._payload()).encode()
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post(
+                '/payments/monnify/webhook/',
+                data=raw,
+                content_type='application/json',
+                HTTP_MONNIFY_SIGNATURE=monnify_webhook_signature(raw),
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(callbacks), 1)
+        event = PaymentWebhookEvent.objects.get(event_id='MNF_TX_001')
+        self.assertEqual(event.account_key, '0123456789')
+        self.assertFalse(event.processed)
+        self.assertEqual(IncomingPayment.objects.count(), 0)
+
+        self.assertEqual(drain_account_webhook_events('0123456789'), 1)
+        event.refresh_from_db()
+        self.assertTrue(event.processed)
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('1500.00'))
+
+    def test_webhook_only_stores_events_during_maintenance(self):
+        clear_site_settings_cache()
+        self.addCleanup(clear_site_settings_cache)
+        SiteSetting.objects.create(maintenance_mode=True)
+        raw = json.dumps(self._payload()).encode()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(
+                '/payments/monnify/webhook/',
+                data=raw,
+                content_type='application/json',
+                HTTP_MONNIFY_SIGNATURE=monnify_webhook_signature(raw),
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(callbacks, [])
+        self.assertFalse(PaymentWebhookEvent.objects.get(event_id='MNF_TX_001').processed)
+        self.assertEqual(IncomingPayment.objects.count(), 0)
+
+    @override_settings(WEBHOOK_DRAIN_COUNTDOWN=1.0)
+    @patch('apps.payments.tasks.process_webhook_events.apply_async')
+    def test_drain_is_dispatched_with_a_countdown(self, apply_async):
+        raw = json.dumps(self._payload()).encode()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/payments/monnify/webhook/', data=raw, content_type='application/json', HTTP_MONNIFY_SIGNATURE=monnify_webhook_signature(raw))
+
+        apply_async.assert_called_once_with(args=('0123456789',), countdown=1.0)
+        self.assertFalse(PaymentWebhookEvent.objects.get(event_id='MNF_TX_001').processed)
+
+    def test_drain_lease_excludes_other_drainers_until_it_expires(self):
+        record_monnify_webhook(self._payload())
+        holder = WebhookDrainLock('0123456789')
+        self.assertTrue(holder.acquire())
+
+        self.assertEqual(drain_account_webhook_events('0123456789'), 0)
+        self.assertFalse(PaymentWebhookEvent.objects.get(event_id='MNF_TX_001').processed)
+
+        # A crashed holder's lease runs out and the next drainer takes it over.
+        WebhookDrainLease.objects.update(expires_at=timezone.now())
+        self.assertEqual(drain_account_webhook_events('0123456789'), 1)
+        self.assertFalse(WebhookDrainLease.objects.exists())
+
+    def test_drainer_stops_when_its_lease_is_taken_over(self):
+        record_monnify_webhook(self._payload())
+        lock = WebhookDrainLock('0123456789')
+        self.assertTrue(lock.acquire())
+        WebhookDrainLease.objects.update(owner='other-drainer')
+        lock._renew_at = 0.0
+
+        self.assertFalse(lock.keep_alive())
+
+
+class VirtualAccountResolutionTests(TestCase):
+    def setUp(self):
+        resolver._resolved_users.clear()
+        self.user = get_user_model().objects.create_user(username='resolver-user', password='secret123')
+        self.account = VirtualAccount.objects.create(
+            user=self.user,
+            account_reference=f'USR-{self.user.pk}',
+            bank_name='Test Bank',
+            account_number='0123456789',
+            account_name='Resolver User',
+            reserved_account_reference='res-ref-9',
+        )
+
+    def test_resolves_each_strategy_with_one_query(self):
+        events = [
+            {'destinationAccountInformation': {'accountNumber': '0123456789'}},
+            {'reservedAccountReference': 'RES-REF-9'},
+            {'paymentDescription': f'Wallet top up usr-{self.user.pk}'},
+        ]
+        for event_data in events:
+            resolver._resolved_users.clear()
+            with self.assertNumQueries(1):
+                self.assertEqual(resolver.resolve_webhook_user(event_data), self.user)
+
+    def test_cached_low_priority_key_does_not_override_account_number(self):
+        other = get_user_model().objects.create_user(username='other-user', password='secret123')
+        VirtualAccount.objects.create(user=other, account_reference=f'USR-{other.pk}', bank_name='Test Bank', account_number='9876543210', account_name='Other')
+        description = {'paymentDescription': f'USR-{other.pk}'}
+        self.assertEqual(resolver.resolve_webhook_user(description), other)
+
+        event = {'destinationAccountInformation': {'accountNumber': '0123456789'}, **description}
+        self.assertEqual(resolver.resolve_webhook_user(event), self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(resolver.resolve_webhook_user(event), self.user)
+
+        unknown = {'destinationAccountInformation': {'accountNumber': '5550000000'}, **description}
+        self.assertEqual(resolver.resolve_webhook_user(unknown), other)
+        with self.assertNumQueries(1):  # the account-number miss is cached, so the description hit is trusted
+            self.assertEqual(resolver.resolve_webhook_user(unknown), other)
+
+    def test_renamed_reference_is_reindexed(self):
+        self.account.reserved_account_reference = 'res-ref-10'
+        self.account.save()
+
+        self.assertIsNone(resolver.resolve_webhook_user({'reservedAccountReference': 'res-ref-9'}))
+        self.assertEqual(resolver.resolve_webhook_user({'reservedAccountReference': 'res-ref-10'}), self.user)
+
+    def test_misses_expire_quickly(self):
+        event = {'destinationAccountInformation': {'accountNumber': '4440009999'}}
+        self.assertIsNone(resolver.resolve_webhook_user(event))
+        # As if another worker created the account: this process's cache was never told.
+        other = get_user_model().objects.create_user(username='elsewhere', password='secret123')
+        VirtualAccount.objects.bulk_create([VirtualAccount(user=other, account_reference='USR-ELSE', bank_name='Test Bank', account_number='4440009999', account_name='Else')])
+        resolver.index_virtual_accounts(VirtualAccount.objects.filter(user=other))
+        resolver._resolved_users.set(('ACCOUNT_NUMBER', '4440009999'), 0, resolver.MISS_CACHE_TTL)
+        self.assertIsNone(resolver.resolve_webhook_user(event))
+
+        with patch('apps.payments.resolver.time.monotonic', return_value=time.monotonic() + resolver.MISS_CACHE_TTL + 1):
+            self.assertEqual(resolver.resolve_webhook_user(event), other)
+
+    def test_siblings_keep_the_shared_reference_when_one_account_changes(self):
+        sibling = VirtualAccount.objects.create(
+            user=self.user, account_reference=self.account.account_reference, bank_name='Other Bank', account_number='0123456780', account_name='Resolver User'
+        )
+        reference = {'accountReference': self.account.account_reference}
+
+        self.account.bank_name = 'Renamed Bank'
+        self.account.save()
+        self.account.delete()
+        resolver._resolved_users.clear()
+
+        self.assertEqual(resolver.resolve_webhook_user(reference), self.user)
+        self.assertEqual(VirtualAccountKey.objects.get(kind='REFERENCE', key=reference['accountReference'].upper()).virtual_account, sibling)
+
+    def test_unmatched_event_is_parked_until_account_exists(self):
+        payload = {
+            'eventType': 'SUCCESSFUL_TRANSACTION',
+            'eventData': {
+                'transactionReference': 'MNF_TX_PARK',
+                'amountPaid': 500,
+                'destinationAccountInformation': {'accountNumber': '5550001111'},
+            },
+        }
+        record_monnify_webhook(payload)
+        drain_account_webhook_events('5550001111')
+        event = PaymentWebhookEvent.objects.get(event_id='MNF_TX_PARK')
+        self.assertTrue(event.parked)
+        self.assertFalse(event.processed)
+
+        VirtualAccount.objects.create(user=self.user, account_reference='USR-LATE', bank_name='Test Bank', account_number='5550001111', account_name='Late')
+        self.assertEqual(match_parked_webhook_events(), 1)
+
+        event.refresh_from_db()
+        self.assertTrue(event.processed)
+        self.assertFalse(event.parked)
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('500.00'))
+
+
+class WebhookReplayTests(TestCase):
+    def setUp(self):
+        resolver._resolved_users.clear()
+        self.user = get_user_model().objects.create_user(username='replay-user', password='secret123')
+        for reference in ('MNF_TX_R1', 'MNF_TX_R2'):
+            record_monnify_webhook({
+                'eventType': 'SUCCESSFUL_TRANSACTION',
+                'eventData': {
+                    'transactionReference': reference,
+                    'amountPaid': 250,
+                    'destinationAccountInformation': {'accountNumber': '7770001111'},
+                },
+            })
+        drain_account_webhook_events('7770001111')
+
+    def _replay(self, *args):
+        out = StringIO()
+        call_command('replay_webhook_events', '--workers', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_reports_without_processing(self):
+        output = self._replay('--dry-run', '--error-class', 'UnmatchedWebhookEvent')
+
+        self.assertIn('MNF_TX_R1\t7770001111\twould_replay', output)
+        self.assertIn('would_replay=2', output)
+        self.assertEqual(PaymentWebhookEvent.objects.filter(processed=False).count(), 2)
+
+    def test_replay_credits_once_and_reports_outcomes(self):
+        VirtualAccount.objects.create(user=self.user, account_reference='USR-REPLAY', bank_name='Test Bank', account_number='7770001111', account_name='Replay')
+        # Simulate a replay racing a redelivery that already credited R2.
+        IncomingPayment.objects.create(user=self.user, idempotency_key='MNF_TX_R2', amount=Decimal('250.00'), status=IncomingPayment.Status.PROCESSED)
+
+        output = self._replay('--failed-only')
+        self.assertIn('processed=2', output)
+        self.assertIn('no events selected', self._replay())
+
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('250.00'))
+        self.assertEqual(IncomingPayment.objects.count(), 2)
+
+
+class _Response:
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.content = b'{}' if payload is not None else b''
+        self.text = str(payload)
+
+    def json(self):
+        return self.payload
+
+
+class MonnifyClientTests(TestCase):
+    def test_client_is_shared_and_pooled(self):
+        client = get_monnify_client()
+
+        self.assertIs(get_monnify_client(), client)
+        adapter = client.session.get_adapter('https://sandbox.monnify.com/api/v2/bank-transfer/reserved-accounts')
+        self.assertIs(client.session.get_adapter('http://sandbox.monnify.com'), adapter)
+        self.assertEqual(adapter.max_retries.status_forcelist, (429, 500, 502, 503, 504))
+
+    def test_only_reads_and_token_login_are_retried(self):
+        session = get_monnify_client().session
+        reserve = session.get_adapter('https://sandbox.monnify.com/api/v2/bank-transfer/reserved-accounts').max_retries
+        login = session.get_adapter('https://sandbox.monnify.com/api/v1/auth/login').max_retries
+        self.assertEqual(reserve.allowed_methods, frozenset({'GET'}))
+        self.assertEqual(login.allowed_methods, frozenset({'GET', 'POST'}))
+
+    @patch('apps.payments.services.record_provider_call')
+    @patch('apps.payments.services.requests.Session.request')
+    def test_request_unwraps_body_and_maps_errors(self, request_mock, record_mock):
+        client = get_monnify_client()
+        request_mock.return_value = _Response(payload={'requestSuccessful': True, 'responseBody': {'accessToken': 'tok'}})
+        self.assertEqual(client._request('POST', '/api/v1/auth/login'), {'accessToken': 'tok'})
+        self.assertEqual(request_mock.call_args.kwargs['timeout'], (5.0, 15.0))
+
+        request_mock.return_value = _Response(status_code=503, payload={})
+        with self.assertRaisesMessage(MonnifyAPIError, 'HTTP 503'):
+            client._request('POST', '/api/v1/auth/login')
+        self.assertEqual([call.args[2] for call in record_mock.call_args_list], ['success', 'http_5xx'])
+
+
+class MonnifyTokenRefreshTests(SimpleTestCase):
+    def setUp(self):
+        cache.delete_many([MonnifyClient.TOKEN_CACHE_KEY, MonnifyClient.TOKEN_LOCK_KEY])
+        self.logins = 0
+
+    def _fake_login(self, method, path, data=None, headers=None):
+        self.logins += 1
+        time.sleep(0.1)
+        return {'accessToken': f'token-{self.logins}', 'expiresIn': 3600}
+
+    def test_concurrent_misses_log_in_once(self):
+        clients = [MonnifyClient() for _ in range(8)]
+        tokens = []
+        with patch.object(MonnifyClient, '_request', side_effect=self._fake_login):
+            threads = [threading.Thread(target=lambda c=client: tokens.append(c.get_access_token())) for client in clients]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(self.logins, 1)
+        self.assertEqual(tokens, ['token-1'] * 8)
+
+    def test_token_near_expiry_is_served_while_refreshing_in_background(self):
+        client = MonnifyClient()
+        client._remember_token('old-token', time.time() + 60)
+        with patch.object(MonnifyClient, '_request', side_effect=self._fake_login):
+            self.assertEqual(client.get_access_token(), 'old-token')
+            for _ in range(50):
+                if client._token == 'token-1':
+                    break
+                time.sleep(0.02)
+
+        self.assertEqual(self.logins, 1)
+        self.assertEqual(client.get_access_token(), 'token-1')
+        self.assertEqual(cache.get(MonnifyClient.TOKEN_CACHE_KEY)['token'], 'token-1')
+
+
+@override_settings(MONNIFY_API_KEY='key', MONNIFY_SECRET_KEY='secret', MONNIFY_CONTRACT_CODE='contract', MONNIFY_PROVISION_COUNTDOWN=0)
+class ReservedAccountProvisioningTests(TestCase):
+    @patch.object(MonnifyClient, 'reserve_account')
+    def test_signup_queues_provisioning_after_commit(self, reserve_mock):
+        reserve_mock.return_value = ReservedAccountResult(
+            account_reference='USR-1',
+            accounts=[{'accountNumber': '9990001111', 'bankName': 'Test Bank', 'accountName': 'New User'}],
+        )
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            user = get_user_model().objects.create_user(username='new-user', password='secret123')
+        state = ReservedAccountProvisioning.objects.get(user=user)
+        self.assertEqual(state.status, ReservedAccountProvisioning.Status.PENDING)
+        reserve_mock.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+        state.refresh_from_db()
+        self.assertEqual(state.status, ReservedAccountProvisioning.Status.PROVISIONED)
+        self.assertEqual(state.attempts, 1)
+        self.assertTrue(VirtualAccount.objects.filter(user=user, account_number='9990001111').exists())
+
+    @patch.object(MonnifyClient, 'reserve_account', side_effect=MonnifyAPIError('HTTP 503'))
+    def test_failed_attempt_is_recorded_and_console_does_not_call_monnify(self, reserve_mock):
+        with self.captureOnCommitCallbacks(execute=True):
+            staff = get_user_model().objects.create_user(username='ops', password='secret123', is_staff=True)
+        state = ReservedAccountProvisioning.objects.get(user=staff)
+        self.assertEqual(state.status, ReservedAccountProvisioning.Status.FAILED)
+        self.assertEqual(state.last_error, 'HTTP 503')
+
+        self.client.force_login(staff)
+        response = self.client.get('/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['provisioning_summary']['Failed'], 1)
+        self.assertContains(response, '<title>Ops Console</title>', html=False)
+        self.assertContains(response, 'Reserved account provisioning', count=1)
+        self.assertEqual(reserve_mock.call_count, 1)
+
+    @override_settings(MONNIFY_PROVISION_COUNTDOWN=1.0)
+    @patch('apps.core.tasks.get_executor')
+    @patch.object(MonnifyClient, 'reserve_account')
+    def test_signup_request_never_calls_monnify(self, reserve_mock, get_executor):
+        data = {'username': 'async-user', 'email': 'async@example.com', 'password1': 'Strongpass123!', 'password2': 'Strongpass123!'}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/accounts/signup/', data)
+
+        self.assertEqual(response.status_code, 302)
+        reserve_mock.assert_not_called()
+        user = get_user_model().objects.get(username='async-user')
+        task, args, kwargs = get_executor.return_value.submit.call_args.args
+        self.assertEqual((task.name, args), ('apps.payments.tasks.provision_reserved_accounts', (user.pk,)))
+        self.assertEqual(get_executor.return_value.submit.call_args.kwargs, {'countdown': 1.0})
+
+    @patch.object(MonnifyClient, 'reserve_account', side_effect=KeyError('accounts'))
+    def test_unexpected_errors_are_recorded_instead_of_escaping_signup(self, reserve_mock):
+        with self.assertLogs('apps.payments.services', level='ERROR'), self.captureOnCommitCallbacks(execute=True):
+            user = get_user_model().objects.create_user(username='unlucky', password='secret123')
+        state = ReservedAccountProvisioning.objects.get(user=user)
+        self.assertEqual(state.status, ReservedAccountProvisioning.Status.FAILED)
+        self.assertEqual(state.last_error, "KeyError: 'accounts'")
+
+
+@override_settings(MONNIFY_API_KEY='key', MONNIFY_SECRET_KEY='secret', MONNIFY_CONTRACT_CODE='contract')
+class BackfillReservedAccountsTests(TestCase):
+    def setUp(self):
+        self.users = [get_user_model().objects.create_user(username=f'legacy-{index}', password='secret123') for index in range(3)]
+        VirtualAccount.objects.create(user=self.users[0], account_reference='USR-OLD', bank_name='Test Bank', account_number='1110000000', account_name='Old')
+
+    @staticmethod
+    def _reserve(*, account_reference, account_name, customer_email, customer_name):
+        if customer_name == 'legacy-2':
+            raise MonnifyAPIError('HTTP 503')
+        number = '222000000' + account_reference[-1]
+        return ReservedAccountResult(account_reference=account_reference, accounts=[{'accountNumber': number, 'bankName': 'Test Bank'}])
+
+    @patch.object(MonnifyClient, 'reserve_account')
+    def test_backfill_skips_existing_accounts_and_resumes_from_checkpoint(self, reserve_mock):
+        reserve_mock.side_effect = self._reserve
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = Path(directory, 'checkpoint.json')
+            options = ['--checkpoint', str(checkpoint), '--workers', '2', '--rate', '0', '--chunk-size', '1']
+            call_command('backfill_reserved_accounts', *options, '--limit', '1', stdout=StringIO())
+            self.assertEqual(json.loads(checkpoint.read_text()), {'last_user_id': self.users[1].pk})
+
+            call_command('backfill_reserved_accounts', *options, stdout=StringIO())
+            self.assertFalse(checkpoint.exists())
+
+        self.assertEqual([call.kwargs['customer_name'] for call in reserve_mock.call_args_list], ['legacy-1', 'legacy-2'])
+        account = VirtualAccount.objects.get(user=self.users[1])
+        self.assertTrue(account.lookup_keys.filter(key=account.account_number).exists())
+        states = dict(ReservedAccountProvisioning.objects.values_list('user__username', 'status'))
+        self.assertEqual(states['legacy-1'], ReservedAccountProvisioning.Status.PROVISIONED)
+        self.assertEqual(states['legacy-2'], ReservedAccountProvisioning.Status.FAILED)
+
+
+@override_settings(PAYLOAD_BLOB_COMPRESS_MIN_BYTES=64)
+class PayloadBlobTests(TestCase):
+    def setUp(self):
+        resolver._resolved_users.clear()
+        self.user = get_user_model().objects.create_user(username='blob-user', password='secret123')
+        VirtualAccount.objects.create(user=self.user, account_reference='USR-BLOB', bank_name='Test Bank', account_number='4440001111', account_name='Blob')
+        self.payload = {
+            'eventType': 'SUCCESSFUL_TRANSACTION',
+            'eventData': {
+                'transactionReference': 'MNF_TX_BLOB',
+                'amountPaid': 100,
+                'paymentDescription': 'wallet funding ' * 10,
+                'destinationAccountInformation': {'accountNumber': '4440001111'},
+            },
+        }
+
+    def test_event_and_payment_share_one_compressed_blob(self):
+        record_monnify_webhook(self.payload)
+        drain_account_webhook_events('4440001111')
+
+        event = PaymentWebhookEvent.objects.get(event_id='MNF_TX_BLOB')
+        payment = IncomingPayment.objects.get(idempotency_key='MNF_TX_BLOB')
+        self.assertEqual(event.payload, {})
+        self.assertEqual(event.payload_blob_id, payment.payload_blob_id)
+        self.assertEqual(PayloadBlob.objects.count(), 1)
+        self.assertEqual(event.payload_blob.encoding, PayloadBlob.Encoding.ZLIB)
+        self.assertEqual(payment.get_payload(), self.payload)
+
+    def test_dedupe_command_moves_inline_payloads(self):
+        for event_id in ('LEGACY-1', 'LEGACY-2'):
+            PaymentWebhookEvent.objects.create(event_id=event_id, event_type='SUCCESSFUL_TRANSACTION', payload=self.payload)
+        IncomingPayment.objects.create(user=self.user, idempotency_key='LEGACY-1', amount=Decimal('100.00'), payload=self.payload)
+
+        call_command('dedupe_payment_payloads', '--chunk-size', '1', stdout=StringIO())
+
+        self.assertEqual(PayloadBlob.objects.count(), 1)
+        self.assertFalse(PaymentWebhookEvent.objects.filter(payload_blob__isnull=True).exists())
+        self.assertEqual(IncomingPayment.objects.get().payload, {})
+        self.assertEqual(PaymentWebhookEvent.objects.get(event_id='LEGACY-2').get_payload(), self.payload)
+
+
+class FundingReconciliationTests(TestCase):
+    def setUp(self):
+        resolver._resolved_users.clear()
+        self.user = get_user_model().objects.create_user(username='recon-user', password='secret123')
+        VirtualAccount.objects.create(user=self.user, account_reference='USR-RECON', bank_name='Test Bank', account_number='3330001111', account_name='Recon')
+        IncomingPayment.objects.create(user=self.user, idempotency_key='MNF_TX_SEEN', amount=Decimal('50.00'), status=IncomingPayment.Status.PROCESSED)
+        transactions = [
+            {'transactionReference': 'MNF_TX_SEEN', 'amountPaid': 50, 'paymentStatus': 'PAID', 'product': {'reference': 'USR-RECON'}},
+            {'transactionReference': 'MNF_TX_LOST', 'amountPaid': 700, 'paymentStatus': 'PAID', 'product': {'reference': 'USR-RECON'}},
+            {'transactionReference': 'MNF_TX_OPEN', 'amountPaid': 900, 'paymentStatus': 'PENDING', 'product': {'reference': 'USR-RECON'}},
+            {'transactionReference': 'MNF_TX_LOST', 'amountPaid': 700, 'paymentStatus': 'PAID', 'product': {'reference': 'USR-RECON'}},
+        ]
+        self.directory = tempfile.TemporaryDirectory()
+        self.fixture = Path(self.directory.name, 'transactions.json')
+        self.fixture.write_text(json.dumps(transactions))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _reconcile(self, *args):
+        out = StringIO()
+        call_command('reconcile_monnify_funding', '--fixture', str(self.fixture), '--page-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_lists_settled_transactions_without_credit(self):
+        output = self._reconcile('--dry-run')
+
+        self.assertIn('missing\tMNF_TX_LOST', output)
+        self.assertIn('Fetched 2 settled transaction(s); 1 missing', output)
+        self.assertFalse(Wallet.objects.filter(user=self.user, balance__gt=0).exists())
+
+    def test_missing_transactions_are_credited_once(self):
+        self.assertIn('credited=1', self._reconcile())
+        self.assertIn('0 missing', self._reconcile())
+
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('700.00'))
+        self.assertTrue(PaymentWebhookEvent.objects.get(event_id='MNF_TX_LOST').processed)
+
+
+@override_settings(MONNIFY_SECRET_KEY='bench-secret', WEBHOOK_DRAIN_COUNTDOWN=0, MONNIFY_PROVISION_COUNTDOWN=0)
+class WebhookBenchmarkTests(TestCase):
+    def _benchmark(self, *args):
+        out = StringIO()
+        call_command('webhook_benchmark', '--transport', 'client', '--events', '20', '--accounts', '3', '--seed', '7', *args, stdout=out)
+        return out.getvalue()
+
+    def test_reports_rate_latency_and_queries_for_mixed_deliveries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            output = self._benchmark('--duplicate-rate', '0.3', '--unknown-rate', '0.2')
+
+        self.assertIn('events/s', output)
+        self.assertIn('queries/event', output)
+        self.assertIn('within thresholds', output)
+        events = PaymentWebhookEvent.objects.filter(event_id__startswith='BENCH-')
+        self.assertEqual(events.count(), 20)
+        self.assertTrue(events.filter(parked=True).exists())
+
+    def test_threshold_breach_fails_and_baseline_is_written(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = Path(directory, 'baseline.json')
+            with self.assertRaisesMessage(CommandError, 'regressed'):
+                self._benchmark('--max-queries-per-event', '0.5', '--write-baseline', str(baseline))
+            self.assertIn('queries_per_event', json.loads(baseline.read_text())['client'])
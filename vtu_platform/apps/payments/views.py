@@ -1,10 +1,13 @@
 import json
 import logging
 
+from django.conf import settings
+from django.db import transaction
 from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
-from apps.payments.services import handle_monnify_webhook, validate_monnify_signature
+from apps.payments.services import record_monnify_webhook, validate_monnify_signature, webhook_account_key
+from apps.payments.tasks import process_webhook_events
 
 logger = logging.getLogger(__name__)
 
@@ -25,5 +28,14 @@ def monnify_webhook(request: HttpRequest) -> HttpResponse:
         logger.warning('Rejected Monnify webhook due to invalid JSON payload.')
         return JsonResponse({'detail': 'Invalid payload'}, status=400)
 
-    handle_monnify_webhook(payload)
+    # Persist and acknowledge; ledger work happens in process_webhook_events so Monnify never waits on it.
+    # Redeliveries are still dispatched so an event that failed earlier gets another attempt.
+    if not record_monnify_webhook(payload):
+        logger.info('Monnify webhook redelivered; event already stored.')
+    if getattr(request, 'maintenance_mode', False):
+        # Enqueue-only during maintenance: the stored event is picked up by sweep_webhook_events afterwards.
+        return JsonResponse({'status': 'accepted'}, status=200)
+    account_key = webhook_account_key(payload)
+    countdown = settings.WEBHOOK_DRAIN_COUNTDOWN
+    transaction.on_commit(lambda: process_webhook_events.apply_async(args=(account_key,), countdown=countdown))
     return JsonResponse({'status': 'accepted'}, status=200)
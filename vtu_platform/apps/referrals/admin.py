@@ -1,5 +1,6 @@
 from django.contrib import admin
 
-from .models import Referral
+from .models import Referral, ReferralStats
 
 admin.site.register(Referral)
+admin.site.register(ReferralStats)
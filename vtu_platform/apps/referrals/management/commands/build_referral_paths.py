@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.referrals.models import ReferralPath
+from apps.referrals.tree import build_referral_paths
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ReferralPath closure table from Profile.referred_by, one set-based statement per level.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-depth', type=int, default=None, help='Deepest level to store (defaults to REFERRAL_TREE_MAX_DEPTH).')
+
+    def handle(self, *args, **options):
+        if options['max_depth'] is not None and options['max_depth'] < 1:
+            raise CommandError('--max-depth must be at least 1.')
+        written = build_referral_paths(options['max_depth'])
+        self.stdout.write(self.style.SUCCESS(f'Built {written} referral path(s); table now holds {ReferralPath.objects.count()}.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.referrals.services import rebuild_referral_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-referrer ReferralStats counters from Referral rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        rebuilt = rebuild_referral_stats(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt referral stats for {rebuilt} referrer(s).'))
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:44
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def backfill_eligibility_flags(apps, schema_editor):
+    Referral = apps.get_model('referrals', 'Referral')
+    LedgerEntry = apps.get_model('ledger', 'LedgerEntry')
+    PurchaseOrder = apps.get_model('vtu', 'PurchaseOrder')
+    Profile = apps.get_model('accounts', 'Profile')
+
+    min_fund = Decimal(str(settings.REFERRAL_MIN_FUND)).quantize(Decimal('0.01'))
+    pending = Referral.objects.exclude(status='PAID')
+    pending.filter(
+        Exists(
+            LedgerEntry.objects.filter(
+                user_id=OuterRef('referee_id'), tx_type='FUNDING', direction='CREDIT', status='SUCCESS', amount__gte=min_fund
+            )
+        )
+    ).update(funding_met=True)
+    pending.filter(
+        Exists(PurchaseOrder.objects.filter(user_id=OuterRef('referee_id'), status='success', product_type__in=['airtime', 'data', 'bill']))
+    ).update(purchase_met=True)
+    pending.filter(Exists(Profile.objects.filter(user_id=OuterRef('referee_id'), email_verified=True))).update(email_met=True)
+    Referral.objects.filter(status='PAID').update(funding_met=True, purchase_met=True, email_met=True)
+    for referral in Referral.objects.filter(bonus_reference=''):
+        referral.bonus_reference = f'REF-BONUS-{referral.referee_id}'
+        referral.save(update_fields=['bonus_reference'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referrals', '0002_referral_delete_referralbonus'),
+        ('accounts', '0002_profile_email_verified'),
+        ('ledger', '0002_bank_grade_ledger'),
+        ('vtu', '0004_purchaseorder_verify_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='referral',
+            name='email_met',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='referral',
+            name='funding_met',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='referral',
+            name='purchase_met',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(backfill_eligibility_flags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referrals', '0003_referral_eligibility_flags'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='referral',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('QUALIFIED', 'Qualified'), ('PAID', 'Paid')], default='PENDING', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='referral',
+            index=models.Index(fields=['status', 'referrer'], name='referrals_payout_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:49
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_referral_stats(apps, schema_editor):
+    Referral = apps.get_model('referrals', 'Referral')
+    ReferralStats = apps.get_model('referrals', 'ReferralStats')
+
+    rows = (
+        Referral.objects.order_by()
+        .values('referrer_id')
+        .annotate(
+            total=Count('id'),
+            paid=Count('id', filter=Q(status='PAID')),
+            pending=Count('id', filter=~Q(status='PAID')),
+            total_bonus=Coalesce(Sum('bonus_amount', filter=Q(status='PAID')), Decimal('0.00')),
+        )
+    )
+    ReferralStats.objects.bulk_create([ReferralStats(referrer_id=row.pop('referrer_id'), **row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('referrals', '0004_referral_qualified_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferralStats',
+            fields=[
+                ('referrer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='referral_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.IntegerField(default=0)),
+                ('paid', models.IntegerField(default=0)),
+                ('pending', models.IntegerField(default=0)),
+                ('total_bonus', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_referral_stats, migrations.RunPython.noop),
+    ]
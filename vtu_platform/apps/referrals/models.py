@@ -7,6 +7,7 @@ from django.db import models
 class Referral(models.Model):
     class Status(models.TextChoices):
         PENDING = 'PENDING', 'Pending'
+        QUALIFIED = 'QUALIFIED', 'Qualified'
         PAID = 'PAID', 'Paid'
 
     referrer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='referrals_made')
@@ -16,10 +17,46 @@ class Referral(models.Model):
     bonus_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
     bonus_reference = models.CharField(max_length=64, unique=True, blank=True)
     rewarded_at = models.DateTimeField(null=True, blank=True)
+    funding_met = models.BooleanField(default=False)
+    purchase_met = models.BooleanField(default=False)
+    email_met = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ('-created_at',)
+        indexes = [models.Index(fields=['status', 'referrer'], name='referrals_payout_idx')]
 
     def __str__(self):
         return f'Referral<{self.referrer_id}->{self.referee_id}:{self.status}>'
+
+
+class ReferralStats(models.Model):
+    """Per-referrer counters kept in step with ``Referral`` rows so the dashboard reads one row."""
+
+    referrer = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='referral_stats')
+    total = models.IntegerField(default=0)
+    paid = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+    total_bonus = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'ReferralStats<{self.referrer_id}:{self.paid}/{self.total}>'
+
+
+class ReferralPath(models.Model):
+    """Closure table of the referral graph: one row per (ancestor, descendant) pair, ``depth`` hops apart."""
+
+    ancestor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='referral_descendant_paths')
+    descendant = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='referral_ancestor_paths')
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['ancestor', 'descendant'], name='uniq_referral_path')]
+        indexes = [
+            models.Index(fields=['ancestor', 'depth'], name='referrals_path_down_idx'),
+            models.Index(fields=['descendant', 'depth'], name='referrals_path_up_idx'),
+        ]
+
+    def __str__(self):
+        return f'ReferralPath<{self.ancestor_id}->{self.descendant_id}:{self.depth}>'
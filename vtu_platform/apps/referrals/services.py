@@ -1,77 +1,249 @@
 from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
 
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from apps.ledger.models import LedgerEntry
-from apps.ledger.services import credit_wallet
-from apps.referrals.models import Referral
+from apps.ledger.services import credit_wallet_batch
+from apps.referrals.models import Referral, ReferralStats
 from apps.vtu.models import PurchaseOrder
 
+QUALIFYING_PRODUCT_TYPES = (
+    PurchaseOrder.ProductType.AIRTIME,
+    PurchaseOrder.ProductType.DATA,
+    PurchaseOrder.ProductType.BILL,
+)
+ELIGIBILITY_FLAGS = ('funding_met', 'purchase_met', 'email_met')
+
 
 def _bonus_amount(minimum_funding: Decimal) -> Decimal:
     return (minimum_funding * Decimal(settings.REFERRAL_BONUS_PERCENT / 100)).quantize(Decimal('0.01'))
 
 
-@transaction.atomic
-def evaluate_referral_bonus(referee_user):
-    profile = getattr(referee_user, 'profile', None)
-    if not profile or not profile.referred_by:
-        return None
-
-    referral, _ = Referral.objects.select_for_update().get_or_create(
-        referee=referee_user,
-        defaults={
-            'referrer': profile.referred_by,
-            'referral_code_used': getattr(profile.referred_by, 'profile', None).referral_code if hasattr(profile.referred_by, 'profile') else '',
-        },
+def bonus_reference_for(referee_id: int) -> str:
+    return f'REF-BONUS-{referee_id}'
+
+
+def referral_min_fund() -> Decimal:
+    return Decimal(str(settings.REFERRAL_MIN_FUND)).quantize(Decimal('0.01'))
+
+
+def is_qualifying_funding(entry: LedgerEntry) -> bool:
+    return (
+        entry.tx_type == LedgerEntry.TransactionType.FUNDING
+        and entry.direction == LedgerEntry.Direction.CREDIT
+        and entry.status == LedgerEntry.Status.SUCCESS
+        and entry.amount >= referral_min_fund()
     )
 
-    if referral.status == Referral.Status.PAID:
-        return referral
 
-    min_fund = Decimal(str(settings.REFERRAL_MIN_FUND)).quantize(Decimal('0.01'))
-    qualifying_funding_exists = LedgerEntry.objects.filter(
-        user=referee_user,
-        tx_type=LedgerEntry.TransactionType.FUNDING,
-        direction=LedgerEntry.Direction.CREDIT,
-        status=LedgerEntry.Status.SUCCESS,
-        amount__gte=min_fund,
-    ).exists()
-
-    qualifying_purchase_exists = PurchaseOrder.objects.filter(
-        user=referee_user,
-        status=PurchaseOrder.Status.SUCCESS,
-        product_type__in=[
-            PurchaseOrder.ProductType.AIRTIME,
-            PurchaseOrder.ProductType.DATA,
-            PurchaseOrder.ProductType.BILL,
-        ],
-    ).exists()
+def is_qualifying_purchase(order: PurchaseOrder) -> bool:
+    return order.status == PurchaseOrder.Status.SUCCESS and order.product_type in QUALIFYING_PRODUCT_TYPES
+
+
+def referral_settled_or_absent(user) -> bool:
+    """True when relations already loaded on ``user`` show no bonus can be pending; never queries."""
+    User = get_user_model()
+    if User.profile.is_cached(user):
+        profile = getattr(user, 'profile', None)
+        if profile is None or not profile.referred_by_id:
+            return True
+    if User.referral_record.is_cached(user):
+        referral = getattr(user, 'referral_record', None)
+        return referral is None or referral.status == Referral.Status.PAID
+    return False
+
+
+def adjust_referral_stats(referrer_id: int, *, create: bool = True, **deltas) -> None:
+    """Apply counter deltas with ``F()`` so concurrent creates and payouts never overwrite each other."""
+    changes = {name: F(name) + delta for name, delta in deltas.items() if delta}
+    if not changes:
+        return
+    changes['updated_at'] = timezone.now()
+    if ReferralStats.objects.filter(referrer_id=referrer_id).update(**changes) or not create:
+        return
+    ReferralStats.objects.bulk_create([ReferralStats(referrer_id=referrer_id)], ignore_conflicts=True)
+    ReferralStats.objects.filter(referrer_id=referrer_id).update(**changes)
+
+
+def rebuild_referral_stats(chunk_size: int = 1000) -> int:
+    """Recompute every referrer's counters from ``Referral`` rows; returns the number of referrers."""
+    aggregates = (
+        Referral.objects.order_by()
+        .values('referrer_id')
+        .annotate(
+            total=Count('id'),
+            paid=Count('id', filter=Q(status=Referral.Status.PAID)),
+            pending=Count('id', filter=~Q(status=Referral.Status.PAID)),
+            total_bonus=Coalesce(Sum('bonus_amount', filter=Q(status=Referral.Status.PAID)), Decimal('0.00')),
+        )
+        .order_by('referrer_id')
+    )
+    rebuilt = 0
+    batch = []
+    with transaction.atomic():
+        ReferralStats.objects.exclude(referrer_id__in=Referral.objects.values('referrer_id')).delete()
+        for row in aggregates.iterator(chunk_size=chunk_size):
+            batch.append(ReferralStats(referrer_id=row.pop('referrer_id'), **row))
+            if len(batch) >= chunk_size:
+                rebuilt += _store_referral_stats(batch)
+                batch = []
+        rebuilt += _store_referral_stats(batch)
+    return rebuilt
+
+
+def _store_referral_stats(batch: list[ReferralStats]) -> int:
+    ReferralStats.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=['referrer'],
+        update_fields=['total', 'paid', 'pending', 'total_bonus', 'updated_at'],
+    )
+    return len(batch)
+
+
+def eligibility_flags(user, flags=ELIGIBILITY_FLAGS) -> dict:
+    """Current value of each of ``flags`` for ``user``, read from the ledger, purchases and profile."""
+    from apps.accounts.models import Profile
+
+    evidence = {
+        'email_met': Profile.objects.filter(user=user, email_verified=True),
+        'funding_met': LedgerEntry.objects.filter(
+            user=user,
+            tx_type=LedgerEntry.TransactionType.FUNDING,
+            direction=LedgerEntry.Direction.CREDIT,
+            status=LedgerEntry.Status.SUCCESS,
+            amount__gte=referral_min_fund(),
+        ),
+        'purchase_met': PurchaseOrder.objects.filter(user=user, status=PurchaseOrder.Status.SUCCESS, product_type__in=QUALIFYING_PRODUCT_TYPES),
+    }
+    return {flag: evidence[flag].exists() for flag in flags}
+
 
-    if not (profile.email_verified and qualifying_funding_exists and qualifying_purchase_exists):
+def refresh_referral_flags(referral: Referral, referee_user) -> bool:
+    """Set any flag that is false on ``referral`` but already met; returns whether one was set.
+
+    ``mark_referral_condition`` only updates an existing row, so a funding or purchase that commits while the
+    referral is being created is recorded here instead.
+    """
+    missing = [flag for flag in ELIGIBILITY_FLAGS if not getattr(referral, flag)]
+    met = {flag: True for flag, value in eligibility_flags(referee_user, missing).items() if value}
+    if not met:
+        return False
+    Referral.objects.filter(pk=referral.pk).update(**met)
+    for flag in met:
+        setattr(referral, flag, True)
+    return True
+
+
+def ensure_referral(referee_user, profile) -> tuple[Referral, bool]:
+    referrer = profile.referred_by
+    with transaction.atomic():
+        referral, created = Referral.objects.get_or_create(
+            referee=referee_user,
+            defaults={
+                'referrer': referrer,
+                'referral_code_used': referrer.profile.referral_code if hasattr(referrer, 'profile') else '',
+                # Assigned up front because the column is unique and blank values would collide between pending referrals.
+                'bonus_reference': bonus_reference_for(referee_user.pk),
+                'email_met': profile.email_verified,
+            },
+        )
+        if created:
+            # Read after the insert, so progress made before the row was visible is not lost.
+            refresh_referral_flags(referral, referee_user)
+    return referral, created
+
+
+def mark_referral_condition(referee_user, flag: str) -> bool:
+    """Set one eligibility flag with a conditional UPDATE and evaluate the bonus only if it actually flipped."""
+    if flag not in ELIGIBILITY_FLAGS:
+        raise ValueError(f'Unknown referral eligibility flag: {flag}')
+    if referral_settled_or_absent(referee_user):
+        return False
+    changed = Referral.objects.filter(referee_id=referee_user.pk, status=Referral.Status.PENDING, **{flag: False}).update(**{flag: True})
+    if changed:
+        evaluate_referral_bonus(referee_user)
+    return bool(changed)
+
+
+def evaluate_referral_bonus(referee_user):
+    """Mark the referral QUALIFIED once every condition is met; the payout itself runs after commit."""
+    if referral_settled_or_absent(referee_user):
+        return getattr(referee_user, 'referral_record', None) if get_user_model().referral_record.is_cached(referee_user) else None
+
+    referral = Referral.objects.filter(referee=referee_user).first()
+    if referral is None:
+        profile = getattr(referee_user, 'profile', None)
+        if not profile or not profile.referred_by_id:
+            return None
+        referral, _ = ensure_referral(referee_user, profile)
+    elif referral.status == Referral.Status.PENDING and not all(getattr(referral, flag) for flag in ELIGIBILITY_FLAGS):
+        refresh_referral_flags(referral, referee_user)
+
+    if referral.status != Referral.Status.PENDING or not (referral.funding_met and referral.purchase_met and referral.email_met):
         return referral
 
-    bonus = _bonus_amount(min_fund)
+    # No wallet or row lock here: the referee's transaction only flips the status, and concurrent callers race on this UPDATE.
+    if Referral.objects.filter(pk=referral.pk, status=Referral.Status.PENDING).update(status=Referral.Status.QUALIFIED):
+        referral.status = Referral.Status.QUALIFIED
+        from apps.referrals.tasks import pay_referral_bonuses
+
+        referrer_id = referral.referrer_id
+        transaction.on_commit(lambda: pay_referral_bonuses.delay(referrer_id))
+    return referral
+
+
+def pay_qualified_referrals(batch_size: int = 500, referrer_id: int | None = None) -> int:
+    """Pay up to ``batch_size`` qualified referrals, one transaction and wallet lock per referrer."""
+    bonus = _bonus_amount(referral_min_fund())
     if bonus <= 0:
-        return referral
+        return 0
+
+    qualified = Referral.objects.filter(status=Referral.Status.QUALIFIED)
+    if referrer_id is not None:
+        qualified = qualified.filter(referrer_id=referrer_id)
+    rows = qualified.order_by('referrer_id', 'pk').values_list('referrer_id', 'pk')[:batch_size]
+
+    paid = 0
+    for referrer, group in groupby(rows, key=itemgetter(0)):
+        paid += _pay_referrer(referrer, [pk for _, pk in group], bonus)
+    return paid
+
 
-    bonus_reference = referral.bonus_reference or f'REF-BONUS-{referee_user.pk}'
-    entry = credit_wallet(
-        user=referral.referrer,
-        amount=bonus,
-        reference=bonus_reference,
+@transaction.atomic
+def _pay_referrer(referrer_id: int, referral_ids: list[int], bonus: Decimal) -> int:
+    referrals = list(
+        Referral.objects.select_for_update()
+        .select_related('referrer', 'referee')
+        .filter(pk__in=referral_ids, status=Referral.Status.QUALIFIED)
+        .order_by('pk')
+    )
+    if not referrals:
+        return 0
+
+    for referral in referrals:
+        referral.bonus_reference = referral.bonus_reference or bonus_reference_for(referral.referee_id)
+    credit_wallet_batch(
+        referrals[0].referrer,
+        [
+            (bonus, referral.bonus_reference, {'referee_id': referral.referee_id, 'referee_username': referral.referee.username})
+            for referral in referrals
+        ],
         tx_type=LedgerEntry.TransactionType.REFERRAL_BONUS,
-        meta={
-            'referee_id': referee_user.pk,
-            'referee_username': referee_user.username,
-        },
     )
 
-    referral.status = Referral.Status.PAID
-    referral.bonus_amount = entry.amount
-    referral.bonus_reference = bonus_reference
-    referral.rewarded_at = timezone.now()
-    referral.save(update_fields=['status', 'bonus_amount', 'bonus_reference', 'rewarded_at'])
-    return referral
+    rewarded_at = timezone.now()
+    for referral in referrals:
+        referral.status = Referral.Status.PAID
+        referral.bonus_amount = bonus
+        referral.rewarded_at = rewarded_at
+    Referral.objects.bulk_update(referrals, ['status', 'bonus_amount', 'bonus_reference', 'rewarded_at'])
+    adjust_referral_stats(referrer_id, paid=len(referrals), pending=-len(referrals), total_bonus=bonus * len(referrals))
+    return len(referrals)
@@ -0,0 +1,56 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.ledger.models import LedgerEntry
+from apps.referrals.models import Referral
+from apps.referrals.services import adjust_referral_stats, is_qualifying_funding, is_qualifying_purchase, mark_referral_condition
+from apps.referrals.tree import link_referral
+from apps.vtu.models import PurchaseOrder
+
+
+@receiver(post_save, sender=LedgerEntry)
+def mark_referral_funding(sender, instance, created, **kwargs):
+    # Ledger entries are immutable, so only inserts can satisfy the funding condition.
+    if created and is_qualifying_funding(instance):
+        mark_referral_condition(instance.user, 'funding_met')
+
+
+@receiver(post_save, sender=PurchaseOrder)
+def mark_referral_purchase(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    if is_qualifying_purchase(instance):
+        mark_referral_condition(instance.user, 'purchase_met')
+
+
+@receiver(post_save, sender=Referral)
+def count_new_referral(sender, instance, created, **kwargs):
+    if created:
+        paid = instance.status == Referral.Status.PAID
+        adjust_referral_stats(
+            instance.referrer_id,
+            total=1,
+            paid=int(paid),
+            pending=int(not paid),
+            total_bonus=instance.bonus_amount if paid else 0,
+        )
+
+
+@receiver(post_save, sender=Referral)
+def extend_referral_tree(sender, instance, created, **kwargs):
+    if created:
+        link_referral(instance.referrer_id, instance.referee_id, new_referee=getattr(instance, '_onboarding', False))
+
+
+@receiver(post_delete, sender=Referral)
+def uncount_deleted_referral(sender, instance, **kwargs):
+    paid = instance.status == Referral.Status.PAID
+    # The stats row may already be gone when the referrer itself is being deleted, so it is never recreated here.
+    adjust_referral_stats(
+        instance.referrer_id,
+        create=False,
+        total=-1,
+        paid=-int(paid),
+        pending=-int(not paid),
+        total_bonus=-instance.bonus_amount if paid else 0,
+    )
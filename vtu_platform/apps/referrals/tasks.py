@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+try:
+    from celery import shared_task
+except ImportError:  # pragma: no cover
+    from apps.core.tasks import shared_task
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.referrals.services import pay_qualified_referrals
+from apps.referrals.tree import pay_tier_commissions
+
+
+@shared_task
+def pay_referral_bonuses(referrer_id: int | None = None, batch_size: int = 500):
+    # Enqueued per referrer after a referral qualifies; run it periodically without arguments to catch lost tasks.
+    return pay_qualified_referrals(batch_size=batch_size, referrer_id=referrer_id)
+
+
+@shared_task
+def pay_referral_tier_commissions(days_ago: int = 1):
+    # Pays one whole local day of downline volume; run daily after midnight.
+    end = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days_ago - 1)
+    return pay_tier_commissions(end - timedelta(days=1), end)
@@ -1,12 +1,19 @@
+from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
 
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
 
+from apps.core.site_settings import get_site_settings
 from apps.ledger.models import LedgerEntry, Wallet
 from apps.ledger.services import credit_wallet
-from apps.referrals.models import Referral
-from apps.referrals.services import evaluate_referral_bonus
+from apps.referrals.models import Referral, ReferralPath, ReferralStats
+from apps.referrals.services import evaluate_referral_bonus, pay_qualified_referrals
+from apps.referrals.tree import downline_volume, pay_tier_commissions, referral_descendants, referral_upline, tier_commissions
 from apps.vtu.models import PurchaseOrder, ServiceProvider
 
 
@@ -33,16 +40,16 @@ class ReferralBonusEligibilityTests(TestCase):
         self.assertFalse(LedgerEntry.objects.filter(tx_type=LedgerEntry.TransactionType.REFERRAL_BONUS).exists())
 
         credit_wallet(self.referee, Decimal('1200.00'), 'fund-high', tx_type=LedgerEntry.TransactionType.FUNDING)
-        PurchaseOrder.objects.create(
-            user=self.referee,
-            provider=self.provider,
-            product_type=PurchaseOrder.ProductType.AIRTIME,
-            amount=Decimal('200.00'),
-            destination='08000000000',
-            status=PurchaseOrder.Status.SUCCESS,
-        )
-
-        evaluate_referral_bonus(self.referee)
+        with self.captureOnCommitCallbacks(execute=True):
+            PurchaseOrder.objects.create(
+                user=self.referee,
+                provider=self.provider,
+                product_type=PurchaseOrder.ProductType.AIRTIME,
+                amount=Decimal('200.00'),
+                destination='08000000000',
+                status=PurchaseOrder.Status.SUCCESS,
+            )
+            evaluate_referral_bonus(self.referee)
 
         referral = Referral.objects.get(referee=self.referee)
         bonus_entry = LedgerEntry.objects.get(reference=f'REF-BONUS-{self.referee.pk}')
@@ -67,11 +74,214 @@ class ReferralBonusEligibilityTests(TestCase):
             service_code='mtn:500mb',
         )
 
-        evaluate_referral_bonus(self.referee)
-        evaluate_referral_bonus(self.referee)
+        with self.captureOnCommitCallbacks(execute=True):
+            evaluate_referral_bonus(self.referee)
+            evaluate_referral_bonus(self.referee)
+        pay_qualified_referrals()
 
         self.assertEqual(
             LedgerEntry.objects.filter(reference=f'REF-BONUS-{self.referee.pk}', tx_type=LedgerEntry.TransactionType.REFERRAL_BONUS).count(),
             1,
         )
         self.assertEqual(Referral.objects.filter(referee=self.referee, status=Referral.Status.PAID).count(), 1)
+
+
+@override_settings(REFERRAL_MIN_FUND=1000.0, REFERRAL_BONUS_PERCENT=2.5)
+class ReferralEligibilityFlagTests(TestCase):
+    def setUp(self):
+        self.referrer = get_user_model().objects.create_user(username='flag-referrer', password='secret123')
+        self.referee = get_user_model().objects.create_user(username='flag-referee', password='secret123')
+        self.referee.profile.referred_by = self.referrer
+        self.referee.profile.save(update_fields=['referred_by'])
+        self.provider = ServiceProvider.objects.create(name='Flag Provider', slug='flag-provider')
+
+    def test_events_set_flags_and_pay_without_explicit_evaluation(self):
+        credit_wallet(self.referee, Decimal('1500.00'), 'flag-fund', tx_type=LedgerEntry.TransactionType.FUNDING)
+        PurchaseOrder.objects.create(
+            user=self.referee,
+            provider=self.provider,
+            product_type=PurchaseOrder.ProductType.AIRTIME,
+            amount=Decimal('100.00'),
+            destination='08000000001',
+            status=PurchaseOrder.Status.SUCCESS,
+        )
+        referral = Referral.objects.get(referee=self.referee)
+        self.assertTrue(referral.funding_met and referral.purchase_met)
+        self.assertFalse(referral.email_met)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.referee.profile.email_verified = True
+            self.referee.profile.save(update_fields=['email_verified'])
+
+        referral.refresh_from_db()
+        self.assertEqual(referral.status, Referral.Status.QUALIFIED)
+        self.assertFalse(Wallet.objects.filter(user=self.referrer, balance__gt=0).exists())
+        self.assertEqual(len(callbacks), 1)
+
+        callbacks[0]()
+        referral.refresh_from_db()
+        self.assertEqual(referral.status, Referral.Status.PAID)
+        self.assertEqual(Wallet.objects.get(user=self.referrer).balance, Decimal('25.00'))
+
+    def test_referral_created_late_starts_with_existing_progress(self):
+        user = get_user_model().objects.create_user(username='late-referee', password='secret123')
+        credit_wallet(user, Decimal('1000.00'), 'late-fund', tx_type=LedgerEntry.TransactionType.FUNDING)
+        user.profile.referred_by = self.referrer
+        user.profile.save(update_fields=['referred_by'])
+
+        referral = Referral.objects.get(referee=user)
+        self.assertTrue(referral.funding_met)
+        self.assertFalse(referral.purchase_met)
+
+    def test_condition_missed_while_the_referral_was_created_is_recovered(self):
+        credit_wallet(self.referee, Decimal('1500.00'), 'missed-fund', tx_type=LedgerEntry.TransactionType.FUNDING)
+        # As if the funding committed before the referral row was visible, so its conditional UPDATE matched nothing.
+        Referral.objects.filter(referee=self.referee).update(funding_met=False)
+
+        PurchaseOrder.objects.create(
+            user=self.referee,
+            provider=self.provider,
+            product_type=PurchaseOrder.ProductType.DATA,
+            amount=Decimal('100.00'),
+            destination='08000000002',
+            status=PurchaseOrder.Status.SUCCESS,
+        )
+
+        referral = Referral.objects.get(referee=self.referee)
+        self.assertTrue(referral.funding_met and referral.purchase_met)
+        self.assertEqual(referral.status, Referral.Status.PENDING)
+
+    def test_short_circuits_without_queries_for_unreferred_or_paid_users(self):
+        outsider = get_user_model().objects.select_related('profile').get(username='flag-referrer')
+        with self.assertNumQueries(0):
+            self.assertIsNone(evaluate_referral_bonus(outsider))
+
+        Referral.objects.filter(referee=self.referee).update(status=Referral.Status.PAID)
+        referee = get_user_model().objects.select_related('referral_record').get(pk=self.referee.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(evaluate_referral_bonus(referee).status, Referral.Status.PAID)
+
+
+@override_settings(REFERRAL_MIN_FUND=1000.0, REFERRAL_BONUS_PERCENT=2.5)
+class ReferralPayoutBatchTests(TestCase):
+    def test_batch_pays_each_referrer_once_per_group(self):
+        referrers = [get_user_model().objects.create_user(username=f'batch-referrer-{i}', password='secret123') for i in range(2)]
+        referrals = []
+        for index in range(5):
+            referee = get_user_model().objects.create_user(username=f'batch-referee-{index}', password='secret123')
+            referrals.append(
+                Referral.objects.create(
+                    referrer=referrers[index % 2],
+                    referee=referee,
+                    status=Referral.Status.QUALIFIED,
+                    bonus_reference=f'REF-BONUS-{referee.pk}',
+                )
+            )
+
+        self.assertEqual(pay_qualified_referrals(batch_size=3), 3)
+        self.assertEqual(pay_qualified_referrals(), 2)
+        self.assertEqual(pay_qualified_referrals(), 0)
+
+        self.assertEqual(Wallet.objects.get(user=referrers[0]).balance, Decimal('75.00'))
+        self.assertEqual(Wallet.objects.get(user=referrers[1]).balance, Decimal('50.00'))
+        self.assertFalse(Referral.objects.exclude(status=Referral.Status.PAID).exists())
+        for referral in referrals:
+            self.assertTrue(LedgerEntry.objects.filter(reference=f'REF-BONUS-{referral.referee_id}').exists())
+
+
+@override_settings(REFERRAL_MIN_FUND=1000.0, REFERRAL_BONUS_PERCENT=2.5)
+class ReferralStatsTests(TestCase):
+    def setUp(self):
+        self.referrer = get_user_model().objects.create_user(username='stats-referrer', password='secret123')
+        self.referees = []
+        for index in range(3):
+            referee = get_user_model().objects.create_user(username=f'stats-referee-{index}', password='secret123')
+            referee.profile.referred_by = self.referrer
+            referee.profile.save(update_fields=['referred_by'])
+            self.referees.append(referee)
+
+    def _stats(self):
+        return ReferralStats.objects.get(referrer=self.referrer)
+
+    def test_counters_follow_create_and_payout(self):
+        self.assertEqual((self._stats().total, self._stats().pending, self._stats().paid), (3, 3, 0))
+
+        Referral.objects.filter(referee=self.referees[0]).update(status=Referral.Status.QUALIFIED)
+        pay_qualified_referrals()
+
+        stats = self._stats()
+        self.assertEqual((stats.total, stats.pending, stats.paid), (3, 2, 1))
+        self.assertEqual(stats.total_bonus, Decimal('25.00'))
+
+    def test_repair_command_recomputes_drifted_counters(self):
+        Referral.objects.filter(referee=self.referees[0]).update(status=Referral.Status.PAID, bonus_amount=Decimal('25.00'))
+        ReferralStats.objects.filter(referrer=self.referrer).update(total=99, pending=99)
+        ReferralStats.objects.create(referrer=self.referees[1], total=4)
+
+        call_command('repair_referral_stats', stdout=StringIO())
+
+        stats = self._stats()
+        self.assertEqual((stats.total, stats.pending, stats.paid, stats.total_bonus), (3, 2, 1, Decimal('25.00')))
+        self.assertFalse(ReferralStats.objects.filter(referrer=self.referees[1]).exists())
+
+    def test_dashboard_reads_counters_without_scanning_referrals(self):
+        self.client.force_login(self.referrer)
+        get_site_settings()
+        # Session, user, profile and stats row, however many referrals exist; site settings come from the cache.
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('referrals:dashboard'))
+        self.assertEqual(response.context['stats'].total, 3)
+
+
+@override_settings(REFERRAL_TIER_PERCENTS=[2.0, 1.0], REFERRAL_TREE_MAX_DEPTH=5)
+class ReferralTreeTests(TestCase):
+    def setUp(self):
+        # root -> a -> b -> c, and root -> d
+        User = get_user_model()
+        self.root = User.objects.create_user(username='tree-root', password='secret123')
+        self.users = {'root': self.root}
+        for name, parent in [('a', 'root'), ('b', 'a'), ('c', 'b'), ('d', 'root')]:
+            user = User.objects.create_user(username=f'tree-{name}', password='secret123')
+            user.profile.referred_by = self.users[parent]
+            user.profile.save(update_fields=['referred_by'])
+            self.users[name] = user
+        self.provider = ServiceProvider.objects.create(name='Tree Provider', slug='tree-provider')
+
+    def _buy(self, name, amount):
+        PurchaseOrder.objects.create(
+            user=self.users[name],
+            provider=self.provider,
+            product_type=PurchaseOrder.ProductType.AIRTIME,
+            amount=Decimal(amount),
+            destination='08000000000',
+            status=PurchaseOrder.Status.SUCCESS,
+        )
+
+    def test_signup_maintains_descendants_and_upline(self):
+        descendants = {user.username: user.referral_depth for user in referral_descendants(self.root)}
+        self.assertEqual(descendants, {'tree-a': 1, 'tree-d': 1, 'tree-b': 2, 'tree-c': 3})
+        self.assertEqual([user.username for user in referral_descendants(self.root, max_depth=1)], ['tree-a', 'tree-d'])
+        self.assertEqual([user.username for user in referral_upline(self.users['c'])], ['tree-b', 'tree-a', 'tree-root'])
+
+    def test_bulk_builder_matches_incremental_paths(self):
+        incremental = set(ReferralPath.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+        ReferralPath.objects.all().delete()
+
+        call_command('build_referral_paths', stdout=StringIO())
+
+        self.assertEqual(set(ReferralPath.objects.values_list('ancestor_id', 'descendant_id', 'depth')), incremental)
+        self.assertEqual(len(incremental), 7)
+
+    def test_downline_volume_and_tier_commissions(self):
+        self._buy('a', '1000.00')
+        self._buy('b', '500.00')
+        self._buy('c', '400.00')
+        start, end = timezone.now() - timedelta(hours=1), timezone.now() + timedelta(hours=1)
+
+        self.assertEqual(downline_volume(self.root), {1: Decimal('1000.00'), 2: Decimal('500.00'), 3: Decimal('400.00')})
+        # root: 2% of a + 1% of b; a: 2% of b + 1% of c; b: 2% of c.
+        self.assertEqual(tier_commissions(start, end), {self.root.pk: Decimal('25.00'), self.users['a'].pk: Decimal('14.00'), self.users['b'].pk: Decimal('8.00')})
+
+        self.assertEqual(pay_tier_commissions(start, end), 3)
+        pay_tier_commissions(start, end)
+        self.assertEqual(Wallet.objects.get(user=self.root).balance, Decimal('25.00'))
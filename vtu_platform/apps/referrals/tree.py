@@ -0,0 +1,184 @@
+"""Multi-level referral graph stored as a closure table (``ReferralPath``).
+
+Every (ancestor, descendant) pair up to ``REFERRAL_TREE_MAX_DEPTH`` hops has its own row, so subtree, upline and
+downline-volume questions are single indexed joins instead of recursive walks over ``Profile.referred_by``.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+
+from apps.accounts.models import Profile
+from apps.ledger.models import LedgerEntry
+from apps.ledger.services import credit_wallet
+from apps.referrals.models import ReferralPath
+from apps.vtu.models import PurchaseOrder
+
+
+def link_referral(referrer_id: int, referee_id: int, *, new_referee: bool = False) -> int:
+    """Attach ``referee`` (and any subtree it already has) below ``referrer``; returns the rows inserted.
+
+    ``new_referee`` skips the cycle check and subtree read for a user created in the same transaction.
+    """
+    if referrer_id == referee_id:
+        return 0
+    if not new_referee and ReferralPath.objects.filter(ancestor_id=referee_id, descendant_id=referrer_id).exists():
+        return 0  # would close a cycle
+    max_depth = settings.REFERRAL_TREE_MAX_DEPTH
+    uplines = [(referrer_id, 0), *ReferralPath.objects.filter(descendant_id=referrer_id).values_list('ancestor_id', 'depth')]
+    subtree = [(referee_id, 0)]
+    if not new_referee:
+        subtree += ReferralPath.objects.filter(ancestor_id=referee_id).values_list('descendant_id', 'depth')
+    rows = [
+        ReferralPath(ancestor_id=ancestor, descendant_id=descendant, depth=up + down + 1)
+        for ancestor, up in uplines
+        for descendant, down in subtree
+        if up + down + 1 <= max_depth
+    ]
+    ReferralPath.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
+
+
+def link_new_referrals(edges: list[tuple[int, int]]) -> int:
+    """Add closure rows for many ``(referrer_id, referee_id)`` edges with one statement per depth level.
+
+    Meant for bulk imports of new users: each referee's only descendants are other referees in ``edges``, so
+    every level extends the previous one's paths by a direct edge, as in ``build_referral_paths``.
+    """
+    edges = [(referrer_id, referee_id) for referrer_id, referee_id in edges if referrer_id != referee_id]
+    if not edges:
+        return 0
+    ReferralPath.objects.bulk_create(
+        [ReferralPath(ancestor_id=referrer_id, descendant_id=referee_id, depth=1) for referrer_id, referee_id in edges],
+        ignore_conflicts=True,
+    )
+    total = len(edges)
+    paths = ReferralPath._meta.db_table
+    referees = [referee_id for _, referee_id in edges]
+    placeholders = ', '.join(['%s'] * len(referees))
+    with connection.cursor() as cursor:
+        for depth in range(1, settings.REFERRAL_TREE_MAX_DEPTH):
+            cursor.execute(
+                f'INSERT INTO {paths} (ancestor_id, descendant_id, depth) '
+                f'SELECT p.ancestor_id, e.descendant_id, %s FROM {paths} p '
+                f'JOIN {paths} e ON e.ancestor_id = p.descendant_id AND e.depth = 1 '
+                f'WHERE p.depth = %s AND e.descendant_id IN ({placeholders}) AND p.ancestor_id <> e.descendant_id ON CONFLICT DO NOTHING',
+                [depth + 1, depth, *referees],
+            )
+            if cursor.rowcount <= 0:
+                break
+            total += cursor.rowcount
+    return total
+
+
+def referral_descendants(user, max_depth: int | None = None):
+    """Users below ``user`` up to ``max_depth`` levels, annotated with ``referral_depth``."""
+    paths = Q(referral_ancestor_paths__ancestor=user)
+    if max_depth is not None:
+        paths &= Q(referral_ancestor_paths__depth__lte=max_depth)
+    return get_user_model().objects.filter(paths).annotate(referral_depth=F('referral_ancestor_paths__depth')).order_by('referral_depth', 'pk')
+
+
+def referral_upline(user, max_depth: int | None = None):
+    """Users above ``user``, nearest referrer first, annotated with ``referral_depth``."""
+    paths = Q(referral_descendant_paths__descendant=user)
+    if max_depth is not None:
+        paths &= Q(referral_descendant_paths__depth__lte=max_depth)
+    return get_user_model().objects.filter(paths).annotate(referral_depth=F('referral_descendant_paths__depth')).order_by('referral_depth')
+
+
+def downline_volume(user, max_depth: int | None = None, start=None, end=None) -> dict[int, Decimal]:
+    """Successful purchase volume of ``user``'s downline per depth, in one grouped query."""
+    orders = Q(descendant__vtu_orders__status=PurchaseOrder.Status.SUCCESS)
+    if start is not None:
+        orders &= Q(descendant__vtu_orders__created_at__gte=start)
+    if end is not None:
+        orders &= Q(descendant__vtu_orders__created_at__lt=end)
+    paths = ReferralPath.objects.filter(ancestor=user)
+    if max_depth is not None:
+        paths = paths.filter(depth__lte=max_depth)
+    rows = paths.order_by('depth').values('depth').annotate(volume=Sum('descendant__vtu_orders__amount', filter=orders))
+    return {row['depth']: row['volume'] or Decimal('0.00') for row in rows}
+
+
+def build_referral_paths(max_depth: int | None = None) -> int:
+    """Rebuild the closure table from ``Profile.referred_by`` one level per statement; returns the rows written."""
+    max_depth = max_depth or settings.REFERRAL_TREE_MAX_DEPTH
+    paths = ReferralPath._meta.db_table
+    profiles = Profile._meta.db_table
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {paths}')
+        cursor.execute(
+            f'INSERT INTO {paths} (ancestor_id, descendant_id, depth) '
+            f'SELECT referred_by_id, user_id, 1 FROM {profiles} WHERE referred_by_id IS NOT NULL AND referred_by_id <> user_id'
+        )
+        inserted = cursor.rowcount
+        depth = 1
+        while inserted > 0 and depth < max_depth:
+            total += inserted
+            # Extend every path of the previous level by one direct referral; conflicts only arise from cyclic data.
+            cursor.execute(
+                f'INSERT INTO {paths} (ancestor_id, descendant_id, depth) '
+                f'SELECT p.ancestor_id, c.descendant_id, %s FROM {paths} p '
+                f'JOIN {paths} c ON c.ancestor_id = p.descendant_id AND c.depth = 1 '
+                'WHERE p.depth = %s AND p.ancestor_id <> c.descendant_id ON CONFLICT DO NOTHING',
+                [depth + 1, depth],
+            )
+            inserted = cursor.rowcount
+            depth += 1
+        total += max(inserted, 0)
+    return total
+
+
+def _tier_rate():
+    tiers = settings.REFERRAL_TIER_PERCENTS
+    return Case(
+        *[When(depth=depth, then=Value(Decimal(str(percent)) / 100)) for depth, percent in enumerate(tiers, start=1)],
+        default=Value(Decimal('0')),
+        output_field=DecimalField(max_digits=8, decimal_places=6),
+    )
+
+
+def tier_commissions(start, end) -> dict[int, Decimal]:
+    """Commission owed to each ancestor for downline purchases in ``[start, end)``, computed in one grouped query."""
+    tiers = settings.REFERRAL_TIER_PERCENTS
+    if not tiers:
+        return {}
+    rows = (
+        ReferralPath.objects.filter(
+            depth__lte=len(tiers),
+            descendant__vtu_orders__status=PurchaseOrder.Status.SUCCESS,
+            descendant__vtu_orders__created_at__gte=start,
+            descendant__vtu_orders__created_at__lt=end,
+        )
+        .order_by()
+        .values('ancestor_id')
+        .annotate(commission=Sum(F('descendant__vtu_orders__amount') * _tier_rate(), output_field=DecimalField(max_digits=18, decimal_places=6)))
+    )
+    commissions = {}
+    for row in rows:
+        amount = Decimal(row['commission'] or 0).quantize(Decimal('0.01'))
+        if amount > 0:
+            commissions[row['ancestor_id']] = amount
+    return commissions
+
+
+def pay_tier_commissions(start, end) -> int:
+    """Credit each ancestor's commission for the window once; the reference makes reruns no-ops."""
+    commissions = tier_commissions(start, end)
+    users = get_user_model().objects.in_bulk(list(commissions))
+    window = f'{start:%Y%m%d%H}-{end:%Y%m%d%H}'
+    for ancestor_id, amount in commissions.items():
+        credit_wallet(
+            users[ancestor_id],
+            amount,
+            f'REF-TIER-{window}-{ancestor_id}',
+            meta={'start': start.isoformat(), 'end': end.isoformat(), 'tiers': settings.REFERRAL_TIER_PERCENTS},
+            tx_type=LedgerEntry.TransactionType.REFERRAL_BONUS,
+        )
+    return len(commissions)
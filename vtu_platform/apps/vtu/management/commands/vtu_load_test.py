@@ -0,0 +1,175 @@
+import queue
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q, Sum
+
+from apps.core.metrics import percentile
+from apps.ledger.models import LedgerEntry, Wallet
+from apps.ledger.services import credit_wallet
+from apps.vtu.models import PurchaseOrder, ServiceProvider
+from apps.vtu.services import create_purchase_order, process_purchase
+
+
+class _LockWaitTimer:
+    """Execute wrapper that times row-locking statements issued on the current thread's connection."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'FOR UPDATE' not in sql.upper():
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent purchases through the real service layer against the mock provider and report latency/consistency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--purchases-per-user', type=int, default=5)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--amount', default='100.00')
+        parser.add_argument('--product-type', default=PurchaseOrder.ProductType.AIRTIME, choices=PurchaseOrder.ProductType.values)
+        parser.add_argument(
+            '--fund',
+            default='',
+            help='Opening wallet balance per user. Defaults to exactly amount x purchases-per-user.',
+        )
+        parser.add_argument('--prefix', default='loadtest', help='Username prefix for the generated users (data is kept).')
+
+    def handle(self, *args, **options):
+        if settings.VTU_PROVIDER.lower() == 'vtpass':
+            raise CommandError('Refusing to run a load test against VTpass; set VTU_PROVIDER to mock/stub.')
+
+        amount = Decimal(options['amount'])
+        per_user = options['purchases_per_user']
+        fund = Decimal(options['fund']) if options['fund'] else amount * per_user
+        run_id = uuid4().hex[:8]
+
+        users = self._create_funded_users(options['users'], fund, f"{options['prefix']}-{run_id}")
+        provider, _ = ServiceProvider.objects.get_or_create(slug='mock', defaults={'name': 'Mock', 'is_active': True})
+        self.stdout.write(
+            f'Run {run_id}: {len(users)} users funded with {fund}, {len(users) * per_user} purchases, '
+            f'concurrency={options["concurrency"]}, provider={settings.VTU_PROVIDER}.'
+        )
+
+        jobs = queue.Queue()
+        for _ in range(per_user):
+            for user in users:
+                jobs.put(user)
+
+        results = []
+        timers = []
+        results_lock = threading.Lock()
+
+        def worker():
+            timer = _LockWaitTimer()
+            try:
+                with connection.execute_wrapper(timer):
+                    while True:
+                        try:
+                            user = jobs.get_nowait()
+                        except queue.Empty:
+                            return
+                        started = time.perf_counter()
+                        try:
+                            order = create_purchase_order(
+                                user=user,
+                                provider=provider,
+                                product_type=options['product_type'],
+                                amount=amount,
+                                destination='08030000000',
+                                service_code='mtn',
+                            )
+                            if order.status == PurchaseOrder.Status.PENDING:
+                                order = process_purchase(order.id)
+                            outcome = order.status
+                        except Exception as exc:  # noqa: BLE001
+                            outcome = f'error:{exc.__class__.__name__}'
+                        elapsed = time.perf_counter() - started
+                        with results_lock:
+                            results.append((outcome, elapsed))
+            finally:
+                with results_lock:
+                    timers.append(timer)
+                connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, name=f'vtu-load-{index}') for index in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - started
+
+        self._report(results, timers, wall_time)
+        inconsistent = self._ledger_inconsistencies(users)
+        if inconsistent:
+            for username, balance, expected in inconsistent:
+                self.stdout.write(self.style.ERROR(f'  {username}: wallet={balance} ledger={expected}'))
+            raise CommandError(f'Ledger inconsistency detected for {len(inconsistent)} wallet(s).')
+        self.stdout.write(self.style.SUCCESS(f'Ledger consistent for all {len(users)} wallets.'))
+
+    def _create_funded_users(self, count, fund, username_prefix):
+        user_model = get_user_model()
+        users = []
+        for index in range(count):
+            user = user_model.objects.create_user(username=f'{username_prefix}-{index}', password=None)
+            if fund > 0:
+                credit_wallet(user, fund, f'{username_prefix}-{index}-FUND', {'source': 'vtu_load_test'})
+            users.append(user)
+        return users
+
+    def _report(self, results, timers, wall_time):
+        latencies = sorted(elapsed for _, elapsed in results)
+        outcomes = Counter(outcome for outcome, _ in results)
+        lock_count = sum(timer.count for timer in timers)
+        lock_seconds = sum(timer.seconds for timer in timers)
+
+        self.stdout.write(f'Completed {len(results)} purchases in {wall_time:.2f}s ({len(results) / wall_time if wall_time else 0:.1f}/s).')
+        self.stdout.write('Outcomes: ' + ', '.join(f'{outcome}={count}' for outcome, count in sorted(outcomes.items())))
+        self.stdout.write(
+            'Latency ms: '
+            + ', '.join(f'p{pct}={percentile(latencies, pct) * 1000:.1f}' for pct in (50, 95, 99))
+            + f', max={latencies[-1] * 1000 if latencies else 0:.1f}'
+        )
+        if connection.features.has_select_for_update:
+            average = lock_seconds / lock_count * 1000 if lock_count else 0
+            self.stdout.write(f'Row-lock statements: {lock_count}, total wait {lock_seconds:.2f}s, avg {average:.1f}ms.')
+        else:
+            self.stdout.write(f'Row-lock statements: not measured ({connection.vendor} ignores SELECT ... FOR UPDATE).')
+
+    def _ledger_inconsistencies(self, users):
+        success = Q(ledger_entries__status=LedgerEntry.Status.SUCCESS)
+        totals = (
+            get_user_model()
+            .objects.filter(pk__in=[user.pk for user in users])
+            .annotate(
+                credits=Sum('ledger_entries__amount', filter=success & Q(ledger_entries__direction=LedgerEntry.Direction.CREDIT)),
+                debits=Sum('ledger_entries__amount', filter=success & Q(ledger_entries__direction=LedgerEntry.Direction.DEBIT)),
+            )
+            .values_list('pk', 'username', 'credits', 'debits')
+        )
+        balances = dict(Wallet.objects.filter(user__in=users).values_list('user_id', 'balance'))
+        inconsistent = []
+        for user_id, username, credits, debits in totals:
+            expected = (credits or Decimal('0.00')) - (debits or Decimal('0.00'))
+            balance = balances.get(user_id, Decimal('0.00'))
+            if balance != expected or balance < 0:
+                inconsistent.append((username, balance, expected))
+        return inconsistent
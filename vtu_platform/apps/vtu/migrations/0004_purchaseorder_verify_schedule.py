@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vtu', '0003_databundleplan'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='needs_review',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='next_verify_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='verify_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['status', 'next_verify_at'], name='vtu_order_verify_due_idx'),
+        ),
+    ]
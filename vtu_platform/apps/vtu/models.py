@@ -42,8 +42,16 @@ class PurchaseOrder(models.Model):
     ledger_reference = models.CharField(max_length=80, blank=True)
     message = models.CharField(max_length=255, blank=True)
     provider_response = models.JSONField(default=dict, blank=True)
+    verify_attempts = models.PositiveIntegerField(default=0)
+    next_verify_at = models.DateTimeField(null=True, blank=True)
+    needs_review = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_verify_at'], name='vtu_order_verify_due_idx'),
+        ]
+
     def __str__(self):
         return f'{self.reference} ({self.get_status_display()})'
 
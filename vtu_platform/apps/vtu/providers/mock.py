@@ -1,22 +1,126 @@
 from __future__ import annotations
 
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from decimal import Decimal
+from typing import Any
 
 from apps.vtu.providers.base import BaseProvider, VTUResult
 
 
+@dataclass(frozen=True)
+class LatencyDistribution:
+    kind: str = 'fixed'
+    params: tuple[float, ...] = (0.0,)
+
+    KINDS = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exponential': 1}
+
+    @classmethod
+    def parse(cls, spec: str) -> LatencyDistribution:
+        """Parse ``kind:param[:param]`` specs, e.g. ``uniform:0.05:0.3`` or ``lognormal:0.2:0.6`` (seconds)."""
+        kind, *raw_params = (spec or 'fixed:0').strip().lower().split(':')
+        if kind not in cls.KINDS:
+            raise ValueError(f'Unknown latency distribution {kind!r}; expected one of {", ".join(cls.KINDS)}.')
+        if len(raw_params) != cls.KINDS[kind]:
+            raise ValueError(f'Latency distribution {kind!r} takes {cls.KINDS[kind]} parameter(s).')
+        return cls(kind=kind, params=tuple(float(value) for value in raw_params))
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == 'uniform':
+            low, high = self.params
+            value = rng.uniform(low, high)
+        elif self.kind == 'normal':
+            mean, stddev = self.params
+            value = rng.gauss(mean, stddev)
+        elif self.kind == 'lognormal':
+            median, sigma = self.params
+            value = median * rng.lognormvariate(0, sigma) if median > 0 else 0.0
+        elif self.kind == 'exponential':
+            mean = self.params[0]
+            value = rng.expovariate(1 / mean) if mean > 0 else 0.0
+        else:
+            value = self.params[0]
+        return max(value, 0.0)
+
+
 class MockProvider(BaseProvider):
+    """Offline provider; FAIL*/PEND* destinations force outcomes, ``config`` adds simulated production behaviour.
+
+    Config keys: ``latency`` (see ``LatencyDistribution.parse``), ``error_rate``, ``timeout_rate``,
+    ``timeout_seconds``, ``pending_rate``, ``settle_seconds`` and ``settle_failure_rate``.
+    """
+
+    # Randomly pending transactions settle after ``settle_seconds``. Provider clients are built per call,
+    # so the settlement book is shared by every instance in the process. It is bounded: entries never
+    # verified are dropped SETTLEMENT_RETENTION seconds after settling, and the oldest go past MAX_SETTLEMENTS.
+    MAX_SETTLEMENTS = 10000
+    SETTLEMENT_RETENTION = 3600.0
+    _settlements: OrderedDict[str, tuple[float, str]] = OrderedDict()
+    _settlements_lock = threading.Lock()
+
+    def __init__(self, *, config: dict[str, Any] | None = None, rng: random.Random | None = None):
+        config = config or {}
+        self.latency = LatencyDistribution.parse(config.get('latency', 'fixed:0'))
+        self.error_rate = float(config.get('error_rate', 0.0))
+        self.timeout_rate = float(config.get('timeout_rate', 0.0))
+        self.timeout_seconds = float(config.get('timeout_seconds', 10.0))
+        self.pending_rate = float(config.get('pending_rate', 0.0))
+        self.settle_seconds = float(config.get('settle_seconds', 30.0))
+        self.settle_failure_rate = float(config.get('settle_failure_rate', 0.0))
+        self.rng = rng or random.Random()
+
     def _is_failure(self, value: str) -> bool:
         return value.strip().upper().startswith('FAIL')
 
     def _is_pending(self, value: str) -> bool:
         return value.strip().upper().startswith('PEND')
 
+    def _simulate_call(self) -> VTUResult | None:
+        roll = self.rng.random()
+        if roll < self.timeout_rate:
+            time.sleep(self.timeout_seconds)
+            message = f'Mock provider timed out after {self.timeout_seconds:g}s'
+            return VTUResult(success=False, status='FAILED', message=message, raw={'error': message})
+
+        time.sleep(self.latency.sample(self.rng))
+        if roll < self.timeout_rate + self.error_rate:
+            return VTUResult(success=False, status='FAILED', message='Mock provider error', raw={'error': 'simulated'})
+        return None
+
+    def _maybe_defer(self, reference: str, label: str) -> VTUResult | None:
+        if self.rng.random() >= self.pending_rate:
+            return None
+        final_status = 'FAILED' if self.rng.random() < self.settle_failure_rate else 'SUCCESS'
+        now = time.monotonic()
+        with self._settlements_lock:
+            self._settlements[reference] = (now + self.settle_seconds, final_status)
+            self._settlements.move_to_end(reference)
+            self._prune_settlements(now)
+        return VTUResult(success=False, status='PENDING', message=f'Mock {label} pending', raw={'reference': reference})
+
+    @classmethod
+    def _prune_settlements(cls, now: float) -> None:
+        # Callers hold _settlements_lock; insertion order roughly follows settle time, so stale entries sit in front.
+        while cls._settlements:
+            reference, (settle_at, _) = next(iter(cls._settlements.items()))
+            if len(cls._settlements) <= cls.MAX_SETTLEMENTS and settle_at + cls.SETTLEMENT_RETENTION > now:
+                break
+            del cls._settlements[reference]
+
     def purchase_airtime(self, network: str, phone: str, amount: Decimal, reference: str) -> VTUResult:
+        simulated = self._simulate_call()
+        if simulated:
+            return simulated
         if self._is_failure(phone):
             return VTUResult(success=False, status='FAILED', message='Mock airtime purchase failed')
         if self._is_pending(phone):
             return VTUResult(success=False, status='PENDING', message='Mock airtime pending')
+        deferred = self._maybe_defer(reference, 'airtime')
+        if deferred:
+            return deferred
         return VTUResult(
             success=True,
             status='SUCCESS',
@@ -26,10 +130,16 @@ class MockProvider(BaseProvider):
         )
 
     def purchase_data(self, network: str, plan_code: str, phone: str, reference: str) -> VTUResult:
+        simulated = self._simulate_call()
+        if simulated:
+            return simulated
         if self._is_failure(phone) or self._is_failure(plan_code):
             return VTUResult(success=False, status='FAILED', message='Mock data purchase failed')
         if self._is_pending(phone) or self._is_pending(plan_code):
             return VTUResult(success=False, status='PENDING', message='Mock data purchase pending')
+        deferred = self._maybe_defer(reference, 'data purchase')
+        if deferred:
+            return deferred
         return VTUResult(
             success=True,
             status='SUCCESS',
@@ -39,10 +149,16 @@ class MockProvider(BaseProvider):
         )
 
     def purchase_bill(self, biller_code: str, customer_id: str, amount: Decimal, reference: str) -> VTUResult:
+        simulated = self._simulate_call()
+        if simulated:
+            return simulated
         if self._is_failure(customer_id) or self._is_failure(biller_code):
             return VTUResult(success=False, status='FAILED', message='Mock bill payment failed')
         if self._is_pending(customer_id) or self._is_pending(biller_code):
             return VTUResult(success=False, status='PENDING', message='Mock bill payment pending')
+        deferred = self._maybe_defer(reference, 'bill payment')
+        if deferred:
+            return deferred
         return VTUResult(
             success=True,
             status='SUCCESS',
@@ -52,6 +168,18 @@ class MockProvider(BaseProvider):
         )
 
     def verify(self, *, reference: str = '', provider_ref: str = '') -> VTUResult:
+        time.sleep(self.latency.sample(self.rng))
+        with self._settlements_lock:
+            settlement = self._settlements.get(reference)
+            if settlement and settlement[0] <= time.monotonic():
+                del self._settlements[reference]
+        if settlement:
+            settle_at, final_status = settlement
+            if settle_at > time.monotonic():
+                return VTUResult(success=False, status='PENDING', message='Mock transaction still pending', raw={'reference': reference})
+            if final_status == 'FAILED':
+                return VTUResult(success=False, status='FAILED', message='Mock transaction failed on settlement')
+
         if self._is_failure(reference) or self._is_failure(provider_ref):
             return VTUResult(success=False, status='FAILED', message='Mock verification failed')
         return VTUResult(
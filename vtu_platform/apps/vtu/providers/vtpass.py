@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+import time
 from decimal import Decimal
 from typing import Any
 
@@ -36,11 +37,27 @@ except ImportError:  # pragma: no cover
 
     requests = _FallbackRequests()
 
+from apps.core.log_handlers import DeferredLogArg
+from apps.core.metrics import record_provider_call, transport_retries
 from apps.vtu.providers.base import BaseProvider, VTUResult
 
 logger = logging.getLogger(__name__)
 
 
+class _RedactedPayload(DeferredLogArg):
+    """Defers payload redaction until a log record is actually formatted."""
+
+    __slots__ = ('payload',)
+    SECRET_KEYS = frozenset({'api_key', 'password'})
+
+    def __init__(self, payload: dict[str, Any]):
+        # A shallow copy, so the logged payload is the one that was sent even if the caller changes it later.
+        self.payload = dict(payload)
+
+    def __str__(self) -> str:
+        return str({k: ('***' if k in self.SECRET_KEYS else v) for k, v in self.payload.items()})
+
+
 class VTpassProvider(BaseProvider):
     SUCCESS_STATES = {'delivered', 'successful', 'success', 'completed'}
     PENDING_STATES = {'pending', 'processing', 'initiated'}
@@ -108,28 +125,44 @@ class VTpassProvider(BaseProvider):
         return content.get('variations') or []
 
     def _request(self, method: str, path: str, payload: dict[str, Any]) -> VTUResult:
-        url = f'{self.base_url}{path}'
-        safe_payload = {k: ('***' if k in {'api_key', 'password'} else v) for k, v in payload.items()}
-        logger.info('VTpass request %s %s payload=%s', method, path, safe_payload)
+        started = time.perf_counter()
+        outcome, retries = 'transport_error', 0
+        try:
+            result, outcome, retries = self._send(method, path, payload)
+            return result
+        finally:
+            record_provider_call('vtpass', path, outcome, time.perf_counter() - started, retries)
 
+    def _send(self, method: str, path: str, payload: dict[str, Any]) -> tuple[VTUResult, str, int]:
+        url = f'{self.base_url}{path}'
         auth = (self.username, self.password) if self.username and self.password else None
         try:
             response = self.session.request(method, url, json=payload, timeout=self.timeout, auth=auth)
-            response_data = response.json()
         except requests.RequestException as exc:
+            self._log_request(method, path, payload, sampled=False)
             logger.exception('VTpass request transport error path=%s', path)
-            return VTUResult(success=False, status='FAILED', message=str(exc), raw={'error': str(exc)})
+            return VTUResult(success=False, status='FAILED', message=str(exc), raw={'error': str(exc)}), 'transport_error', 0
+
+        retries = transport_retries(response)
+        try:
+            response_data = response.json()
         except ValueError:
+            self._log_request(method, path, payload, sampled=False)
             logger.error('VTpass invalid JSON response path=%s status=%s', path, response.status_code)
-            return VTUResult(success=False, status='FAILED', message='Invalid provider response', raw={})
-
-        logger.info(
-            'VTpass response %s status=%s code=%s',
-            path,
-            response.status_code,
-            response_data.get('code') if isinstance(response_data, dict) else None,
-        )
-        return self._normalize(response_data)
+            result = VTUResult(success=False, status='FAILED', message='Invalid provider response', raw={})
+            return result, 'invalid_json', retries
+
+        code = response_data.get('code') if isinstance(response_data, dict) else None
+        # Logged once the outcome is known so only successful calls are ever sampled away.
+        succeeded = response.status_code < 400 and str(code) == '000'
+        self._log_request(method, path, payload, sampled=succeeded)
+        logger.info('VTpass response %s status=%s code=%s', path, response.status_code, code, extra={'log_sample': succeeded})
+        result = self._normalize(response_data)
+        return result, result.status.lower(), retries
+
+    @staticmethod
+    def _log_request(method: str, path: str, payload: dict[str, Any], *, sampled: bool) -> None:
+        logger.info('VTpass request %s %s payload=%s', method, path, _RedactedPayload(payload), extra={'log_sample': sampled})
 
     def _normalize(self, payload: dict[str, Any]) -> VTUResult:
         code = str(payload.get('code', '')).lower()
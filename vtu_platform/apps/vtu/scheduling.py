@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass, replace
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from apps.vtu.models import PurchaseOrder
+
+BACKLOG_AGE_BUCKETS = (
+    ('< 5 min', timedelta(minutes=5)),
+    ('5-30 min', timedelta(minutes=30)),
+    ('30 min-2 h', timedelta(hours=2)),
+    ('2-24 h', timedelta(hours=24)),
+    ('> 24 h', None),
+)
+
+
+@dataclass(frozen=True)
+class VerifyPolicy:
+    base_delay: float = 30.0
+    max_delay: float = 15 * 60.0
+    multiplier: float = 2.0
+    settle_deadline: float = 6 * 60 * 60.0
+    deadline_action: str = 'reverse'
+
+    REVERSE = 'reverse'
+    REVIEW = 'review'
+
+    def __post_init__(self):
+        if self.deadline_action not in (self.REVERSE, self.REVIEW):
+            raise ImproperlyConfigured(f"VTU verify deadline_action must be 'reverse' or 'review', not {self.deadline_action!r}.")
+
+
+def get_verify_policy(provider_slug: str = '') -> VerifyPolicy:
+    """Merge ``VTU_VERIFY_POLICIES['default']`` with the entry for ``provider_slug``, if any."""
+    policies = getattr(settings, 'VTU_VERIFY_POLICIES', {})
+    overrides = {**policies.get('default', {}), **policies.get(provider_slug, {})}
+    return replace(VerifyPolicy(), **overrides)
+
+
+def next_verify_delay(policy: VerifyPolicy, attempts: int, rng: random.Random | None = None) -> float:
+    """Exponential backoff with equal jitter, so orders pending after the same provider blip fan out."""
+    ceiling = min(policy.max_delay, policy.base_delay * policy.multiplier ** max(attempts, 0))
+    return ceiling / 2 + (rng or random).uniform(0, ceiling / 2)
+
+
+def settle_deadline_for(order: PurchaseOrder, policy: VerifyPolicy):
+    return order.created_at + timedelta(seconds=policy.settle_deadline)
+
+
+def pending_backlog_by_age(now=None) -> list[dict]:
+    now = now or timezone.now()
+    pending = PurchaseOrder.objects.filter(status=PurchaseOrder.Status.PENDING)
+
+    aggregates = {}
+    lower = None
+    for index, (_, upper) in enumerate(BACKLOG_AGE_BUCKETS):
+        condition = Q()
+        if lower is not None:
+            condition &= Q(created_at__lte=now - lower)
+        if upper is not None:
+            condition &= Q(created_at__gt=now - upper)
+        aggregates[f'bucket_{index}'] = Count('id', filter=condition)
+        aggregates[f'review_{index}'] = Count('id', filter=condition & Q(needs_review=True))
+        lower = upper
+    counts = pending.aggregate(**aggregates)
+
+    return [
+        {'label': label, 'count': counts[f'bucket_{index}'], 'needs_review': counts[f'review_{index}']}
+        for index, (label, _) in enumerate(BACKLOG_AGE_BUCKETS)
+    ]
@@ -1,16 +1,21 @@
 from __future__ import annotations
 
+from datetime import timedelta
 from decimal import Decimal
 from uuid import uuid4
 
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 
 from apps.ledger.models import LedgerEntry
 from apps.ledger.services import debit_wallet, reverse_transaction
-from apps.referrals.services import evaluate_referral_bonus
 from apps.vtu.models import PurchaseOrder, ServiceProvider
 from apps.vtu.providers import BaseProvider, MockProvider
+from apps.vtu.scheduling import VerifyPolicy, get_verify_policy, next_verify_delay, settle_deadline_for
+
+VERIFY_CLAIM_LEASE = timedelta(minutes=2)
 
 
 def get_provider_client() -> BaseProvider:
@@ -19,7 +24,7 @@ def get_provider_client() -> BaseProvider:
         from apps.vtu.providers.vtpass import VTpassProvider
 
         return VTpassProvider(config=settings.VTPASS_CONFIG)
-    return MockProvider()
+    return MockProvider(config=getattr(settings, 'MOCK_PROVIDER_CONFIG', None))
 
 
 def generate_purchase_reference() -> str:
@@ -102,15 +107,16 @@ def process_purchase(order_id: int) -> PurchaseOrder:
     if result.status == 'SUCCESS':
         order.status = PurchaseOrder.Status.SUCCESS
         order.save(update_fields=['status', 'provider_reference', 'message', 'provider_response'])
-        evaluate_referral_bonus(order.user)
         return order
 
     if result.status == 'PENDING':
+        delay = next_verify_delay(get_verify_policy(order.provider.slug), attempts=0)
         order.status = PurchaseOrder.Status.PENDING
-        order.save(update_fields=['status', 'provider_reference', 'message', 'provider_response'])
+        order.next_verify_at = timezone.now() + timedelta(seconds=delay)
+        order.save(update_fields=['status', 'provider_reference', 'message', 'provider_response', 'next_verify_at'])
         from apps.vtu.tasks import verify_pending_purchase
 
-        verify_pending_purchase.delay(order.id)
+        verify_pending_purchase.apply_async(args=(order.id,), countdown=delay)
         return order
 
     reverse_transaction(order.ledger_reference, reason=result.message or 'provider_failure')
@@ -119,8 +125,34 @@ def process_purchase(order_id: int) -> PurchaseOrder:
     return order
 
 
+def claim_due_verification(order_id: int) -> bool:
+    """Atomically take the next requery slot so duplicate task chains and the sweeper never overlap."""
+    now = timezone.now()
+    return bool(
+        PurchaseOrder.objects.filter(pk=order_id, status=PurchaseOrder.Status.PENDING, needs_review=False)
+        .filter(Q(next_verify_at__isnull=True) | Q(next_verify_at__lte=now + timedelta(seconds=1)))
+        .update(next_verify_at=now + VERIFY_CLAIM_LEASE)
+    )
+
+
+def _settle_overdue_order(order: PurchaseOrder, policy: VerifyPolicy) -> PurchaseOrder:
+    order.next_verify_at = None
+    fields = ['provider_reference', 'message', 'provider_response', 'verify_attempts', 'next_verify_at']
+    if policy.deadline_action == VerifyPolicy.REVIEW:
+        order.needs_review = True
+        order.message = 'Provider did not settle before the deadline; awaiting manual review.'
+        order.save(update_fields=[*fields, 'needs_review'])
+        return order
+
+    reverse_transaction(order.ledger_reference, reason='settle_deadline_exceeded')
+    order.status = PurchaseOrder.Status.FAILED
+    order.message = 'Provider did not settle before the deadline; wallet reversed.'
+    order.save(update_fields=[*fields, 'status'])
+    return order
+
+
 def verify_purchase(order_id: int) -> PurchaseOrder:
-    order = PurchaseOrder.objects.get(pk=order_id)
+    order = PurchaseOrder.objects.select_related('provider').get(pk=order_id)
     if order.status != PurchaseOrder.Status.PENDING:
         return order
 
@@ -131,15 +163,22 @@ def verify_purchase(order_id: int) -> PurchaseOrder:
 
     if result.status == 'SUCCESS':
         order.status = PurchaseOrder.Status.SUCCESS
-        order.save(update_fields=['status', 'provider_reference', 'message', 'provider_response'])
-        evaluate_referral_bonus(order.user)
+        order.next_verify_at = None
+        order.save(update_fields=['status', 'provider_reference', 'message', 'provider_response', 'next_verify_at'])
         return order
 
     if result.status == 'PENDING':
-        order.save(update_fields=['provider_reference', 'message', 'provider_response'])
+        policy = get_verify_policy(order.provider.slug)
+        order.verify_attempts += 1
+        now = timezone.now()
+        if now >= settle_deadline_for(order, policy):
+            return _settle_overdue_order(order, policy)
+        order.next_verify_at = now + timedelta(seconds=next_verify_delay(policy, order.verify_attempts))
+        order.save(update_fields=['provider_reference', 'message', 'provider_response', 'verify_attempts', 'next_verify_at'])
         return order
 
     reverse_transaction(order.ledger_reference, reason=result.message or 'verification_failure')
     order.status = PurchaseOrder.Status.FAILED
-    order.save(update_fields=['status', 'provider_reference', 'message', 'provider_response'])
+    order.next_verify_at = None
+    order.save(update_fields=['status', 'provider_reference', 'message', 'provider_response', 'next_verify_at'])
     return order
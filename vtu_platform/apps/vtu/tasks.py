@@ -3,43 +3,31 @@ from __future__ import annotations
 try:
     from celery import shared_task
 except ImportError:  # pragma: no cover
-    class _DummyRequest:
-        retries = 0
+    from apps.core.tasks import shared_task
 
-    class _DummyTask:
-        request = _DummyRequest()
-
-        @staticmethod
-        def retry(*args, **kwargs):
-            return None
-
-    def shared_task(*_args, **options):
-        bind = options.get('bind', False)
-
-        def decorator(fn):
-            def delay(*args, **kwargs):
-                if bind:
-                    return fn(_DummyTask(), *args, **kwargs)
-                return fn(*args, **kwargs)
-
-            fn.delay = delay
-            return fn
-
-        return decorator
+from django.db.models import Q
+from django.utils import timezone
 
 from apps.vtu.models import PurchaseOrder
-from apps.vtu.services import verify_purchase
+from apps.vtu.services import claim_due_verification, verify_purchase
 
 
-@shared_task(bind=True, max_retries=5, default_retry_delay=60)
+@shared_task(bind=True, max_retries=None)
 def verify_pending_purchase(self, order_id: int):
+    # Backoff, jitter and the settle deadline live on the order (see apps.vtu.scheduling); a task that loses
+    # the claim is a duplicate or early delivery and simply exits.
+    if not claim_due_verification(order_id):
+        return None
     order = verify_purchase(order_id)
-    if order.status == PurchaseOrder.Status.PENDING:
-        raise self.retry(countdown=min(60 * (2 ** self.request.retries), 60 * 60))
+    if order.status == PurchaseOrder.Status.PENDING and order.next_verify_at:
+        raise self.retry(countdown=max((order.next_verify_at - timezone.now()).total_seconds(), 0))
     return order.status
 
 
 @shared_task
 def sweep_pending_purchases():
-    for order_id in PurchaseOrder.objects.filter(status=PurchaseOrder.Status.PENDING).values_list('id', flat=True):
+    due = PurchaseOrder.objects.filter(status=PurchaseOrder.Status.PENDING, needs_review=False).filter(
+        Q(next_verify_at__isnull=True) | Q(next_verify_at__lte=timezone.now())
+    )
+    for order_id in due.values_list('id', flat=True).iterator():
         verify_pending_purchase.delay(order_id)
@@ -2,11 +2,14 @@ from decimal import Decimal
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase, override_settings
+from django.utils import timezone
 
 from apps.ledger.models import LedgerEntry, Wallet
 from apps.ledger.services import credit_wallet
 from apps.vtu.models import PurchaseOrder, ServiceProvider
+from apps.vtu.providers import VTUResult
 from apps.vtu.services import create_purchase_order, process_purchase, verify_purchase
 
 
@@ -62,8 +65,8 @@ class VTUPurchaseFlowTests(TestCase):
             ).exists()
         )
 
-    @patch('apps.vtu.tasks.verify_pending_purchase.delay')
-    def test_pending_purchase_remains_pending_and_schedules_verification(self, delay_mock):
+    @patch('apps.vtu.tasks.verify_pending_purchase.apply_async')
+    def test_pending_purchase_remains_pending_and_schedules_verification(self, apply_async_mock):
         order = create_purchase_order(
             user=self.user,
             provider=self.provider,
@@ -75,9 +78,12 @@ class VTUPurchaseFlowTests(TestCase):
 
         processed_order = process_purchase(order.id)
         self.assertEqual(processed_order.status, PurchaseOrder.Status.PENDING)
-        delay_mock.assert_called_once_with(order.id)
+        self.assertIsNotNone(processed_order.next_verify_at)
+        apply_async_mock.assert_called_once()
+        self.assertEqual(apply_async_mock.call_args.kwargs['args'], (order.id,))
+        self.assertGreater(apply_async_mock.call_args.kwargs['countdown'], 0)
 
-    @patch('apps.vtu.tasks.verify_pending_purchase.delay')
+    @patch('apps.vtu.tasks.verify_pending_purchase.apply_async')
     def test_verification_failure_reverses_wallet(self, _delay_mock):
         order = create_purchase_order(
             user=self.user,
@@ -99,6 +105,77 @@ class VTUPurchaseFlowTests(TestCase):
         self.assertEqual(wallet.balance, Decimal('1000.00'))
 
 
+@patch('apps.vtu.tasks.verify_pending_purchase.apply_async')
+class VerifyScheduleTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='schedule-user', password='secret123')
+        self.provider = ServiceProvider.objects.create(name='Mock', slug='mock')
+        credit_wallet(self.user, Decimal('1000.00'), 'seed-schedule-fund', {})
+
+    def _pending_order(self):
+        order = create_purchase_order(
+            user=self.user,
+            provider=self.provider,
+            product_type=PurchaseOrder.ProductType.AIRTIME,
+            amount=Decimal('100.00'),
+            destination='PEND-08030000000',
+            service_code='mtn',
+        )
+        return process_purchase(order.id)
+
+    @override_settings(VTU_VERIFY_POLICIES={'default': {'deadline_action': 'refund'}})
+    def test_unknown_deadline_action_is_rejected(self, _apply_async_mock):
+        from apps.vtu.scheduling import get_verify_policy
+
+        with self.assertRaises(ImproperlyConfigured):
+            get_verify_policy('mock')
+
+    def test_backoff_delay_is_jittered_within_ceiling(self, _apply_async_mock):
+        from apps.vtu.scheduling import VerifyPolicy, next_verify_delay
+
+        policy = VerifyPolicy(base_delay=10, max_delay=100)
+        delays = {round(next_verify_delay(policy, attempts=3), 6) for _ in range(20)}
+        self.assertGreater(len(delays), 1)
+        self.assertTrue(all(40 <= delay <= 80 for delay in delays))
+        self.assertLessEqual(next_verify_delay(policy, attempts=30), 100)
+
+    def test_claim_is_granted_once_per_due_slot(self, _apply_async_mock):
+        from apps.vtu.services import claim_due_verification
+
+        order = self._pending_order()
+        self.assertFalse(claim_due_verification(order.id))
+
+        PurchaseOrder.objects.filter(pk=order.pk).update(next_verify_at=timezone.now())
+        self.assertTrue(claim_due_verification(order.id))
+        self.assertFalse(claim_due_verification(order.id))
+
+    @override_settings(VTU_VERIFY_POLICIES={'default': {'settle_deadline': 0, 'deadline_action': 'reverse'}})
+    @patch('apps.vtu.providers.mock.MockProvider.verify')
+    def test_settle_deadline_reverses_order(self, verify_mock, _apply_async_mock):
+        verify_mock.return_value = VTUResult(success=False, status='PENDING', message='still pending')
+        order = self._pending_order()
+
+        order = verify_purchase(order.id)
+
+        self.assertEqual(order.status, PurchaseOrder.Status.FAILED)
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('1000.00'))
+
+    @override_settings(VTU_VERIFY_POLICIES={'mock': {'settle_deadline': 0, 'deadline_action': 'review'}})
+    @patch('apps.vtu.providers.mock.MockProvider.verify')
+    def test_settle_deadline_can_flag_for_review(self, verify_mock, _apply_async_mock):
+        from apps.vtu.scheduling import pending_backlog_by_age
+
+        verify_mock.return_value = VTUResult(success=False, status='PENDING', message='still pending')
+        order = verify_purchase(self._pending_order().id)
+
+        self.assertEqual(order.status, PurchaseOrder.Status.PENDING)
+        self.assertTrue(order.needs_review)
+        self.assertIsNone(order.next_verify_at)
+        backlog = pending_backlog_by_age()
+        self.assertEqual(backlog[0], {'label': '< 5 min', 'count': 1, 'needs_review': 1})
+        self.assertEqual(sum(bucket['count'] for bucket in backlog), 1)
+
+
 class VTpassProviderTests(TestCase):
     @override_settings(
         VTU_PROVIDER='vtpass',
@@ -133,3 +210,75 @@ class VTpassProviderTests(TestCase):
         self.assertTrue(result.success)
         self.assertEqual(result.status, 'SUCCESS')
         self.assertEqual(result.provider_ref, 'REF-001')
+
+    @patch('apps.vtu.providers.vtpass.requests.Session.request')
+    def test_only_successful_call_logs_are_marked_for_sampling(self, request_mock):
+        from apps.vtu.providers.vtpass import VTpassProvider
+
+        class _Response:
+            status_code = 200
+            code = '000'
+
+            def json(self):
+                return {'code': self.code, 'content': {'transactions': {'status': 'delivered'}}}
+
+        provider = VTpassProvider(config={'base_url': 'https://vtpass.test'})
+        for code, sampled in (('000', True), ('016', False)):
+            response = _Response()
+            response.code = code
+            request_mock.return_value = response
+            with self.assertLogs('apps.vtu.providers.vtpass', level='INFO') as logs:
+                provider.purchase_airtime('mtn', '0803', Decimal('100'), f'REF-{code}')
+            self.assertEqual([record.log_sample for record in logs.records], [sampled, sampled])
+
+    def test_payload_redaction_is_deferred_to_formatting(self):
+        from apps.vtu.providers.vtpass import _RedactedPayload
+
+        payload = {'request_id': 'REF-002', 'password': 'secret'}
+        redacted = _RedactedPayload(payload)
+        payload['request_id'] = 'REF-003'
+        self.assertEqual(redacted.payload, {'request_id': 'REF-002', 'password': 'secret'})
+        self.assertEqual(str(redacted), "{'request_id': 'REF-002', 'password': '***'}")
+
+
+class MockProviderSimulationTests(TestCase):
+    def test_error_rate_fails_purchases(self):
+        from apps.vtu.providers import MockProvider
+
+        result = MockProvider(config={'error_rate': 1.0}).purchase_airtime('mtn', '0803', Decimal('100'), 'REF-ERR-1')
+        self.assertEqual(result.status, 'FAILED')
+
+    def test_pending_purchase_settles_after_deadline(self):
+        from apps.vtu.providers import MockProvider
+
+        pending = MockProvider(config={'pending_rate': 1.0, 'settle_seconds': 3600})
+        self.assertEqual(pending.purchase_airtime('mtn', '0803', Decimal('100'), 'REF-SETTLE-1').status, 'PENDING')
+        self.assertEqual(pending.verify(reference='REF-SETTLE-1').status, 'PENDING')
+
+        settled = MockProvider(config={'pending_rate': 1.0, 'settle_seconds': 0})
+        self.assertEqual(settled.purchase_airtime('mtn', '0803', Decimal('100'), 'REF-SETTLE-2').status, 'PENDING')
+        self.assertEqual(settled.verify(reference='REF-SETTLE-2').status, 'SUCCESS')
+
+    def test_settlement_book_is_bounded(self):
+        from apps.vtu.providers import MockProvider
+
+        self.addCleanup(MockProvider._settlements.clear)
+        with patch.object(MockProvider, 'MAX_SETTLEMENTS', 2):
+            provider = MockProvider(config={'pending_rate': 1.0, 'settle_seconds': 3600})
+            for index in range(3):
+                provider.purchase_airtime('mtn', '0803', Decimal('100'), f'REF-BOUND-{index}')
+        self.assertEqual(list(MockProvider._settlements), ['REF-BOUND-1', 'REF-BOUND-2'])
+
+        MockProvider._settlements.clear()
+        settled = MockProvider(config={'pending_rate': 1.0, 'settle_seconds': 0})
+        settled.purchase_airtime('mtn', '0803', Decimal('100'), 'REF-BOUND-3')
+        with patch.object(MockProvider, 'SETTLEMENT_RETENTION', 0):
+            provider.purchase_airtime('mtn', '0803', Decimal('100'), 'REF-BOUND-4')
+        self.assertEqual(list(MockProvider._settlements), ['REF-BOUND-4'])
+
+    def test_latency_spec_parsing(self):
+        from apps.vtu.providers.mock import LatencyDistribution
+
+        self.assertEqual(LatencyDistribution.parse('uniform:0.1:0.2'), LatencyDistribution('uniform', (0.1, 0.2)))
+        with self.assertRaises(ValueError):
+            LatencyDistribution.parse('normal:0.1')
@@ -34,6 +34,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'apps.core.middleware.ProfilingMiddleware',
+    'apps.core.middleware.MaintenanceModeMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -96,6 +98,12 @@ LOGGING = {
     'formatters': {
         'verbose': {'format': '%(levelname)s %(asctime)s %(name)s %(message)s'},
     },
+    'filters': {
+        'sample_success': {
+            '()': 'apps.core.log_handlers.SampleFilter',
+            'rate': env.float('LOG_SUCCESS_SAMPLE_RATE', default=1.0),
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
@@ -106,19 +114,106 @@ LOGGING = {
             'filename': LOG_DIR / 'django.log',
             'formatter': 'verbose',
         },
+        # Request threads only enqueue; a background listener writes to console and file. Built through a
+        # factory because Python 3.12+ dictConfig treats 'class' QueueHandler subclasses specially.
+        'queue': {
+            '()': 'apps.core.log_handlers.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console', 'cfg://handlers.file'],
+            'queue_size': env.int('LOG_QUEUE_SIZE', default=10000),
+        },
+    },
+    'loggers': {
+        'apps.vtu.providers.vtpass': {'filters': ['sample_success']},
     },
     'root': {
-        'handlers': ['console', 'file'],
+        'handlers': ['queue'],
         'level': env('DJANGO_LOG_LEVEL', default='INFO'),
     },
 }
 
+# Locks, token and site-settings invalidation rely on this cache being shared by every worker process;
+# set CACHE_URL (for example redis://127.0.0.1:6379/1) in any multi-process deployment.
+CACHES = {'default': env.cache('CACHE_URL', default='locmemcache://')}
+# Upper bound on how long a process serves its memoized SiteSetting row without re-reading it.
+SITE_SETTINGS_MEMO_TTL = env.float('SITE_SETTINGS_MEMO_TTL', default=30.0)
+
+# Provider call metrics at /metrics/. With several worker processes, point METRICS_DIR at a directory
+# they share; each worker writes its snapshot there every METRICS_FLUSH_INTERVAL seconds. Snapshots not
+# rewritten for METRICS_STALE_AFTER seconds belong to dead workers and are folded into retired.json.
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+METRICS_DIR = env('METRICS_DIR', default='')
+METRICS_FLUSH_INTERVAL = env.float('METRICS_FLUSH_INTERVAL', default=5.0)
+METRICS_STALE_AFTER = env.float('METRICS_STALE_AFTER', default=60.0)
+
+# While SiteSetting.maintenance_mode is on, non-staff requests get a static 503 before sessions load.
+# Allowed path prefixes pass through untouched; enqueue-only prefixes pass but only store their work
+# (webhook events are left for sweep_webhook_events).
+MAINTENANCE_RETRY_AFTER = env.int('MAINTENANCE_RETRY_AFTER', default=300)
+# Lifetime of the staff bypass cookie; it is renewed on each staff request after the user is re-checked.
+MAINTENANCE_STAFF_COOKIE_AGE = env.int('MAINTENANCE_STAFF_COOKIE_AGE', default=15 * 60)
+MAINTENANCE_ALLOWED_PATHS = env.list('MAINTENANCE_ALLOWED_PATHS', default=['/admin/', '/accounts/login/', '/static/', '/metrics/'])
+MAINTENANCE_ENQUEUE_ONLY_PATHS = env.list('MAINTENANCE_ENQUEUE_ONLY_PATHS', default=['/payments/monnify/webhook/'])
+
+# Opt-in request profiling of staff (by the staff cookie) and a PROFILING_SAMPLE_RATE share of other requests.
+# Only staff responses get the Server-Timing header; requests over PROFILING_SLOW_MS are listed at /dashboard/slow-requests/.
+PROFILING_ENABLED = env.bool('PROFILING_ENABLED', default=False)
+PROFILING_STAFF = env.bool('PROFILING_STAFF', default=True)
+PROFILING_SAMPLE_RATE = env.float('PROFILING_SAMPLE_RATE', default=0.0)
+PROFILING_SLOW_MS = env.float('PROFILING_SLOW_MS', default=500.0)
+PROFILING_BUFFER_SIZE = env.int('PROFILING_BUFFER_SIZE', default=200)
+
 MONNIFY_BASE_URL = env('MONNIFY_BASE_URL', default='https://sandbox.monnify.com')
 MONNIFY_API_KEY = env('MONNIFY_API_KEY', default='')
 MONNIFY_SECRET_KEY = env('MONNIFY_SECRET_KEY', default='')
 MONNIFY_CONTRACT_CODE = env('MONNIFY_CONTRACT_CODE', default='')
+# One pooled keep-alive session per process; size the pool to the number of threads calling Monnify concurrently.
+MONNIFY_POOL_SIZE = env.int('MONNIFY_POOL_SIZE', default=10)
+MONNIFY_CONNECT_TIMEOUT = env.float('MONNIFY_CONNECT_TIMEOUT', default=5.0)
+MONNIFY_READ_TIMEOUT = env.float('MONNIFY_READ_TIMEOUT', default=15.0)
+MONNIFY_MAX_RETRIES = env.int('MONNIFY_MAX_RETRIES', default=3)
+MONNIFY_RETRY_BACKOFF = env.float('MONNIFY_RETRY_BACKOFF', default=0.5)
+# Access tokens are refreshed in the background this many seconds before they expire.
+MONNIFY_TOKEN_REFRESH_AHEAD = env.int('MONNIFY_TOKEN_REFRESH_AHEAD', default=120)
+MONNIFY_TOKEN_WAIT_SECONDS = env.float('MONNIFY_TOKEN_WAIT_SECONDS', default=5.0)
+# Reserved account provisioning is enqueued this many seconds after signup commits. Any countdown sends it to the
+# in-process scheduler under TASK_BACKEND=sync, so signup never waits on Monnify; 0 provisions inline.
+MONNIFY_PROVISION_COUNTDOWN = env.float('MONNIFY_PROVISION_COUNTDOWN', default=1.0)
+WEBHOOK_REPLAY_WORKERS = env.int('WEBHOOK_REPLAY_WORKERS', default=4)
+# Webhook drains are enqueued this many seconds after the event commits. Any countdown sends them to the
+# in-process scheduler under TASK_BACKEND=sync, so the request never waits on ledger work; 0 drains inline.
+WEBHOOK_DRAIN_COUNTDOWN = env.float('WEBHOOK_DRAIN_COUNTDOWN', default=1.0)
+# Webhook payloads are stored once in PayloadBlob; payloads at least this large are zlib-compressed.
+PAYLOAD_BLOB_COMPRESS = env.bool('PAYLOAD_BLOB_COMPRESS', default=True)
+PAYLOAD_BLOB_COMPRESS_MIN_BYTES = env.int('PAYLOAD_BLOB_COMPRESS_MIN_BYTES', default=512)
+
+# Used only when Celery is not installed: 'sync' runs tasks inline, 'thread' uses an in-process pool.
+TASK_BACKEND = env('TASK_BACKEND', default='sync')
+TASK_THREAD_WORKERS = env.int('TASK_THREAD_WORKERS', default=4)
+TASK_THREAD_QUEUE_SIZE = env.int('TASK_THREAD_QUEUE_SIZE', default=1000)
+TASK_SHUTDOWN_TIMEOUT = env.float('TASK_SHUTDOWN_TIMEOUT', default=10.0)
 
 VTU_PROVIDER = env('VTU_PROVIDER', default='stub')
+MOCK_PROVIDER_CONFIG = {
+    'latency': env('MOCK_PROVIDER_LATENCY', default='fixed:0'),
+    'error_rate': env.float('MOCK_PROVIDER_ERROR_RATE', default=0.0),
+    'timeout_rate': env.float('MOCK_PROVIDER_TIMEOUT_RATE', default=0.0),
+    'timeout_seconds': env.float('MOCK_PROVIDER_TIMEOUT_SECONDS', default=10.0),
+    'pending_rate': env.float('MOCK_PROVIDER_PENDING_RATE', default=0.0),
+    'settle_seconds': env.float('MOCK_PROVIDER_SETTLE_SECONDS', default=30.0),
+    'settle_failure_rate': env.float('MOCK_PROVIDER_SETTLE_FAILURE_RATE', default=0.0),
+}
+
+# Requery schedule for PENDING purchases, keyed by ServiceProvider.slug ('default' applies to all).
+# deadline_action is 'reverse' (refund and fail) or 'review' (stop polling, flag for staff).
+VTU_VERIFY_POLICIES = {
+    'default': {
+        'base_delay': env.float('VTU_VERIFY_BASE_DELAY', default=30.0),
+        'max_delay': env.float('VTU_VERIFY_MAX_DELAY', default=900.0),
+        'settle_deadline': env.float('VTU_VERIFY_SETTLE_DEADLINE', default=6 * 60 * 60.0),
+        'deadline_action': env('VTU_VERIFY_DEADLINE_ACTION', default='reverse'),
+    },
+    'vtpass': {'base_delay': 60.0, 'max_delay': 1800.0, 'settle_deadline': 24 * 60 * 60.0, 'deadline_action': 'review'},
+}
 
 
 def get_vtpass_settings(*, require: bool = False):
@@ -145,3 +240,9 @@ def get_vtpass_settings(*, require: bool = False):
 VTPASS_CONFIG = get_vtpass_settings(require=False)
 REFERRAL_BONUS_PERCENT = env.float('REFERRAL_BONUS_PERCENT', default=1.0)
 REFERRAL_MIN_FUND = env.float('REFERRAL_MIN_FUND', default=1000.0)
+# Commission percent of downline purchase volume per tier, nearest first (e.g. "2.0,1.0,0.5"); empty disables tier payouts.
+REFERRAL_TIER_PERCENTS = env.list('REFERRAL_TIER_PERCENTS', cast=float, default=[])
+REFERRAL_TREE_MAX_DEPTH = env.int('REFERRAL_TREE_MAX_DEPTH', default=10)
+# Key for the user-id permutation behind referral codes; falls back to SECRET_KEY. Changing it only affects new users,
+# whose derived code may then clash with an existing one; those users get the USR<id> fallback code instead.
+REFERRAL_CODE_KEY = env('REFERRAL_CODE_KEY', default='')